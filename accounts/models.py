@@ -3,6 +3,7 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 import random
 import string
+from .phone import to_e164
 
 class User(AbstractUser):
     USER_TYPES = (
@@ -22,6 +23,7 @@ class User(AbstractUser):
     
     user_type = models.CharField(max_length=20, choices=USER_TYPES, default='customer')
     phone_number = models.CharField(max_length=20, unique=True, help_text="WhatsApp number used for registration")
+    phone_e164 = models.CharField(max_length=21, blank=True, default='', db_index=True, editable=False)
     date_of_birth = models.DateField(null=True, blank=True)
     registration_source = models.CharField(max_length=20, choices=REGISTRATION_SOURCES, default='whatsapp')
     whatsapp_id = models.CharField(max_length=255, blank=True, help_text="WhatsApp user ID from the bot")
@@ -48,6 +50,10 @@ class User(AbstractUser):
         # Auto-generate username from email if not provided
         if not self.username:
             self.username = self.email.split('@')[0]
+
+        self.phone_e164 = to_e164(self.phone_number)
+        if kwargs.get('update_fields') is not None and 'phone_number' in kwargs['update_fields']:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'phone_e164'}
         
         # Auto-generate a random password for WhatsApp users
         if not self.password and self.registration_source == 'whatsapp':
@@ -0,0 +1,129 @@
+# accounts/names.py
+"""
+Person-name matching shared by every app.
+
+Names reach us from Deriv (account holder), EcoCash SMS (all caps), admin
+forms and verified client records. They are all compared the same way:
+leading title dropped, lower-cased, split on whitespace, compared as a set
+of tokens, so "MOYO TENDAI" and "Mr. Tendai Moyo" are the same name.
+
+    shares_token(a, b)   at least one name in common - the rule for every
+                         flow that moves money (deposits, withdrawals,
+                         admin crediting)
+    similarity(a, b)     0..1 token-set ratio - ignores order and extra
+                         names, tolerates small typos
+    names_match(a, b)    shares_token, or similarity >= MATCH_THRESHOLD -
+                         a hint for review screens only: "John Smith" and
+                         "Joan Smyth" pass it
+    score_pairs(pairs)   similarity for many pairs at once
+
+Store tokens_key() in the ``name_tokens`` columns and read it back with
+from_key(); screens that compare many names then skip re-tokenising.
+Tokens are interned, so the string comparisons inside set operations
+short-circuit on identity.
+"""
+import re
+import sys
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+MATCH_THRESHOLD = 0.75
+
+_TITLE_RE = re.compile(r"^(?:mr|mrs|ms|miss|dr)\.?\s+", re.IGNORECASE)
+_SPLIT_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=8192)
+def normalize(name):
+    """frozenset of lower-case name tokens, title removed."""
+    if not name:
+        return frozenset()
+    name = _TITLE_RE.sub("", name.strip())
+    return frozenset(
+        sys.intern(token) for token in (part.lower().strip(".") for part in _SPLIT_RE.split(name)) if token
+    )
+
+
+def tokens_key(name):
+    """'moyo tendai' - sorted tokens, the stored form of a name."""
+    return " ".join(sorted(normalize(name)))
+
+
+@lru_cache(maxsize=8192)
+def from_key(key):
+    """Tokens back from a stored tokens_key()."""
+    if not key:
+        return frozenset()
+    return frozenset(sys.intern(token) for token in key.split(" ") if token)
+
+
+def _tokens(value):
+    # Names or already-tokenised sets are both accepted
+    if isinstance(value, frozenset):
+        return value
+    if isinstance(value, set):
+        return frozenset(value)
+    return normalize(value)
+
+
+def shares_token(name1, name2):
+    return not _tokens(name1).isdisjoint(_tokens(name2))
+
+
+def _ratio(s1, s2):
+    return SequenceMatcher(None, s1, s2, autojunk=False).ratio()
+
+
+@lru_cache(maxsize=16384)
+def _token_set_ratio(a, b):
+    if not a or not b:
+        return 0.0
+    if a is b or a == b:
+        return 1.0
+    common = a & b
+    if common and (common == a or common == b):
+        # One name is the other plus extra names (middle name, second surname)
+        return 1.0
+
+    shared = " ".join(sorted(common))
+    left = " ".join(filter(None, (shared, " ".join(sorted(a - b)))))
+    right = " ".join(filter(None, (shared, " ".join(sorted(b - a)))))
+    score = _ratio(left, right)
+    if shared:
+        score = max(score, _ratio(shared, left), _ratio(shared, right))
+    return score
+
+
+def similarity(name1, name2):
+    """Token-set ratio between two names (or token sets), 0..1."""
+    a, b = _tokens(name1), _tokens(name2)
+    # Symmetric, so order the pair for the cache
+    if hash(a) > hash(b):
+        a, b = b, a
+    return _token_set_ratio(a, b)
+
+
+def names_match(name1, name2, threshold=MATCH_THRESHOLD):
+    """True if the names share a token or look alike - for flagging, never for crediting."""
+    a, b = _tokens(name1), _tokens(name2)
+    return not a.isdisjoint(b) or similarity(a, b) >= threshold
+
+
+def score_pairs(pairs):
+    """
+    similarity() for each (name, name) pair, in order.
+
+    Each distinct name is tokenised once and each distinct pair scored
+    once, so a screen comparing one client against many cashouts (or the
+    same names again and again) costs little more than its unique pairs.
+    """
+    seen = {}
+    scores = []
+    for name1, name2 in pairs:
+        key = (name1 if isinstance(name1, str) else _tokens(name1),
+               name2 if isinstance(name2, str) else _tokens(name2))
+        score = seen.get(key)
+        if score is None:
+            score = seen[key] = similarity(name1, name2)
+        scores.append(score)
+    return scores
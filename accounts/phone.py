@@ -0,0 +1,75 @@
+# accounts/phone.py
+"""
+Phone number canonicalisation shared by every app.
+
+Numbers reach us as 0771234567, 771234567, 263771234567, +263 77 123 4567
+depending on whether they came from WhatsApp, an EcoCash SMS, OCR or an
+admin form. Store to_e164() in the indexed ``phone_e164`` columns and look
+up with plain equality on that column; to_local() and to_msisdn() are only
+for display and for APIs that insist on a particular format.
+
+Numbers that already carry another country code (+44..., 0044..., or a
+bare international MSISDN such as a WhatsApp id) keep it; only
+Zimbabwean forms get 263 put in front.
+"""
+import re
+
+COUNTRY_CODE = '263'
+
+
+def digits_only(number):
+    if not number:
+        return ''
+    return re.sub(r'\D', '', str(number))
+
+
+def _foreign_digits(number):
+    """Digits with their country code for a non-Zimbabwean number, else None."""
+    text = str(number or '').strip()
+    digits = digits_only(text)
+    if text.startswith('+'):
+        international = digits
+    elif digits.startswith('00'):
+        international = digits[2:]
+    elif digits.startswith('0') or digits.startswith(COUNTRY_CODE) or len(digits) <= 9:
+        return None
+    else:
+        # 10+ digits with no trunk 0 - already an international MSISDN
+        international = digits
+    if not international or international.startswith(COUNTRY_CODE):
+        return None
+    return international
+
+
+def to_local(number):
+    """771234567 - the 9-digit national form EcoCash uses."""
+    digits = digits_only(number)
+    if digits.startswith('00' + COUNTRY_CODE):
+        digits = digits[2:]
+    if digits.startswith(COUNTRY_CODE):
+        digits = digits[len(COUNTRY_CODE):]
+    return digits.lstrip('0')
+
+
+def to_msisdn(number):
+    """263771234567 - country code, no plus (WhatsApp ids, SMS gateways)."""
+    foreign = _foreign_digits(number)
+    if foreign:
+        return foreign
+    local = to_local(number)
+    return f'{COUNTRY_CODE}{local}' if local else ''
+
+
+def to_e164(number):
+    """+263771234567 - the canonical stored form."""
+    foreign = _foreign_digits(number)
+    if foreign:
+        return f'+{foreign}'
+    local = to_local(number)
+    return f'+{COUNTRY_CODE}{local}' if local else ''
+
+
+def is_valid_mobile(number):
+    """True for a Zimbabwean mobile number (9 local digits starting with 7)."""
+    local = to_local(number)
+    return len(local) == 9 and local.startswith('7')
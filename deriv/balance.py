@@ -0,0 +1,245 @@
+# deriv/balance.py
+"""
+Live payment-agent float from a Deriv ``balance`` subscription.
+
+The monitor runs on the Deriv service loop, holds one pooled connection
+with a balance subscription open and keeps the latest figure in memory.
+Reading it costs no network call:
+
+    from deriv.balance import balance_monitor
+
+    if not balance_monitor.try_reserve(net_amount):
+        ...  # queue the deposit instead of sending it
+
+try_reserve() deducts the amount locally so concurrent deposits don't all
+pass the gate against the same figure; the next balance push from Deriv
+replaces the local estimate with the real one. When the monitor has no
+trustworthy figure (not connected yet, or disconnected for too long) the
+gate lets deposits through - the transfer itself still fails cleanly if
+the float is short.
+
+Deposits refused by the gate are parked with awaiting_float=True and
+released by release_queued_deposits() as soon as the float recovers.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+
+from .pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+PING_INTERVAL = 30          # seconds between pings on the subscription connection
+STALE_AFTER = 600           # a disconnected monitor's figure is trusted this long
+RECONNECT_DELAYS = (1, 2, 5, 10, 30)
+
+
+def _min_float():
+    return Decimal(str(getattr(settings, 'DERIV_MIN_FLOAT', 100)))
+
+
+class BalanceMonitor:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._balance = None
+        self._currency = 'USD'
+        self._updated_at = None         # wall clock, for display
+        self._updated_mono = None       # monotonic, for staleness
+        self._connected = False
+        self._future = None
+        self._pid = None
+        self._queued = False            # the gate has parked deposits since the last release
+        self._releasing = threading.Lock()
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    def ensure_started(self):
+        """Start the monitor on the Deriv service loop (once per process)."""
+        if self._future is not None and not self._future.done() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._future is not None and not self._future.done() and self._pid == os.getpid():
+                return
+            from .service import deriv_service
+
+            self._pid = os.getpid()
+            self._connected = False
+            self._future = deriv_service.submit(self._run())
+
+    async def _run(self):
+        attempt = 0
+        while True:
+            try:
+                await self._watch()
+                attempt = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Deriv balance subscription dropped: {e}")
+            self._set_connected(False)
+            delay = RECONNECT_DELAYS[min(attempt, len(RECONNECT_DELAYS) - 1)]
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _watch(self):
+        # The account DerivPaymentAgent pays from
+        pool = get_pool(settings.DERIV_AGENT_API_TOKEN, settings.DERIV_AGENT_APP_ID)
+        conn = await pool.checkout()
+        dropped = asyncio.Event()
+        subscription = None
+        try:
+            source = await conn.api.subscribe({'balance': 1, 'subscribe': 1})
+            subscription = source.subscribe(
+                on_next=self._on_message,
+                on_error=lambda e: dropped.set(),
+                on_completed=dropped.set,
+            )
+            self._set_connected(True)
+            logger.info("Deriv balance subscription open")
+
+            # Balance only pushes on change, so silence says nothing - ping to find dead sockets
+            while not dropped.is_set():
+                try:
+                    await asyncio.wait_for(dropped.wait(), PING_INTERVAL)
+                except asyncio.TimeoutError:
+                    response = await asyncio.wait_for(conn.api.ping({'ping': 1}), 10)
+                    if not response.get('ping'):
+                        break
+        except Exception:
+            conn.broken = True
+            raise
+        finally:
+            if subscription is not None:
+                try:
+                    subscription.dispose()
+                except Exception:
+                    pass
+            # The subscription is tied to this socket - don't hand it to another caller
+            conn.broken = True
+            await pool.checkin(conn)
+
+    def _on_message(self, message):
+        info = message.get('balance') if isinstance(message, dict) else None
+        if not info or info.get('balance') is None:
+            return
+        balance = Decimal(str(info['balance']))
+        with self._lock:
+            previous = self._balance
+            self._balance = balance
+            self._currency = info.get('currency') or self._currency
+            self._updated_at = timezone.now()
+            self._updated_mono = time.monotonic()
+        logger.info(f"Deriv float: {self._currency} {balance}")
+
+        if balance >= _min_float() and (previous is None or previous < _min_float() or self._queued):
+            # ORM work can't run on the loop thread
+            asyncio.get_running_loop().run_in_executor(None, release_queued_deposits)
+
+    def _set_connected(self, connected):
+        with self._lock:
+            self._connected = connected
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+    def _known(self):
+        if self._balance is None:
+            return False
+        if self._connected:
+            return True
+        return self._updated_mono is not None and time.monotonic() - self._updated_mono < STALE_AFTER
+
+    def snapshot(self):
+        """Current float for display; never touches the network."""
+        self.ensure_started()
+        with self._lock:
+            known = self._known()
+            return {
+                'balance': self._balance,
+                'currency': self._currency,
+                'updated_at': self._updated_at,
+                'connected': self._connected,
+                'known': known,
+                'threshold': _min_float(),
+                'low': known and self._balance < _min_float(),
+            }
+
+    def try_reserve(self, amount):
+        """
+        True if a transfer of ``amount`` may go ahead now. Deducts it from the
+        local figure; False means the float is below the threshold or short.
+        """
+        self.ensure_started()
+        amount = Decimal(str(amount))
+        with self._lock:
+            if not self._known():
+                return True
+            if self._balance < _min_float() or amount > self._balance:
+                self._queued = True
+                return False
+            self._balance -= amount
+            return True
+
+    def release(self, amount):
+        """Give back a reservation for a transfer that did not go through."""
+        amount = Decimal(str(amount))
+        with self._lock:
+            if self._balance is not None:
+                self._balance += amount
+
+
+balance_monitor = BalanceMonitor()
+
+
+def release_queued_deposits():
+    """Send deposits that were parked while the float was low, oldest first."""
+    from django.db import close_old_connections
+    from ecocash.models import CashOutTransaction
+    from finance import rollups
+    from finance.models import EcoCashTransaction
+    from whatsapp.services import WhatsAppService
+
+    if not balance_monitor._releasing.acquire(blocking=False):
+        return 0
+    released = 0
+    try:
+        balance_monitor._queued = False
+        service = WhatsAppService()
+        queued = EcoCashTransaction.objects.filter(
+            transaction_type='deposit', awaiting_float=True
+        ).select_related('user').order_by('created_at')
+        for transaction in queued:
+            # Claim it - another worker may be releasing the same queue, or an admin
+            # may have failed it while it waited
+            claimed = EcoCashTransaction.objects.filter(
+                pk=transaction.pk, awaiting_float=True, status='pending'
+            ).update(awaiting_float=False, status='processing')
+            if not claimed:
+                continue
+            rollups.record_status_move(transaction, 'pending', 'processing')
+            # Load the claimed row so save() moves it on from 'processing'
+            transaction.refresh_from_db()
+
+            cashout = CashOutTransaction.find_for_pop(transaction.ecocash_number, transaction.ecocash_reference)
+            if cashout is None:
+                transaction.mark_failed(reason="Queued deposit: EcoCash cashout not found on release")
+                continue
+            service._process_deposit_payment(transaction, cashout, None, transaction.user)
+            released += 1
+            # _process_deposit_payment parks it again if the float ran out
+            transaction.refresh_from_db(fields=['awaiting_float'])
+            if transaction.awaiting_float:
+                break
+    except Exception as e:
+        logger.error(f"Error releasing queued deposits: {e}")
+    finally:
+        balance_monitor._releasing.release()
+        close_old_connections()
+    return released
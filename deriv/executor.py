@@ -0,0 +1,270 @@
+# deriv/executor.py
+"""
+Dry run -> name check -> transfer on one shared Deriv session.
+
+Each deposit used to check a connection out of the pool for the dry run,
+hand it back, then check one out again for the transfer. The executor
+keeps a single authorised connection open and multiplexes every trader's
+requests over it: each request carries its own req_id and the response
+is matched back to it, so any number of independent deposits can be in
+flight on the socket at once.
+
+    trace = TransferTrace(transaction.reference_number)
+    details = deriv_service.run(executor.dry_run(amount, 'CR123', trace=trace))
+    with trace.step('name_check'):
+        ...
+    # Bounded by TRANSFER_TIMEOUT - raises TransferUncertain rather than hang
+    result = deriv_service.run(executor.transfer(amount, 'CR123', trace=trace), timeout=None)
+    trace.finish('completed')
+
+Every wait is bounded: a dry run that gets no answer within
+REQUEST_TIMEOUT raises like any dropped request, and a transfer that gets
+none within TRANSFER_TIMEOUT - or whose socket drops under it - raises
+TransferUncertain, since it may have gone through. A dropped socket is
+marked broken, so the next request reconnects.
+
+TransferTrace records how long each step took; timing_stats keeps the
+recent traces so the slow step is easy to spot (the deriv_load_test
+command prints them).
+"""
+import asyncio
+import itertools
+import logging
+import threading
+import time
+import weakref
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from deriv_api import APIError
+from django.conf import settings
+
+from .pool import CONNECTION_ERRORS, HEALTH_CHECK_INTERVAL, REAUTH_ERROR_CODES, error_code, error_dict, get_pool
+
+logger = logging.getLogger(__name__)
+
+MAX_IN_FLIGHT = 32          # requests outstanding on the shared connection
+REQ_ID_START = 1000000      # clear of deriv_api's own req_id counter
+REQUEST_TIMEOUT = 30        # seconds to wait for a dry run / balance response
+TRANSFER_TIMEOUT = 60       # seconds to wait for a transfer response before calling it uncertain
+
+_executors = weakref.WeakKeyDictionary()     # loop -> {(app_id, token): TransferExecutor}
+
+
+# -----------------------------
+# Timings
+# -----------------------------
+class TimingStats:
+    """Rolling per-step timings of recent transfers (thread-safe)."""
+
+    def __init__(self, size=1000):
+        self._samples = defaultdict(lambda: deque(maxlen=size))
+        self._lock = threading.Lock()
+
+    def record(self, steps):
+        with self._lock:
+            for name, seconds in steps.items():
+                self._samples[name].append(seconds)
+
+    def summary(self):
+        """{step: {'count', 'p50', 'p95', 'max'}} in milliseconds."""
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+        result = {}
+        for name, values in samples.items():
+            if not values:
+                continue
+            result[name] = {
+                'count': len(values),
+                'p50': round(values[len(values) // 2] * 1000, 1),
+                'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))] * 1000, 1),
+                'max': round(values[-1] * 1000, 1),
+            }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+
+timing_stats = TimingStats()
+
+
+class TransferTrace:
+    """Per-deposit step timings; usable from both sync code and coroutines."""
+
+    def __init__(self, reference=''):
+        self.reference = reference
+        self.steps = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def step(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] = self.steps.get(name, 0) + time.perf_counter() - started
+
+    def finish(self, outcome=''):
+        self.steps['total'] = time.perf_counter() - self._started
+        timing_stats.record(self.steps)
+        logger.info(f"Deposit {self.reference} {outcome}: {self.describe()}")
+        return self.steps
+
+    def describe(self):
+        return ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.steps.items())
+
+
+@contextmanager
+def _maybe_step(trace, name):
+    if trace is None:
+        yield
+    else:
+        with trace.step(name):
+            yield
+
+
+# -----------------------------
+# Executor
+# -----------------------------
+class TransferUncertain(APIError):
+    """A transfer was sent but its outcome never came back - check the Deriv statement."""
+
+
+class TransferExecutor:
+    def __init__(self, pool, max_in_flight=MAX_IN_FLIGHT):
+        self.pool = pool
+        self._conn = None
+        self._connect_lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._req_ids = itertools.count(REQ_ID_START)
+        self._in_flight = 0
+
+    async def _connection(self):
+        async with self._connect_lock:
+            conn = self._conn
+            if conn is not None and not conn.broken:
+                if time.monotonic() - conn.last_used <= HEALTH_CHECK_INTERVAL or await self.pool._is_healthy(conn):
+                    return conn
+                conn.broken = True
+            if conn is not None:
+                await self._release(conn)
+            self._conn = await self.pool.checkout()
+            return self._conn
+
+    async def _release(self, conn):
+        # Requests sharing a dropped socket all fail together - check it in once
+        if self._conn is not conn:
+            return
+        self._conn = None
+        await self.pool.checkin(conn)
+
+    async def _send(self, conn, request, timeout):
+        try:
+            return await asyncio.wait_for(conn.api.send(request), timeout)
+        except Exception as e:
+            code = error_code(e)
+            if code is None:
+                raise
+            # deriv_api raises on error responses - hand them back as a response dict
+            return {'error': error_dict(e), 'req_id': request['req_id']}
+
+    async def request(self, payload, retry=False, timeout=REQUEST_TIMEOUT, uncertain=False):
+        """
+        Send ``payload`` on the shared connection with its own req_id and
+        return the matching response. retry=True resends once on a fresh
+        connection after a drop - only for idempotent requests. With
+        uncertain=True a drop or timeout after sending raises
+        TransferUncertain instead.
+        """
+        attempts = 2 if retry else 1
+        async with self._slots:
+            self._in_flight += 1
+            try:
+                return await self._request(payload, attempts, timeout, uncertain)
+            finally:
+                self._in_flight -= 1
+                # Throwaway loops (asyncio.run) don't keep connections between calls
+                if not self.pool.keep_alive and self._in_flight == 0 and self._conn is not None:
+                    await self._release(self._conn)
+
+    async def _request(self, payload, attempts, timeout, uncertain):
+        for attempt in range(attempts):
+            conn = await self._connection()
+            request = dict(payload, req_id=next(self._req_ids))
+            try:
+                response = await self._send(conn, request, timeout)
+                if error_code(response) in REAUTH_ERROR_CODES:
+                    logger.info("Deriv session lost authorisation - re-authorising")
+                    await self.pool._authorize(conn.api)
+                    request['req_id'] = next(self._req_ids)
+                    response = await self._send(conn, request, timeout)
+            except CONNECTION_ERRORS + (APIError,) as e:
+                if error_code(e) is not None:
+                    raise
+                # A dropped or silent socket - no later request should wait on it
+                conn.broken = True
+                await self._release(conn)
+                if uncertain:
+                    raise TransferUncertain(
+                        f"No response to request {request['req_id']} ({type(e).__name__}: {e})"
+                    ) from e
+                if attempt + 1 >= attempts:
+                    raise
+                logger.warning("Deriv connection dropped - retrying on a fresh connection")
+                continue
+
+            conn.last_used = time.monotonic()
+            if response.get('req_id') not in (None, request['req_id']):
+                raise APIError(
+                    f"Deriv response req_id {response.get('req_id')} does not match request {request['req_id']}"
+                )
+            return response
+
+    async def dry_run(self, amount, login_id, trace=None):
+        with _maybe_step(trace, 'dry_run'):
+            return await self.request({
+                "paymentagent_transfer": 1,
+                "amount": float(amount),
+                "currency": "USD",
+                "transfer_to": str(login_id).strip(),
+                "dry_run": 1,
+            }, retry=True)
+
+    async def transfer(self, amount, login_id, trace=None):
+        # Never retried: a drop mid-request may hide a completed transfer
+        with _maybe_step(trace, 'transfer'):
+            return await self.request({
+                "paymentagent_transfer": 1,
+                "amount": float(amount),
+                "currency": "USD",
+                "transfer_to": str(login_id).strip(),
+            }, timeout=TRANSFER_TIMEOUT, uncertain=True)
+
+    async def close(self):
+        async with self._connect_lock:
+            if self._conn is not None:
+                await self._release(self._conn)
+
+
+async def close_executors():
+    """Hand back every executor's connection on the running loop."""
+    executors = _executors.pop(asyncio.get_running_loop(), {})
+    for executor in executors.values():
+        await executor.close()
+
+
+def get_executor(token=None, app_id=None):
+    """Shared-connection executor for ``token`` on the running event loop."""
+    loop = asyncio.get_running_loop()
+    token = token or settings.DERIV_AGENT_API_TOKEN
+    app_id = app_id or settings.DERIV_AGENT_APP_ID
+
+    executors = _executors.setdefault(loop, {})
+    key = (str(app_id), token)
+    executor = executors.get(key)
+    if executor is None:
+        executor = TransferExecutor(get_pool(token, app_id))
+        executors[key] = executor
+    return executor
@@ -0,0 +1,67 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+from deriv.simulator import DEFAULT_FLOAT, DerivSimulator
+
+
+class Command(BaseCommand):
+    help = 'Run a local Deriv websocket API simulator (set DERIV_ENDPOINT to point the app at it)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', type=str, default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=100,
+            help='Milliseconds added to every response',
+        )
+        parser.add_argument(
+            '--jitter',
+            type=float,
+            default=50,
+            help='Random +/- milliseconds on top of --latency',
+        )
+        parser.add_argument(
+            '--error-rate',
+            type=float,
+            default=0.0,
+            help='Fraction of transfers/withdrawals answered with an error (0-1)',
+        )
+        parser.add_argument(
+            '--drop-rate',
+            type=float,
+            default=0.0,
+            help='Fraction of requests answered by closing the connection (0-1)',
+        )
+        parser.add_argument(
+            '--balance',
+            type=str,
+            default=str(DEFAULT_FLOAT),
+            help='Starting payment agent float',
+        )
+        parser.add_argument(
+            '--name',
+            type=str,
+            default='Test Client',
+            help='Account holder name returned for every CR account',
+        )
+
+    def handle(self, *args, **options):
+        simulator = DerivSimulator(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'] / 1000,
+            jitter=options['jitter'] / 1000,
+            error_rate=options['error_rate'],
+            drop_rate=options['drop_rate'],
+            balance=options['balance'],
+            default_name=options['name'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Deriv simulator on {simulator.endpoint}"))
+        self.stdout.write(f"Set DERIV_ENDPOINT={simulator.endpoint} to use it. Ctrl+C to stop.")
+        try:
+            asyncio.run(simulator.serve())
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f"Stats: {simulator.stats}")
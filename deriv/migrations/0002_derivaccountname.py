@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deriv', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DerivAccountName',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('login_id', models.CharField(max_length=20, unique=True)),
+                ('full_name', models.CharField(max_length=255)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+        ),
+    ]
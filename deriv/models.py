@@ -6,4 +6,13 @@ class AuthDetails(models.Model):
     affiliate_token = models.CharField(max_length=255)
 
     def __str__(self):
-        return self.account_number
\ No newline at end of file
+        return self.account_number
+
+class DerivAccountName(models.Model):
+    """Account holder name Deriv returned for a login id in a transfer dry run."""
+    login_id = models.CharField(max_length=20, unique=True)
+    full_name = models.CharField(max_length=255)
+    fetched_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.login_id} - {self.full_name}"
@@ -0,0 +1,156 @@
+# deriv/name_cache.py
+"""
+Cache of Deriv account holder names, keyed by login id.
+
+Name verification only needs client_to_full_name from the
+paymentagent_transfer dry run, and repeat depositors send to the same CR
+account again and again. Every successful dry run stores the name here
+(DerivPaymentAgent.fetch_payment_agent_transfer_details does it), and
+fetch_recipient_details() answers from the cache before going to Deriv:
+
+    details = fetch_recipient_details(deriv_agent, net_amount, account_number)
+
+Lookups hit an in-process LRU first, then the DerivAccountName table.
+Entries expire after settings.DERIV_NAME_CACHE_TTL seconds, and amounts
+of settings.DERIV_NAME_CACHE_MAX_AMOUNT or more always get a live dry run.
+Callers that get a cached name which doesn't match should ask again with
+fresh=True before rejecting - the holder may have changed their name.
+"""
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import DerivAccountName
+
+logger = logging.getLogger(__name__)
+
+LRU_SIZE = 2048
+
+
+def _ttl():
+    return timedelta(seconds=getattr(settings, 'DERIV_NAME_CACHE_TTL', 7 * 24 * 3600))
+
+
+def _max_amount():
+    return Decimal(str(getattr(settings, 'DERIV_NAME_CACHE_MAX_AMOUNT', 500)))
+
+
+def _key(login_id):
+    return str(login_id or '').strip().upper()
+
+
+class _LRU:
+    def __init__(self, size):
+        self.size = size
+        self._entries = OrderedDict()   # login id -> (full_name, fetched_at)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, full_name, fetched_at):
+        with self._lock:
+            self._entries[key] = (full_name, fetched_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+_lru = _LRU(LRU_SIZE)
+
+
+def bypasses_cache(amount):
+    """True for transfers large enough that the name must come from Deriv."""
+    if amount is None:
+        return False
+    return Decimal(str(amount)) >= _max_amount()
+
+
+def lookup(login_id, amount=None):
+    """Cached holder name for ``login_id``, or None if missing, expired or bypassed."""
+    key = _key(login_id)
+    if not key or bypasses_cache(amount):
+        return None
+
+    now = timezone.now()
+    entry = _lru.get(key)
+    if entry is None:
+        row = DerivAccountName.objects.filter(login_id=key).values_list('full_name', 'fetched_at').first()
+        if row is None:
+            return None
+        entry = row
+        _lru.put(key, *entry)
+
+    full_name, fetched_at = entry
+    if now - fetched_at > _ttl():
+        _lru.discard(key)
+        return None
+    return full_name
+
+
+def store(login_id, full_name):
+    """Remember the name Deriv just returned for ``login_id``."""
+    key = _key(login_id)
+    if not key or not full_name:
+        return
+    fetched_at = timezone.now()
+    _lru.put(key, full_name, fetched_at)
+    try:
+        DerivAccountName.objects.update_or_create(
+            login_id=key, defaults={'full_name': full_name, 'fetched_at': fetched_at}
+        )
+    except Exception as e:
+        logger.warning(f"Could not store Deriv name for {key}: {e}")
+
+
+def closing_connection(func, *args):
+    """
+    Call ``func`` and close this thread's database connection afterwards.
+    For executor threads, which no request cycle ever cleans up.
+    """
+    try:
+        return func(*args)
+    finally:
+        connection.close()
+
+
+def fetch_recipient_details(deriv_agent, amount, login_id, fresh=False, trace=None):
+    """
+    Dry-run style details for a transfer to ``login_id``: from the cache when
+    possible (marked 'cached': True), otherwise a live dry run through the
+    Deriv service. Errors come back exactly as the dry run returns them.
+    """
+    from .service import deriv_service
+
+    if not fresh:
+        full_name = lookup(login_id, amount)
+        if full_name:
+            return {'client_to_full_name': full_name, 'client_to_loginid': _key(login_id), 'cached': True}
+
+    return deriv_service.run(deriv_agent.fetch_payment_agent_transfer_details(amount, login_id, trace=trace))
+
+
+async def afetch_recipient_details(deriv_agent, amount, login_id, fresh=False, trace=None):
+    """fetch_recipient_details() for coroutines already running on the Deriv loop."""
+    if not fresh:
+        # The cache may go to the database - not on the loop thread
+        full_name = await asyncio.to_thread(closing_connection, lookup, login_id, amount)
+        if full_name:
+            return {'client_to_full_name': full_name, 'client_to_loginid': _key(login_id), 'cached': True}
+
+    return await deriv_agent.fetch_payment_agent_transfer_details(amount, login_id, trace=trace)
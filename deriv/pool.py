@@ -0,0 +1,339 @@
+# deriv/pool.py
+"""
+Pool of authorised Deriv websocket connections, one pool per token.
+
+Opening a DerivAPI connection costs a TLS handshake, a ping and an
+authorize round-trip. The pool does that once and hands the same
+authorised connection to the next caller:
+
+    pool = get_pool(token)
+    async with pool.connection() as api:
+        response = await api.send({...})
+
+Idle connections are pinged by a background task, re-authorised when
+Deriv reports the session as unauthorised, and replaced when the socket
+drops. A drop also fails every request still waiting on that socket -
+deriv_api itself would leave them pending forever. DerivAPI objects belong to the event loop they were created on,
+so pools are kept per loop. Connections are only kept between calls on
+loops registered with register_persistent_loop(); on throwaway loops
+(asyncio.run) they are closed at checkin, exactly as before.
+
+Client tokens (OAuth, used for one withdrawal) get transient=True pools:
+the pool retires itself once its last idle connection has expired, and
+release_pool() drops it as soon as the withdrawal is done.
+"""
+import asyncio
+import logging
+import time
+import weakref
+from contextlib import asynccontextmanager
+
+from deriv_api import DerivAPI, APIError
+from deriv_api.errors import ResponseError
+from django.conf import settings
+from websockets.exceptions import ConnectionClosed
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 4
+HEALTH_CHECK_INTERVAL = 30      # seconds between pings of idle connections
+MAX_IDLE = 300                  # close connections idle for longer than this
+CHECKOUT_TIMEOUT = 15
+OPEN_TIMEOUT = 15               # ping + authorize of a new connection
+
+# What a dropped or stalled socket surfaces as
+CONNECTION_ERRORS = (asyncio.TimeoutError, ConnectionError, OSError, ConnectionClosed)
+
+# Deriv error codes that mean "authorise again", not "request failed"
+REAUTH_ERROR_CODES = {'AuthorizationRequired', 'InvalidToken'}
+
+_persistent_loops = weakref.WeakSet()
+_pools = weakref.WeakKeyDictionary()    # loop -> {(app_id, token): DerivConnectionPool}
+
+
+def register_persistent_loop(loop):
+    """Mark a long-lived loop whose pools should keep connections open."""
+    _persistent_loops.add(loop)
+
+
+def error_code(response_or_exc):
+    """Deriv error code from a response dict or a deriv_api exception."""
+    error = None
+    if isinstance(response_or_exc, dict):
+        error = response_or_exc.get('error')
+    else:
+        error = getattr(response_or_exc, 'error', None)
+        if error is None and isinstance(getattr(response_or_exc, 'args', None), tuple):
+            for arg in response_or_exc.args:
+                if isinstance(arg, dict) and arg.get('error'):
+                    error = arg['error']
+    if isinstance(error, dict):
+        return error.get('code')
+    # python-deriv-api's ResponseError carries the code as an attribute; other
+    # exceptions' .code (ConnectionClosed's close code) is not a Deriv error
+    if isinstance(response_or_exc, ResponseError):
+        return response_or_exc.code
+    return None
+
+
+def error_dict(exc):
+    """The Deriv error of a deriv_api exception as a response-style dict."""
+    error = getattr(exc, 'error', None)
+    if isinstance(error, dict):
+        return error
+    return {'code': error_code(exc), 'message': getattr(exc, 'message', None) or str(exc)}
+
+
+class PooledConnection:
+    def __init__(self, api):
+        self.api = api
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.broken = False
+        api.sanity_errors.subscribe(on_next=self._on_sanity_error)
+
+    def _on_sanity_error(self, error):
+        if isinstance(error, ConnectionClosed):
+            self.broken = True
+            self.fail_pending(error)
+
+    def fail_pending(self, error):
+        """Error every request still waiting for a response on this socket."""
+        for pending in list(self.api.pending_requests.values()):
+            if not pending.is_stopped:
+                pending.on_error(error)
+
+
+class DerivConnectionPool:
+    def __init__(self, app_id, token, max_size=DEFAULT_POOL_SIZE, keep_alive=True, endpoint=None, transient=False):
+        self.app_id = app_id
+        self.token = token
+        self.max_size = max_size
+        self.keep_alive = keep_alive
+        self.endpoint = endpoint
+        self.transient = transient
+        self._idle = []
+        self._size = 0
+        self._available = asyncio.Condition()
+        self._health_task = None
+        self._closed = False
+
+    # -----------------------------
+    # Connection lifecycle
+    # -----------------------------
+    async def _open(self):
+        kwargs = {'app_id': self.app_id}
+        if self.endpoint:
+            kwargs['endpoint'] = self.endpoint
+        api = DerivAPI(**kwargs)
+        # Wrapped first, so a drop during the handshake fails it straight away too
+        conn = PooledConnection(api)
+        try:
+            await asyncio.wait_for(self._handshake(api), OPEN_TIMEOUT)
+        except Exception:
+            await self._close_api(api)
+            raise
+        return conn
+
+    async def _handshake(self, api):
+        response = await api.ping({'ping': 1})
+        if not response.get('ping'):
+            raise APIError("Failed to ping Deriv API")
+        await self._authorize(api)
+
+    async def _authorize(self, api):
+        authorize = await api.authorize(self.token)
+        if not authorize or authorize.get('error'):
+            raise APIError("Failed to authorize with API token")
+        return authorize
+
+    @staticmethod
+    async def _close_api(api):
+        try:
+            await api.clear()
+        except Exception as e:
+            logger.debug(f"Error closing Deriv connection: {e}")
+
+    async def _discard(self, conn):
+        self._size -= 1
+        await self._close_api(conn.api)
+
+    # -----------------------------
+    # Checkout / checkin
+    # -----------------------------
+    async def checkout(self, timeout=CHECKOUT_TIMEOUT):
+        if self._closed:
+            raise APIError("Deriv connection pool is closed")
+        self._ensure_health_task()
+
+        deadline = time.monotonic() + timeout
+        async with self._available:
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    # Connections that sat idle past a health interval get a ping first
+                    if time.monotonic() - conn.last_used > HEALTH_CHECK_INTERVAL and not await self._is_healthy(conn):
+                        await self._discard(conn)
+                        continue
+                    return conn
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError("No Deriv connection available")
+                await asyncio.wait_for(self._available.wait(), remaining)
+
+        # Open outside the lock so other checkouts are not held up by the handshake
+        try:
+            return await self._open()
+        except Exception:
+            async with self._available:
+                self._size -= 1
+                self._available.notify()
+            raise
+
+    async def checkin(self, conn):
+        conn.last_used = time.monotonic()
+        async with self._available:
+            if conn.broken or not self.keep_alive or self._closed:
+                await self._discard(conn)
+            else:
+                self._idle.append(conn)
+            self._available.notify()
+
+    @asynccontextmanager
+    async def connection(self, timeout=CHECKOUT_TIMEOUT):
+        conn = await self.checkout(timeout)
+        try:
+            yield conn.api
+        except CONNECTION_ERRORS:
+            conn.broken = True
+            raise
+        except Exception as e:
+            # deriv_api surfaces a dropped socket as a generic error; be conservative
+            if error_code(e) is None:
+                conn.broken = True
+            raise
+        finally:
+            await self.checkin(conn)
+
+    async def send(self, request, retry=False):
+        """
+        Send one request on a pooled connection.
+        Re-authorises and resends once if Deriv says the session lost its
+        authorisation. Set retry=True only for idempotent requests (balance,
+        dry runs) - it also retries once on a fresh connection after a drop.
+        A real paymentagent_transfer must never be retried blindly.
+        """
+        attempts = 2 if retry else 1
+        for attempt in range(attempts):
+            try:
+                async with self.connection() as api:
+                    try:
+                        response = await api.send(request)
+                    except Exception as e:
+                        if error_code(e) not in REAUTH_ERROR_CODES:
+                            raise
+                        response = {'error': error_dict(e)}
+
+                    if error_code(response) in REAUTH_ERROR_CODES:
+                        logger.info("Deriv session lost authorisation - re-authorising")
+                        await self._authorize(api)
+                        response = await api.send(request)
+                    return response
+            except CONNECTION_ERRORS:
+                if attempt + 1 >= attempts:
+                    raise
+                logger.warning("Deriv connection dropped - retrying on a fresh connection")
+
+    # -----------------------------
+    # Health checks
+    # -----------------------------
+    async def _is_healthy(self, conn):
+        try:
+            response = await asyncio.wait_for(conn.api.ping({'ping': 1}), 10)
+            return bool(response.get('ping'))
+        except Exception:
+            return False
+
+    def _ensure_health_task(self):
+        if self.keep_alive and (self._health_task is None or self._health_task.done()):
+            self._health_task = asyncio.get_running_loop().create_task(self._health_loop())
+
+    async def _health_loop(self):
+        while not self._closed:
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+            async with self._available:
+                idle, self._idle = self._idle, []
+            keep = []
+            for conn in idle:
+                if time.monotonic() - conn.last_used > MAX_IDLE or not await self._is_healthy(conn):
+                    async with self._available:
+                        await self._discard(conn)
+                else:
+                    conn.last_used = time.monotonic()
+                    keep.append(conn)
+            async with self._available:
+                self._idle.extend(keep)
+                self._available.notify_all()
+                if self.transient and self._size == 0:
+                    # Nothing open and nothing being opened - don't keep a task per client token
+                    self._closed = True
+                    _forget_pool(self)
+                    return
+
+    async def close(self):
+        self._closed = True
+        if self._health_task:
+            self._health_task.cancel()
+        async with self._available:
+            idle, self._idle = self._idle, []
+            for conn in idle:
+                await self._discard(conn)
+            self._available.notify_all()
+
+    def stats(self):
+        return {'size': self._size, 'idle': len(self._idle), 'max_size': self.max_size}
+
+
+def get_pool(token=None, app_id=None, max_size=DEFAULT_POOL_SIZE, transient=False):
+    """Pool for ``token`` (the payment agent by default) on the running event loop."""
+    loop = asyncio.get_running_loop()
+    token = token or settings.DERIV_AGENT_API_TOKEN
+    app_id = app_id or settings.DERIV_AGENT_APP_ID
+    endpoint = getattr(settings, 'DERIV_ENDPOINT', None)
+
+    pools = _pools.setdefault(loop, {})
+    key = (str(app_id), token)
+    pool = pools.get(key)
+    if pool is None or pool._closed:
+        pool = DerivConnectionPool(
+            app_id, token, max_size=max_size,
+            keep_alive=loop in _persistent_loops, endpoint=endpoint, transient=transient,
+        )
+        pools[key] = pool
+    return pool
+
+
+def _forget_pool(pool):
+    pools = _pools.get(asyncio.get_running_loop(), {})
+    key = (str(pool.app_id), pool.token)
+    if pools.get(key) is pool:
+        del pools[key]
+
+
+async def release_pool(token, app_id=None):
+    """Close and drop the pool for ``token`` on the running loop (client tokens after use)."""
+    app_id = app_id or settings.DERIV_AGENT_APP_ID
+    pool = _pools.get(asyncio.get_running_loop(), {}).get((str(app_id), token))
+    if pool is not None:
+        _forget_pool(pool)
+        await pool.close()
+
+
+async def close_pools():
+    """Close every pool on the running loop."""
+    pools = _pools.pop(asyncio.get_running_loop(), {})
+    for pool in pools.values():
+        await pool.close()
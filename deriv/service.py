@@ -0,0 +1,107 @@
+# deriv/service.py
+"""
+Background event loop that owns all Deriv websocket I/O.
+
+Sync Django code used to wrap every Deriv call in asyncio.run(), paying
+for a fresh event loop and a fresh connection each time. Instead, one
+daemon thread runs a long-lived loop and the pooled connections in
+deriv.pool live on it:
+
+    from deriv.service import deriv_service
+
+    future = deriv_service.submit(agent.fetch_payment_agent_transfer_details(amount, cr))
+    details = future.result(timeout=30)
+
+    # or simply
+    details = deriv_service.run(agent.create_payment_agent_transfer(amount, cr))
+
+submit() is thread-safe and returns a concurrent.futures.Future, so any
+number of request threads can have deposits in flight on the same loop
+and the same connections at once.
+
+Coroutines submitted here must not touch the ORM or make blocking calls -
+do those in the calling thread, or wrap them in asyncio.to_thread().
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import os
+import threading
+
+from .executor import close_executors
+from .pool import close_pools, register_persistent_loop
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 60    # seconds run() waits for a Deriv call
+
+
+class DerivService:
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        self._ensure_started()
+        return self._loop
+
+    def _ensure_started(self):
+        # A forked worker inherits the attribute but not the thread - start again
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            ready = threading.Event()
+            self._loop = asyncio.new_event_loop()
+            register_persistent_loop(self._loop)
+            self._thread = threading.Thread(
+                target=self._run, args=(self._loop, ready), name='deriv-service', daemon=True
+            )
+            self._pid = os.getpid()
+            self._thread.start()
+            ready.wait()
+
+    @staticmethod
+    def _run(loop, ready):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    def submit(self, coro):
+        """Schedule ``coro`` on the Deriv loop; returns a concurrent.futures.Future."""
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro, timeout=DEFAULT_TIMEOUT):
+        """Submit ``coro`` and block the calling thread until it finishes."""
+        if self._thread is not None and threading.current_thread() is self._thread:
+            raise RuntimeError("deriv_service.run() called from the Deriv loop itself - await instead")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def stop(self, timeout=10):
+        if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(close_executors(), self._loop).result(timeout)
+            asyncio.run_coroutine_threadsafe(close_pools(), self._loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"Error closing Deriv pools: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+
+
+deriv_service = DerivService()
+atexit.register(deriv_service.stop)
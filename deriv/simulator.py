@@ -0,0 +1,289 @@
+# deriv/simulator.py
+"""
+Local stand-in for the Deriv websocket API, for load tests.
+
+Implements the subset DerivPaymentAgent uses - ping, authorize, balance
+(with subscribe), paymentagent_transfer (dry run and real),
+paymentagent_withdraw and verify_email - with configurable latency and
+error injection. Point the app at it with DERIV_ENDPOINT:
+
+    python manage.py deriv_simulator --port 8765 --latency 120 --error-rate 0.02
+    DERIV_ENDPOINT=ws://127.0.0.1:8765 python manage.py runserver
+
+or start it in-process (see the deriv_load_test command):
+
+    simulator = DerivSimulator(latency=0.1)
+    thread = simulator.start_in_thread()
+
+Responses follow the real API's envelope (echo_req, msg_type, req_id) so
+deriv_api matches them to requests exactly as it does against Deriv.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import random
+import threading
+import uuid
+from decimal import Decimal
+
+import websockets
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLOAT = Decimal('100000')
+AGENT_LOGINID = 'CR2107637'
+
+# Errors the real API returns for transfers, picked at random by error injection
+INJECTED_ERRORS = (
+    ('PaymentAgentTransferError', 'The payment agent transfer failed. Please try again.'),
+    ('RateLimit', 'You have reached the rate limit for paymentagent_transfer.'),
+    ('InternalServerError', 'Sorry, an error occurred while processing your request.'),
+)
+
+
+class DerivSimulator:
+    def __init__(self, host='127.0.0.1', port=8765, latency=0.1, jitter=0.05,
+                 error_rate=0.0, drop_rate=0.0, balance=DEFAULT_FLOAT,
+                 accounts=None, default_name='Test Client', seed=None):
+        """
+        latency/jitter: seconds added to every response (uniform +/- jitter).
+        error_rate: fraction of transfer/withdraw requests answered with an error.
+        drop_rate: fraction of any request answered by closing the socket.
+        accounts: {login_id: full name}; other CR ids resolve to default_name.
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.balance = Decimal(str(balance))
+        self.accounts = {key.upper(): value for key, value in (accounts or {}).items()}
+        self.default_name = default_name
+        self._random = random.Random(seed)
+        self._transaction_ids = itertools.count(500000000001)
+        self._balance_subscribers = {}     # websocket -> (subscription id, request)
+        self._loop = None
+        self._stopped = None
+        self.stats = {'requests': 0, 'errors_injected': 0, 'drops_injected': 0, 'transfers': 0}
+
+    # -----------------------------
+    # Server lifecycle
+    # -----------------------------
+    @property
+    def endpoint(self):
+        return f"ws://{self.host}:{self.port}"
+
+    async def serve(self, ready=None):
+        """Run until stop() is called; sets ``ready`` once listening."""
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        async with websockets.serve(self._handle, self.host, self.port):
+            logger.info(f"Deriv simulator listening on {self.endpoint}")
+            if ready is not None:
+                ready.set()
+            await self._stopped.wait()
+
+    def start_in_thread(self):
+        """Serve on a daemon thread; returns once the socket is listening."""
+        ready = threading.Event()
+        thread = threading.Thread(
+            target=asyncio.run, args=(self.serve(ready),), name='deriv-simulator', daemon=True
+        )
+        thread.start()
+        if not ready.wait(10):
+            raise RuntimeError("Deriv simulator did not start")
+        return thread
+
+    def stop(self):
+        if self._loop is not None and self._stopped is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    # -----------------------------
+    # Connection handling
+    # -----------------------------
+    async def _handle(self, websocket, path=None):
+        session = {'authorized': None}
+        try:
+            async for raw in websocket:
+                try:
+                    request = json.loads(raw)
+                except ValueError:
+                    continue
+                # One task per request so a slow response doesn't hold up the socket,
+                # just like the real API answering out of order
+                asyncio.create_task(self._respond(websocket, session, request))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._balance_subscribers.pop(websocket, None)
+
+    async def _respond(self, websocket, session, request):
+        self.stats['requests'] += 1
+        delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self.drop_rate and self._random.random() < self.drop_rate:
+            self.stats['drops_injected'] += 1
+            await websocket.close()
+            return
+
+        response = self._dispatch(websocket, session, request)
+        response.setdefault('echo_req', request)
+        if 'req_id' in request:
+            response['req_id'] = request['req_id']
+        if 'passthrough' in request:
+            response['passthrough'] = request['passthrough']
+        try:
+            await websocket.send(json.dumps(response, default=str))
+        except websockets.ConnectionClosed:
+            pass
+
+    def _dispatch(self, websocket, session, request):
+        if 'ping' in request:
+            return {'msg_type': 'ping', 'ping': 'pong'}
+        if 'authorize' in request:
+            return self._authorize(session, request)
+        if 'forget' in request or 'forget_all' in request:
+            self._balance_subscribers.pop(websocket, None)
+            return {'msg_type': 'forget', 'forget': 1}
+
+        if session['authorized'] is None:
+            return self._error(request, 'AuthorizationRequired', 'Please log in.')
+
+        if 'balance' in request:
+            return self._balance(websocket, request)
+        if 'paymentagent_transfer' in request:
+            return self._transfer(request)
+        if 'paymentagent_withdraw' in request:
+            return self._withdraw(session, request)
+        if 'verify_email' in request:
+            return {'msg_type': 'verify_email', 'verify_email': 1}
+        if 'statement' in request:
+            return {'msg_type': 'statement', 'statement': {'count': 0, 'transactions': []}}
+
+        msg_type = next(iter(request), 'unknown')
+        return self._error(request, 'UnrecognisedRequest', f"Unrecognised request: {msg_type}")
+
+    @staticmethod
+    def _error(request, code, message):
+        msg_type = next((key for key in request if key not in ('req_id', 'passthrough')), 'error')
+        return {'msg_type': msg_type, 'error': {'code': code, 'message': message}}
+
+    def _inject_error(self, request):
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.stats['errors_injected'] += 1
+            return self._error(request, *self._random.choice(INJECTED_ERRORS))
+        return None
+
+    def _name_for(self, login_id):
+        return self.accounts.get(str(login_id).upper(), self.default_name)
+
+    # -----------------------------
+    # API calls
+    # -----------------------------
+    def _authorize(self, session, request):
+        token = request.get('authorize')
+        if not token:
+            return self._error(request, 'InvalidToken', 'The token is invalid.')
+        session['authorized'] = token
+        return {
+            'msg_type': 'authorize',
+            'authorize': {
+                'loginid': AGENT_LOGINID,
+                'currency': 'USD',
+                'balance': float(self.balance),
+                'fullname': 'Payment Agent',
+                'is_virtual': 0,
+            },
+        }
+
+    def _balance_payload(self, subscription_id=None):
+        payload = {
+            'msg_type': 'balance',
+            'balance': {'balance': float(self.balance), 'currency': 'USD', 'loginid': AGENT_LOGINID},
+        }
+        if subscription_id:
+            payload['balance']['id'] = subscription_id
+            payload['subscription'] = {'id': subscription_id}
+        return payload
+
+    def _balance(self, websocket, request):
+        if request.get('subscribe'):
+            subscription_id = uuid.uuid4().hex
+            self._balance_subscribers[websocket] = (subscription_id, request)
+            return self._balance_payload(subscription_id)
+        return self._balance_payload()
+
+    def _push_balance(self):
+        for websocket, (subscription_id, request) in list(self._balance_subscribers.items()):
+            payload = self._balance_payload(subscription_id)
+            payload['echo_req'] = request
+            if 'req_id' in request:
+                payload['req_id'] = request['req_id']
+            asyncio.create_task(self._send_quietly(websocket, payload))
+
+    @staticmethod
+    async def _send_quietly(websocket, payload):
+        try:
+            await websocket.send(json.dumps(payload, default=str))
+        except websockets.ConnectionClosed:
+            pass
+
+    def _transfer(self, request):
+        login_id = str(request.get('transfer_to', '')).strip().upper()
+        amount = Decimal(str(request.get('amount', 0)))
+        if not login_id.startswith('CR'):
+            return self._error(request, 'PaymentAgentTransferError', 'Invalid login ID.')
+        if amount <= 0:
+            return self._error(request, 'PaymentAgentTransferError', 'Invalid amount.')
+        if amount > self.balance:
+            return self._error(request, 'PaymentAgentTransferError', 'Your account balance is insufficient for this transaction.')
+
+        if request.get('dry_run'):
+            return {
+                'msg_type': 'paymentagent_transfer',
+                'paymentagent_transfer': 2,
+                'client_to_full_name': self._name_for(login_id),
+                'client_to_loginid': login_id,
+            }
+
+        injected = self._inject_error(request)
+        if injected:
+            return injected
+
+        self.balance -= amount
+        self.stats['transfers'] += 1
+        self._push_balance()
+        return {
+            'msg_type': 'paymentagent_transfer',
+            'paymentagent_transfer': 1,
+            'client_to_full_name': self._name_for(login_id),
+            'client_to_loginid': login_id,
+            'transaction_id': next(self._transaction_ids),
+        }
+
+    def _withdraw(self, session, request):
+        amount = Decimal(str(request.get('amount', 0)))
+        if amount <= 0:
+            return self._error(request, 'PaymentAgentWithdrawError', 'Invalid amount.')
+        if not request.get('verification_code') and not request.get('dry_run'):
+            return self._error(request, 'InvalidToken', 'Your verification code is invalid.')
+
+        if request.get('dry_run'):
+            return {'msg_type': 'paymentagent_withdraw', 'paymentagent_withdraw': 2, 'paymentagent_name': 'Payment Agent'}
+
+        injected = self._inject_error(request)
+        if injected:
+            return injected
+
+        self.balance += amount
+        self._push_balance()
+        return {
+            'msg_type': 'paymentagent_withdraw',
+            'paymentagent_withdraw': 1,
+            'paymentagent_name': 'Payment Agent',
+            'transaction_id': next(self._transaction_ids),
+        }
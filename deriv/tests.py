@@ -1,3 +1,24 @@
-from django.test import TestCase
+from deriv_api.errors import ResponseError
+from django.test import SimpleTestCase
+from websockets.exceptions import ConnectionClosed
+from websockets.frames import Close
 
-# Create your tests here.
+from .pool import error_code, error_dict
+
+
+class ErrorCodeTests(SimpleTestCase):
+    def test_reads_the_code_of_a_deriv_error(self):
+        error = ResponseError({
+            'error': {'code': 'InvalidToken', 'message': 'The token is invalid.'},
+            'echo_req': {'authorize': 'x'},
+            'msg_type': 'authorize',
+        })
+        self.assertEqual(error_code(error), 'InvalidToken')
+        self.assertEqual(error_dict(error), {'code': 'InvalidToken', 'message': 'The token is invalid.'})
+
+    def test_a_dropped_socket_is_not_a_deriv_error(self):
+        self.assertIsNone(error_code(ConnectionClosed(Close(1000, ''), None)))
+
+    def test_reads_the_code_of_a_response(self):
+        self.assertEqual(error_code({'error': {'code': 'RateLimit'}}), 'RateLimit')
+        self.assertIsNone(error_code({'balance': {}}))
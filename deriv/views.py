@@ -8,8 +8,6 @@ import uuid
 import requests
 from datetime import datetime
 from decimal import Decimal
-from difflib import SequenceMatcher
-import random
 from django.conf import settings
 from django.http import JsonResponse, HttpResponseRedirect, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
@@ -20,7 +18,12 @@ from rest_framework.response import Response
 from rest_framework import status
 from deriv_api import DerivAPI, APIError
 from accounts.models import User
+from accounts.phone import to_msisdn
 from .models import AuthDetails
+from . import name_cache
+from .executor import TransferUncertain, get_executor
+from .pool import get_pool
+from .service import deriv_service
 from whatsapp.models import InitiateSellOrders
 from finance.models import AuditLog
 from finance.models import EcoCashTransaction
@@ -31,37 +34,7 @@ BASE_EXPO_URL = "finpal://complete-withdrawal"
 
 # Utility Functions
 def phone_number_formatter(phone_number):
-    if phone_number[0] == '0':
-        phone_number = '263' + phone_number[1:]
-    if phone_number[0] == '+':
-        phone_number = phone_number[1:]
-    if phone_number[0] == '7':
-        phone_number = '263' + phone_number
-    if phone_number[0] == '2':
-        phone_number = phone_number
-    return phone_number.replace(" ", "")
-
-def normalize_name(name: str) -> set:
-    """
-    Normalize a name into a set of lowercase tokens for comparison.
-    Removes common prefixes (Mr, Mrs, Ms, Miss, Dr, etc.).
-    """
-    if not name:
-        return set()
-
-    # Remove titles like Mr, Mrs, Dr, etc.
-    name = re.sub(r"^(mr|mrs|ms|miss|dr)\.?\s+", "", name, flags=re.IGNORECASE)
-
-    # Split into parts, lowercase, strip punctuation
-    tokens = re.split(r"\s+", name.strip())
-    return set(token.lower().strip(".") for token in tokens if token)
-
-def names_match(name1: str, name2: str) -> bool:
-    """Return True if names are similar enough to allow processing."""
-    n1, n2 = normalize_name(name1), normalize_name(name2)
-    # Calculate similarity ratio
-    ratio = SequenceMatcher(None, n1, n2).ratio()
-    return ratio >= 0.75  # Allow minor differences (initials, titles, etc.)
+    return to_msisdn(phone_number)
 
 def send_sms(ecocash_number, amount, ecocash_name, destination="263788261000"):
     url = "https://mobile.esolutions.co.zw/bmg/api/single"
@@ -82,7 +55,7 @@ def send_sms(ecocash_number, amount, ecocash_name, destination="263788261000"):
     }
 
     try:
-        response = requests.post(url, json=payload, auth=auth)
+        response = requests.post(url, json=payload, auth=auth, timeout=30)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -102,7 +75,10 @@ async def initialize_sell_api(token, app_id):
     """
     try:
         print(f" >>>>>>>>>>>>>>>>>>>>>>>>>  Received Deriv Auth API: {token[:10]}...")
-        api = DerivAPI(app_id=app_id)
+        kwargs = {'app_id': app_id}
+        if getattr(settings, 'DERIV_ENDPOINT', None):
+            kwargs['endpoint'] = settings.DERIV_ENDPOINT
+        api = DerivAPI(**kwargs)
         
         # Ping the API
         response = await api.ping({'ping': 1})
@@ -136,8 +112,8 @@ class DerivPaymentAgent:
     """Class to handle Deriv API operations for payment agent transfers and withdrawals."""
     
     def __init__(self):
-        self.app_id = 115043
-        self.api_token = "ktNM7pwMjvGKtf2"
+        self.app_id = settings.DERIV_AGENT_APP_ID
+        self.api_token = settings.DERIV_AGENT_API_TOKEN
         self.whatsapp_number = settings.WHATSAPP_NUMBER
         
         if not self.api_token:
@@ -167,15 +143,18 @@ class DerivPaymentAgent:
             logging.error(f"API initialization error: {str(e)}")
             return None
     
+    def _pool(self):
+        """Pooled, already-authorised connections for the payment agent token."""
+        return get_pool(self.api_token, self.app_id)
+    
+    def _executor(self):
+        """One shared session for dry runs and transfers, multiplexed by req_id."""
+        return get_executor(self.api_token, self.app_id)
+    
     async def check_balance(self):
         """Check account balance."""
-        api = None
         try:
-            api = await self._initialize_api()
-            if not api:
-                return None
-            
-            response = await api.balance()
+            response = await self._pool().send({'balance': 1}, retry=True)
             balance_info = response.get('balance')
             if balance_info:
                 print(f"Your current balance is {balance_info['currency']} {balance_info['balance']}")
@@ -186,66 +165,44 @@ class DerivPaymentAgent:
             print(f"Error checking balance: {str(e)}")
             logging.error(f"Balance check error: {str(e)}")
             return None
-        finally:
-            if api:
-                await api.clear()
     
-    async def fetch_payment_agent_transfer_details(self, amount, account_number):
+    async def fetch_payment_agent_transfer_details(self, amount, account_number, trace=None):
         """Fetch payment agent transfer details (dry run)."""
         print(f"Fetching payment agent transfer details for amount: {amount}, account: {account_number}")
         
-        api = None
         try:
-            api = await self._initialize_api()
-            if not api:
-                return None
-            
-            paymentagent_transfer = {
-                "paymentagent_transfer": 1,
-                "amount": float(amount),
-                "currency": "USD",
-                "transfer_to": str(account_number).strip(),
-                "dry_run": 1
-            }
-            
-            response = await api.send(paymentagent_transfer)
+            # Shared session: the transfer that follows goes out on the same connection
+            response = await self._executor().dry_run(amount, account_number, trace=trace)
             
             if response.get('error'):
-                message = f"Fetch error: {response['error']['message']}"
+                message = f"Fetch error: {response['error'].get('message', response['error'].get('code'))}"
                 return self._get_whatsapp_url(message)
             
             print(f"Transfer details fetched: {response}")
             logging.info(f"Transfer details fetched: {response}")
+            if response.get('client_to_full_name'):
+                # ORM work stays off the event loop, and off the caller's critical path
+                asyncio.get_running_loop().run_in_executor(
+                    None, name_cache.closing_connection, name_cache.store,
+                    response.get('client_to_loginid') or account_number,
+                    response['client_to_full_name'],
+                )
             return response
             
         except Exception as e:
             message = f"Error fetching payment agent details: {str(e)}"
             print(message)
             return self._get_whatsapp_url(message)
-        finally:
-            if api:
-                await api.clear()
 
     
     
-    async def create_payment_agent_transfer(self, amount, account_number):
+    async def create_payment_agent_transfer(self, amount, account_number, trace=None):
         """Create actual payment agent transfer."""
-        api = None
         try:
-            api = await self._initialize_api()
-            if not api:
-                return None
-                        
-            paymentagent_transfer = {
-                "paymentagent_transfer": 1,
-                "amount": float(amount),
-                "currency": "USD",
-                "transfer_to": str(account_number).strip()
-            }
-            
-            response = await api.send(paymentagent_transfer)
+            # Not idempotent - never resent after a dropped connection
+            response = await self._executor().transfer(amount, account_number, trace=trace)
             if response.get('error'):
-                message = f"Transfer error: {response['error']['message']}"
+                message = f"Transfer error: {response['error'].get('message', response['error'].get('code'))}"
                 logger.error(message)
                 return self._get_whatsapp_url(message)
             
@@ -253,24 +210,25 @@ class DerivPaymentAgent:
             logging.info(f"Transfer successful: {response}")
             return response
             
+        except TransferUncertain:
+            # May have been paid - the caller must not treat it as a failure
+            raise
         except Exception as e:
             message = f"Error creating payment agent transfer: {str(e)}"
             print(message)
             return self._get_whatsapp_url(message)
-        finally:
-            if api:
-                await api.clear()
+    
+    def _client_pool(self, token):
+        """
+        Pool for a client's OAuth token. verify_email opens the connection and
+        leaves it authorised, so the withdrawal a few minutes later skips the
+        handshake; release_pool() closes it once the withdrawal is done.
+        """
+        return get_pool(token, self.app_id, max_size=1, transient=True)
     
     async def process_withdrawal(self, amount, client_loginid, code, token):
         """Process withdrawal from client User."""
-        api = None
         try:
-            # Use the new initialize_sell_api function for sell operations
-            api = await initialize_sell_api(token, self.app_id)
-            if not api:
-                logger.error("Failed to initialize sell API for withdrawal")
-                return {"error": "API initialization failed"}
-            
             withdrawal_request = {
                 "paymentagent_withdraw": 1,
                 "amount": float(amount),
@@ -280,7 +238,8 @@ class DerivPaymentAgent:
                 "verification_code": code,
             }
             
-            response = await api.send(withdrawal_request)
+            # Not idempotent - sent once, never retried after a drop
+            response = await self._client_pool(token).send(withdrawal_request)
             if response.get('error'):
                 error_msg = f"Withdrawal error: {response['error']['message']}"
                 print(error_msg)
@@ -303,33 +262,27 @@ class DerivPaymentAgent:
             return response
             
         except Exception as e:
-            error_msg = f"Error processing withdrawal: {str(e)}"
+            # deriv_api raises on error responses
+            error = getattr(e, 'error', None)
+            if isinstance(error, dict) and error.get('message'):
+                error_msg = f"Withdrawal error: {error['message']}"
+            else:
+                error_msg = f"Error processing withdrawal: {str(e)}"
             print(error_msg)
             logging.exception("Withdrawal processing error")
             return {"error": error_msg}
-        finally:
-            if api:
-                await api.clear()
     
     async def verify_email(self, email, amount, token, trader):
         """Send verification email for withdrawal."""
-        from whatsapp.services import WhatsAppService
-        service = WhatsAppService()
+        from whatsapp.outbox import whatsapp_outbox
         
-        api = None
         try:
-            # Use the new initialize_sell_api function
-            api = await initialize_sell_api(token, self.app_id)
-            if not api:
-                logger.error("API initialization failed in verify_email")
-                return {"error": "API initialization failed"}
-            
             verify_request = {
                 "verify_email": email,
                 "type": "paymentagent_withdraw",
             }
             
-            response = await api.send(verify_request)
+            response = await self._client_pool(token).send(verify_request)
             
             print(f"verify_email response type: {type(response)}, value: {response}")
             
@@ -345,7 +298,7 @@ class DerivPaymentAgent:
                     return {"error": error_msg}
                 else:
                     message = "Verification link has been sent to your email. Please click the link to finish the withdrawal process"
-                    service.cancel_button(trader.phone_number, message)
+                    whatsapp_outbox.cancel_button(trader.phone_number, message)
                     return response
             else:
                 # Unexpected response type
@@ -353,13 +306,44 @@ class DerivPaymentAgent:
                 return {"error": f"Unexpected API response type: {type(response)}"}
             
         except Exception as e:
-            error_msg = f"Error processing withdrawal: {str(e)}"
+            error = getattr(e, 'error', None)
+            if isinstance(error, dict) and error.get('message'):
+                error_msg = f"Client verification failed: {error['message']}"
+            else:
+                error_msg = f"Error processing withdrawal: {str(e)}"
             logger.error(error_msg)
             logging.exception("Email verification error")
             return {"error": error_msg}
-        finally:
-            if api:
-                await api.clear()
+
+    async def fetch_statement(self, date_from, date_to, page_size=999):
+        """
+        Fetch the payment agent account statement between two datetimes.
+        Returns a list of statement rows, or None if the API call failed.
+        """
+        try:
+            rows = []
+            offset = 0
+            while True:
+                response = await self._pool().send({
+                    "statement": 1,
+                    "description": 1,
+                    "date_from": int(date_from.timestamp()),
+                    "date_to": int(date_to.timestamp()),
+                    "limit": page_size,
+                    "offset": offset,
+                }, retry=True)
+                if response.get('error'):
+                    logger.error(f"Statement error: {response['error'].get('message')}")
+                    return None
+
+                page = response.get('statement', {}).get('transactions', [])
+                rows.extend(page)
+                if len(page) < page_size:
+                    return rows
+                offset += page_size
+        except Exception as e:
+            logger.error(f"Statement fetch error: {str(e)}")
+            return None
 
 class DerivCallbackHandler:
     """Handler for Deriv API callbacks."""
@@ -381,16 +365,37 @@ class DerivCallbackHandler:
             </html>
         """)
     
+    @staticmethod
+    def _record_withdrawal(order, status, deriv_id=None, notes=""):
+        return EcoCashTransaction.objects.create(
+            user=order.trader,
+            amount=order.amount,
+            deriv_account_number=order.account_number,
+            ecocash_number=order.ecocash_number,
+            ecocash_name=order.ecocash_name,
+            charge=0,
+            reference_number=EcoCashTransaction.generate_reference_number("WD"),
+            deriv_transaction_id=deriv_id,
+            transaction_type='withdrawal',
+            status=status,
+            admin_notes=notes,
+        )
+    
     @staticmethod
     def verify_email_callback(request):
-        """Handle email verification callback for Sell orders only."""
+        """
+        Handle email verification callback for Sell orders only.
+        The Deriv side runs as one pipeline (deriv.withdrawals). The payout SMS
+        is sent inline and its outcome recorded on the withdrawal; WhatsApp
+        messages are queued so the redirect goes back at once.
+        """
+        from whatsapp.outbox import whatsapp_outbox
+        from .withdrawals import run_withdrawal
+        
         code = request.GET.get('code')
         account_number = request.GET.get('loginid')
         print("Retrieved account number:", account_number)
         
-        from whatsapp.services import WhatsAppService
-        service = WhatsAppService()
-        
         if not code:
             return HttpResponseRedirect("https://wa.me/message/PEDVFTGBHHP4M1")
         
@@ -401,178 +406,129 @@ class DerivCallbackHandler:
             
             try:
                 # Get order (Sell only)
-                order = InitiateSellOrders.objects.get(account_number=account_number)
-                trader = User.objects.get(phone_number=order.trader.phone_number)
+                order = InitiateSellOrders.objects.select_related('trader').get(account_number=account_number)
+                trader = order.trader
                 deriv_agent = DerivPaymentAgent()
                 
-                # First, fetch payment agent transfer details to get the name
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                
-                details_result = loop.run_until_complete(
-                    deriv_agent.fetch_payment_agent_transfer_details(order.amount, account_number)
-                )
-                
-                if isinstance(details_result, dict) and 'client_to_full_name' in details_result:
-                    deriv_name = details_result['client_to_full_name']
+                try:
+                    outcome = deriv_service.run(run_withdrawal(
+                        deriv_agent,
+                        order.amount,
+                        order.account_number,
+                        order.ecocash_name,
+                        code,
+                        token.token,
+                    ), timeout=None)
+                    print("Withdrawal outcome:", outcome['status'], outcome['result'])
                     
-                    try:
-                        # Name verification
-                        deriv_tokens = normalize_name(deriv_name)
-                        local_tokens = normalize_name(order.ecocash_name)
-                        
-                        if deriv_tokens & local_tokens:
-                            print("Names match:", deriv_name, order.ecocash_name)
-                            # Names match - proceed with withdrawal
-                            result = asyncio.run(deriv_agent.process_withdrawal(
-                                order.amount, 
-                                order.account_number, 
-                                code, 
-                                token.token
-                            ))
-                            
-                            print("Withdrawal result:", result)
-                            
-                            # Check if result contains error
-                            if isinstance(result, dict) and result.get('error'):
-                                error_msg = result['error']
-                                logger.error(f"Withdrawal failed: {error_msg}")
-                                
-                                # Create failed transaction
-                                transaction = EcoCashTransaction.objects.create(
-                                    user=order.trader,
-                                    amount=order.amount,
-                                    deriv_account_number=order.account_number,
-                                    ecocash_number=order.ecocash_number,
-                                    ecocash_name=order.ecocash_name,
-                                    charge=0,
-                                    reference_number=f"WD{datetime.now().strftime('%Y%m%d%H%M%S')}",
-                                    transaction_type='withdrawal',
-                                    status='failed',
-                                )
-                                
-                                message = (
-                                    "*⚠️ Order Processing Failed* \n\n"
-                                    f"📦 Order Number: {order.account_number} \n"
-                                    f"🔖 Reference Number: {transaction.reference_number} \n\n"
-                                    f"Error: {error_msg}\n\n"
-                                    "Please try again or contact our support team for assistance."
-                                )
-                                service.home_button(trader.phone_number, message)
-                                order.delete()
-                                return HttpResponseRedirect(f"https://wa.me/{settings.WHATSAPP_NUMBER}?text={error_msg.replace(' ', '%20')}")
-                            
-                            paymentagent_transfer = result.get('paymentagent_withdraw') if result else None
-                            deriv_id = result.get('transaction_id') if result else None
-                            
-                            if paymentagent_transfer == 1:
-                                # Successful withdrawal
-                                transaction = EcoCashTransaction.objects.create(
-                                    user=order.trader,
-                                    amount=order.amount,
-                                    deriv_account_number=order.account_number,
-                                    ecocash_number=order.ecocash_number,
-                                    ecocash_name=order.ecocash_name,
-                                    charge=0,
-                                    reference_number=f"WD{datetime.now().strftime('%Y%m%d%H%M%S')}",
-                                    deriv_transaction_id=deriv_id,
-                                    transaction_type='withdrawal',
-                                    status='completed',
-                                )
-                                
-                                # Send SMS notification
-                                clean_number = re.sub(r"\s+", "", order.ecocash_number)
-                                sms_response = send_sms(clean_number, order.amount, order.ecocash_name)
-                                print("SMS API Response:", sms_response)
-                                
-                                # Notify support staff
-                                message_support = f"User {trader.phone_number} with ecocash number {order.ecocash_number} has completed a withdrawal transaction with reference {transaction.reference_number} and is now waiting for disbursement."
-                                try:
-                                    recipients = User.objects.filter(user_type="support")
-                                    if recipients.exists():
-                                        recipient = random.choice(list(recipients))
-                                        # Send notification to support (implement your notification method)
-                                        logger.info(f"Notification sent to support: {message_support}")
-                                    else:
-                                        raise User.DoesNotExist
-                                except User.DoesNotExist:
-                                    logger.error(f"Failed to send withdrawal notification for {transaction.reference_number}")
-                                
-                                message = (
-                                    "🎉 Congratulations! Your Withdrawal Was Successful.\n\n"
-                                    f"Your funds have been sent to your EcoCash wallet:\n\n"
-                                    f"💰 Amount: ${order.amount}\n"
-                                    f"📱 EcoCash Number: {order.ecocash_number}\n"
-                                    f"👤 Ecocash Name: {order.ecocash_name}\n"
-                                    f"🔖 Reference: {transaction.reference_number}\n\n"
-                                    "Thank you for using Supreme Traders!\n"
-                                    "If you need anything else, type MENU to return to the main menu."
-                                )
-                                service.home_button(trader.phone_number, message)
-                                from whatsapp.models import Switch
-                                switch= Switch.objects.get(transaction_type='withdrawal')
-                                if switch:
-                                    if switch.on_message:
-                                        service.home_button(transaction.user.phone_number, switch.on_message)
-                                    else:
-                                        pass
-                                return
-                            else:
-                                # Failed withdrawal
-                                transaction = EcoCashTransaction.objects.create(
-                                    user=order.trader,
-                                    amount=order.amount,
-                                    deriv_account_number=order.account_number,
-                                    ecocash_number=order.ecocash_number,
-                                    ecocash_name=order.ecocash_name,
-                                    charge=0,
-                                    reference_number=f"WD{datetime.now().strftime('%Y%m%d%H%M%S')}",
-                                    transaction_type='withdrawal',
-                                    status='failed',
-                                )
-                                
-                                message = (
-                                    "*⚠️ Order Processing Failed* \n\n"
-                                    f"📦 Order Number: {order.account_number} \n"
-                                    f"🔖 Reference Number: {transaction.reference_number} \n\n"
-                                    "Please try again or contact our support team for assistance."
-                                )
-                                service.home_button(trader.phone_number, message)
-                            
-                            order.delete()
-                            return HttpResponseRedirect(f"https://wa.me/{settings.WHATSAPP_NUMBER}?text=Withdrawal%20processed")
-                        else:
-                            # Names don't match
-                            mismatch_msg = (
-                                "⚠️ Name verification failed.\n\n"
-                                f"Deriv Account Name: {deriv_name}\n"
-                                f"Ecocash Registered Name: {order.ecocash_name}\n\n"
-                                "Please note that we do not process third party payments. "
-                                "If you believe this is an error, please contact Support."
-                            )
-                            service.home_button(trader.phone_number, mismatch_msg)
-                            order.delete()
-                            return HttpResponseRedirect(f"https://wa.me/{settings.WHATSAPP_NUMBER}?text=Name%20verification%20failed")
+                    if outcome['status'] == 'no_details':
+                        # Could not fetch client details
+                        error_msg = "⚠️ Could not fetch Client details. Please contact support."
+                        whatsapp_outbox.home_button(trader.phone_number, error_msg)
+                        order.delete()
+                        return HttpResponseRedirect(f"https://wa.me/{settings.WHATSAPP_NUMBER}?text=Could%20not%20fetch%20client%20details")
                     
-                    except Exception as e:
-                        print("Error during withdrawal processing:", e)
-                        logger.exception("Withdrawal processing error")
+                    if outcome['status'] == 'name_mismatch':
+                        mismatch_msg = (
+                            "⚠️ Name verification failed.\n\n"
+                            f"Deriv Account Name: {outcome['deriv_name']}\n"
+                            f"Ecocash Registered Name: {order.ecocash_name}\n\n"
+                            "Please note that we do not process third party payments. "
+                            "If you believe this is an error, please contact Support."
+                        )
+                        whatsapp_outbox.home_button(trader.phone_number, mismatch_msg)
+                        order.delete()
+                        return HttpResponseRedirect(f"https://wa.me/{settings.WHATSAPP_NUMBER}?text=Name%20verification%20failed")
+                    
+                    print("Names match:", outcome['deriv_name'], order.ecocash_name)
+                    
+                    if outcome['status'] == 'failed':
+                        error_msg = outcome['error']
+                        logger.error(f"Withdrawal failed: {error_msg}")
                         
+                        transaction = DerivCallbackHandler._record_withdrawal(order, 'failed')
                         message = (
                             "*⚠️ Order Processing Failed* \n\n"
-                            f"📦 Order Number: {order.account_number} \n\n"
-                            f"Error: {str(e)}\n\n"
+                            f"📦 Order Number: {order.account_number} \n"
+                            f"🔖 Reference Number: {transaction.reference_number} \n\n"
+                            f"Error: {error_msg}\n\n"
                             "Please try again or contact our support team for assistance."
                         )
-                        service.home_button(trader.phone_number, message)
+                        whatsapp_outbox.home_button(trader.phone_number, message)
                         order.delete()
-                        return HttpResponseRedirect(f"https://wa.me/{settings.WHATSAPP_NUMBER}?text={str(e).replace(' ', '%20')}")
-                else:
-                    # Could not fetch client details
-                    error_msg = "⚠️ Could not fetch Client details. Please contact support."
-                    service.home_button(trader.phone_number, error_msg)
+                        return HttpResponseRedirect(f"https://wa.me/{settings.WHATSAPP_NUMBER}?text={error_msg.replace(' ', '%20')}")
+                    
+                    if outcome['status'] == 'completed':
+                        # Successful withdrawal
+                        # Recorded before the SMS goes out, so a crash mid-send still leaves a trace
+                        transaction = DerivCallbackHandler._record_withdrawal(
+                            order, 'completed', deriv_id=outcome['result'].get('transaction_id'),
+                            notes="Payout SMS pending",
+                        )
+                        
+                        # EcoCash payout instruction - sent before replying, never from a
+                        # memory queue, and the outcome kept on the withdrawal row
+                        clean_number = re.sub(r"\s+", "", order.ecocash_number)
+                        sms_response = send_sms(clean_number, order.amount, order.ecocash_name)
+                        print("SMS API Response:", sms_response)
+                        if sms_response is None:
+                            transaction.admin_notes = (
+                                f"Payout SMS not confirmed by the gateway - pay {clean_number} "
+                                f"${order.amount} manually if it never arrived"
+                            )
+                        else:
+                            transaction.admin_notes = f"Payout SMS sent: {sms_response}"
+                        transaction.save(update_fields=['admin_notes'])
+                        
+                        # Notify support staff
+                        message_support = f"User {trader.phone_number} with ecocash number {order.ecocash_number} has completed a withdrawal transaction with reference {transaction.reference_number} and is now waiting for disbursement."
+                        if User.objects.filter(user_type="support").exists():
+                            logger.info(f"Notification sent to support: {message_support}")
+                        else:
+                            logger.error(f"Failed to send withdrawal notification for {transaction.reference_number}")
+                        
+                        message = (
+                            "🎉 Congratulations! Your Withdrawal Was Successful.\n\n"
+                            f"Your funds have been sent to your EcoCash wallet:\n\n"
+                            f"💰 Amount: ${order.amount}\n"
+                            f"📱 EcoCash Number: {order.ecocash_number}\n"
+                            f"👤 Ecocash Name: {order.ecocash_name}\n"
+                            f"🔖 Reference: {transaction.reference_number}\n\n"
+                            "Thank you for using Supreme Traders!\n"
+                            "If you need anything else, type MENU to return to the main menu."
+                        )
+                        whatsapp_outbox.home_button(trader.phone_number, message)
+                        from whatsapp.models import Switch
+                        switch = Switch.objects.filter(transaction_type='withdrawal').first()
+                        if switch and switch.on_message:
+                            whatsapp_outbox.home_button(trader.phone_number, switch.on_message)
+                    else:
+                        # Failed withdrawal
+                        transaction = DerivCallbackHandler._record_withdrawal(order, 'failed')
+                        message = (
+                            "*⚠️ Order Processing Failed* \n\n"
+                            f"📦 Order Number: {order.account_number} \n"
+                            f"🔖 Reference Number: {transaction.reference_number} \n\n"
+                            "Please try again or contact our support team for assistance."
+                        )
+                        whatsapp_outbox.home_button(trader.phone_number, message)
+                    
+                    order.delete()
+                    return HttpResponseRedirect(f"https://wa.me/{settings.WHATSAPP_NUMBER}?text=Withdrawal%20processed")
+                
+                except Exception as e:
+                    print("Error during withdrawal processing:", e)
+                    logger.exception("Withdrawal processing error")
+                    
+                    message = (
+                        "*⚠️ Order Processing Failed* \n\n"
+                        f"📦 Order Number: {order.account_number} \n\n"
+                        f"Error: {str(e)}\n\n"
+                        "Please try again or contact our support team for assistance."
+                    )
+                    whatsapp_outbox.home_button(trader.phone_number, message)
                     order.delete()
-                    return HttpResponseRedirect(f"https://wa.me/{settings.WHATSAPP_NUMBER}?text=Could%20not%20fetch%20client%20details")
+                    return HttpResponseRedirect(f"https://wa.me/{settings.WHATSAPP_NUMBER}?text={str(e).replace(' ', '%20')}")
                     
             except InitiateSellOrders.DoesNotExist:
                 return HttpResponseRedirect("https://wa.me/message/PEDVFTGBHHP4M1")
@@ -615,7 +571,7 @@ class DerivCallbackHandler:
             deriv_agent = DerivPaymentAgent()
             
             try:
-                result = asyncio.run(deriv_agent.verify_email(
+                result = deriv_service.run(deriv_agent.verify_email(
                     order.email, 
                     order.amount, 
                     token, 
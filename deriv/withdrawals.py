@@ -0,0 +1,87 @@
+# deriv/withdrawals.py
+"""
+Withdrawal (sell order) pipeline run when the client clicks the Deriv
+verification email link.
+
+The callback used to make one blocking Deriv call for the recipient name,
+a second for a possibly fresh name, then open a brand-new connection with
+the client's token for paymentagent_withdraw - each a separate hop onto
+the Deriv loop. run_withdrawal() does the whole Deriv side in one
+coroutine:
+
+    outcome = deriv_service.run(
+        run_withdrawal(agent, order.amount, order.account_number, order.ecocash_name, code, token),
+        timeout=None,
+    )
+
+The client's pooled connection (normally still open from verify_email)
+is checked while the name is being verified, so the withdrawal goes out
+without a handshake. The coroutine does no ORM work of its own (cache
+lookups go through a thread); the caller records the outcome and queues
+the notifications.
+
+outcome['status'] is one of:
+    'no_details'      Deriv did not return the account holder (details has the error)
+    'name_mismatch'   account holder does not match the EcoCash name
+    'failed'          Deriv refused the withdrawal (error)
+    'not_completed'   Deriv answered without paymentagent_withdraw == 1
+    'completed'       withdrawn (result has transaction_id)
+"""
+import asyncio
+import logging
+
+from accounts import names
+
+from . import name_cache
+from .pool import release_pool
+
+logger = logging.getLogger(__name__)
+
+
+async def _warm(pool):
+    # Check the connection out and straight back in: a live one gets pinged, a dead one replaced
+    try:
+        conn = await pool.checkout()
+        await pool.checkin(conn)
+    except Exception as e:
+        # The withdrawal opens its own connection if this failed
+        logger.warning(f"Could not prepare client Deriv connection: {e}")
+
+
+async def run_withdrawal(agent, amount, login_id, ecocash_name, code, token):
+    """Name check and withdrawal for one sell order. Returns the outcome dict."""
+    warm = asyncio.create_task(_warm(agent._client_pool(token)))
+    outcome = {'status': None, 'deriv_name': None, 'details': None, 'result': None, 'error': None}
+    try:
+        details = await name_cache.afetch_recipient_details(agent, amount, login_id)
+        if not (isinstance(details, dict) and 'client_to_full_name' in details):
+            outcome.update(status='no_details', details=details)
+            return outcome
+
+        deriv_name = details['client_to_full_name']
+        if not names.shares_token(deriv_name, ecocash_name) and details.get('cached'):
+            # Cached name may be out of date - confirm with Deriv before refusing
+            fresh = await name_cache.afetch_recipient_details(agent, amount, login_id, fresh=True)
+            if isinstance(fresh, dict) and 'client_to_full_name' in fresh:
+                details = fresh
+                deriv_name = fresh['client_to_full_name']
+        outcome.update(deriv_name=deriv_name, details=details)
+
+        if not names.shares_token(deriv_name, ecocash_name):
+            outcome['status'] = 'name_mismatch'
+            return outcome
+
+        await warm
+        result = await agent.process_withdrawal(amount, login_id, code, token)
+        outcome['result'] = result
+        if isinstance(result, dict) and result.get('error'):
+            outcome.update(status='failed', error=result['error'])
+        elif isinstance(result, dict) and result.get('paymentagent_withdraw') == 1:
+            outcome['status'] = 'completed'
+        else:
+            outcome['status'] = 'not_completed'
+        return outcome
+    finally:
+        await asyncio.gather(warm, return_exceptions=True)
+        # The client token is done with - don't keep its connection around
+        await release_pool(token, agent.app_id)
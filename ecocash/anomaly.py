@@ -0,0 +1,184 @@
+# ecocash/anomaly.py
+"""
+Batch anomaly scoring over the full CashOutTransaction history.
+
+The whole table is pulled into NumPy arrays once (amount, timestamp,
+phone id, balance delta) and every feature is computed with array
+operations - no per-row queries and nothing added to receive_message.
+Results go back with bulk_update, only for rows whose score changed.
+
+Scores live in their own columns (anomaly_score / anomaly_reasons).
+``flagged`` is left alone because receive_message takes the previous
+balance from the last non-flagged cashout.
+"""
+import numpy as np
+from django.utils import timezone
+
+from .models import CashOutTransaction
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Feature thresholds
+VELOCITY_WINDOW = HOUR          # cashouts from one phone inside this window
+VELOCITY_LIMIT = 3
+REPEAT_WINDOW = DAY             # same phone + same amount inside this window
+REPEAT_LIMIT = 2
+ROUND_AMOUNT_MIN = 50           # round amounts only count from here up
+BALANCE_GAP_TOLERANCE = 0.01
+AMOUNT_Z_LIMIT = 3.5            # robust z-score (median / MAD)
+
+# Feature weights - the score is their weighted sum clipped to [0, 1]
+WEIGHTS = {
+    'velocity': 0.35,
+    'repeat_amount': 0.25,
+    'round_amount': 0.10,
+    'balance_gap': 0.40,
+    'large_amount': 0.20,
+}
+
+DEFAULT_THRESHOLD = 0.5
+
+
+def _window_counts(group_ids, ts, window):
+    """
+    For every row, how many rows of the same group fall in (ts - window, ts].
+    Rows are placed on one number line (group offset + timestamp) so a
+    single searchsorted answers the question for the whole array.
+    """
+    if len(ts) == 0:
+        return np.zeros(0, dtype=np.int64)
+    ts = ts - ts.min()
+    span = int(ts.max()) + window + 1
+    keys = group_ids.astype(np.int64) * span + ts
+
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    # side='right' so rows sharing a timestamp all count each other
+    upper = np.searchsorted(sorted_keys, sorted_keys, side='right')
+    lower = np.searchsorted(sorted_keys, sorted_keys - window, side='right')
+
+    counts = np.empty_like(upper)
+    counts[order] = upper - lower
+    return counts
+
+
+def compute_features(amount, ts, phone_ids, prev_bal, new_bal):
+    """
+    amount, prev_bal, new_bal: float64 arrays; ts: int64 epoch seconds;
+    phone_ids: int64 dense ids. Returns a dict of float64 feature arrays in [0, 1].
+    """
+    n = len(amount)
+    features = {}
+
+    velocity = _window_counts(phone_ids, ts, VELOCITY_WINDOW)
+    features['velocity'] = np.clip((velocity - VELOCITY_LIMIT + 1) / VELOCITY_LIMIT, 0, 1)
+
+    cents = np.round(amount * 100).astype(np.int64)
+    _, pair_ids = np.unique(np.stack([phone_ids, cents]), axis=1, return_inverse=True)
+    repeats = _window_counts(pair_ids.reshape(-1), ts, REPEAT_WINDOW)
+    features['repeat_amount'] = np.clip((repeats - REPEAT_LIMIT + 1) / REPEAT_LIMIT, 0, 1)
+
+    features['round_amount'] = ((cents % 1000 == 0) & (amount >= ROUND_AMOUNT_MIN)).astype(np.float64)
+
+    # Incomplete rows keep new_bal == prev_bal until the balance SMS arrives - skip them
+    has_balance = new_bal != prev_bal
+    gap = np.abs((new_bal - amount) - prev_bal)
+    features['balance_gap'] = (has_balance & (gap > BALANCE_GAP_TOLERANCE)).astype(np.float64)
+
+    if n:
+        median = np.median(amount)
+        mad = np.median(np.abs(amount - median)) or 1.0
+        z = 0.6745 * (amount - median) / mad
+    else:
+        z = np.zeros(0)
+    features['large_amount'] = np.clip((z - AMOUNT_Z_LIMIT) / AMOUNT_Z_LIMIT, 0, 1)
+
+    return features
+
+
+def score_features(features):
+    """Weighted sum of the features, plus the names of the ones that fired per row."""
+    names = list(WEIGHTS)
+    matrix = np.stack([features[name] for name in names], axis=1)
+    weights = np.array([WEIGHTS[name] for name in names])
+    scores = np.clip(matrix @ weights, 0, 1)
+
+    fired = matrix > 0
+    reasons = [
+        ','.join(name for name, hit in zip(names, row) if hit)
+        for row in fired
+    ]
+    return scores, reasons
+
+
+def load_history(queryset=None):
+    """Pull the columns scoring needs into NumPy arrays in one pass."""
+    if queryset is None:
+        queryset = CashOutTransaction.objects.all()
+    rows = list(
+        queryset.order_by('id').values_list(
+            'id', 'amount', 'timestamp', 'phone_e164', 'prev_bal', 'new_bal',
+            'anomaly_score', 'anomaly_reasons',
+        ).iterator(chunk_size=10000)
+    )
+    if not rows:
+        return None
+
+    ids, amount, stamps, phones, prev_bal, new_bal, old_scores, old_reasons = zip(*rows)
+    _, phone_ids = np.unique(np.array(phones, dtype=object).astype(str), return_inverse=True)
+    return {
+        'id': np.array(ids, dtype=np.int64),
+        'amount': np.array(amount, dtype=np.float64),
+        'ts': np.array([int(stamp.timestamp()) for stamp in stamps], dtype=np.int64),
+        'phone_ids': phone_ids.reshape(-1).astype(np.int64),
+        'prev_bal': np.array(prev_bal, dtype=np.float64),
+        'new_bal': np.array(new_bal, dtype=np.float64),
+        'old_scores': np.array(old_scores, dtype=np.float64),
+        'old_reasons': list(old_reasons),
+    }
+
+
+def score_cashouts(queryset=None, dry_run=False, batch_size=2000):
+    """
+    Score every cashout in ``queryset`` (default: full history).
+    Returns a summary dict; writes only rows whose score or reasons changed.
+    """
+    history = load_history(queryset)
+    if history is None:
+        return {'scored': 0, 'updated': 0, 'scores': None, 'reasons': []}
+
+    features = compute_features(
+        history['amount'], history['ts'], history['phone_ids'],
+        history['prev_bal'], history['new_bal'],
+    )
+    scores, reasons = score_features(features)
+    scores = np.round(scores, 4)
+
+    changed = np.flatnonzero(
+        (np.abs(scores - history['old_scores']) > 1e-4)
+        | np.array([new != (old or '') for new, old in zip(reasons, history['old_reasons'])], dtype=bool)
+    )
+
+    if not dry_run and len(changed):
+        now = timezone.now()
+        updates = [
+            CashOutTransaction(
+                id=int(history['id'][i]),
+                anomaly_score=float(scores[i]),
+                anomaly_reasons=reasons[i],
+                scored_at=now,
+            )
+            for i in changed
+        ]
+        CashOutTransaction.objects.bulk_update(
+            updates, ['anomaly_score', 'anomaly_reasons', 'scored_at'], batch_size=batch_size
+        )
+
+    return {
+        'scored': len(scores),
+        'updated': len(changed),
+        'ids': history['id'],
+        'scores': scores,
+        'reasons': reasons,
+    }
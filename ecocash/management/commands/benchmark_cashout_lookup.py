@@ -0,0 +1,150 @@
+import random
+import string
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from accounts.names import tokens_key
+from accounts.phone import to_e164
+from ecocash.models import CashOutTransaction
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark POP cashout lookups (old phone__in/endswith vs phone_e164/txn_id_reversed) on a synthetic table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=150000,
+            help='Synthetic cashouts to insert (default is roughly a year of production volume)',
+        )
+        parser.add_argument(
+            '--lookups',
+            type=int,
+            default=500,
+            help='Number of lookups to time for each strategy',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the synthetic rows instead of rolling them back',
+        )
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        lookups = options['lookups']
+
+        try:
+            with transaction.atomic():
+                samples = self._populate(rows)
+                self._report(samples[:lookups])
+                if not options['keep']:
+                    raise _Rollback()
+        except _Rollback:
+            self.stdout.write(self.style.WARNING('Synthetic rows rolled back'))
+
+    def _populate(self, rows):
+        self.stdout.write(f"Inserting {rows} synthetic cashouts...")
+        phones = [f"7{random.randint(10000000, 89999999)}" for _ in range(max(rows // 20, 1))]
+        samples = []
+        batch = []
+        started = time.perf_counter()
+
+        for i in range(rows):
+            phone = random.choice(phones)
+            txn_id = f"CO{random.randint(100000, 999999)}.{random.randint(1000, 9999)}.BENCH{i:07d}"
+            txn = CashOutTransaction(
+                amount=Decimal(random.randint(100, 50000)) / 100,
+                name='BENCH CLIENT',
+                phone=phone,
+                txn_id=txn_id,
+                body='benchmark',
+                verification_code=''.join(random.choices(string.digits, k=6)),
+                # bulk_create skips save(), so fill the lookup columns here
+                phone_e164=to_e164(phone),
+                txn_id_reversed=txn_id[::-1],
+                name_tokens=tokens_key('BENCH CLIENT'),
+            )
+            batch.append(txn)
+            if i % (rows // 500 or 1) == 0:
+                samples.append((phone, txn_id))
+            if len(batch) >= 5000:
+                CashOutTransaction.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            CashOutTransaction.objects.bulk_create(batch)
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {CashOutTransaction._meta.db_table}')
+
+        self.stdout.write(f"Inserted in {time.perf_counter() - started:.1f}s")
+        random.shuffle(samples)
+        return samples
+
+    def _old_lookup(self, phone, reference):
+        normalized = phone.lstrip('0')
+        if normalized.startswith('263'):
+            normalized = normalized[3:]
+        cashout = CashOutTransaction.objects.filter(
+            phone__in=[phone, normalized, '0' + normalized, '263' + normalized, '+263' + normalized],
+            txn_id=reference
+        ).first()
+        if not cashout:
+            cashout = CashOutTransaction.objects.filter(
+                phone=phone,
+                txn_id__endswith=reference
+            ).first()
+        return cashout
+
+    def _time(self, label, func, samples):
+        started = time.perf_counter()
+        misses = 0
+        for phone, reference in samples:
+            if func(phone, reference) is None:
+                misses += 1
+        elapsed = time.perf_counter() - started
+        per_lookup = elapsed / len(samples) * 1000 if samples else 0
+        self.stdout.write(f"  {label:<32} {elapsed:8.3f}s total  {per_lookup:8.3f}ms/lookup  misses={misses}")
+
+    def _explain(self, queryset):
+        if connection.vendor != 'postgresql':
+            return
+        for line in queryset.explain().splitlines()[:3]:
+            self.stdout.write(f"    {line}")
+
+    def _report(self, samples):
+        if not samples:
+            self.stdout.write(self.style.ERROR('No samples collected'))
+            return
+
+        # Client quotes the last segment of the txn id ("short code")
+        short_samples = [(phone, txn_id.rsplit('.', 1)[-1]) for phone, txn_id in samples]
+
+        self.stdout.write("\n" + "=" * 70)
+        self.stdout.write(f"CASHOUT LOOKUP BENCHMARK ({len(samples)} lookups each)")
+        self.stdout.write("=" * 70)
+
+        self.stdout.write("Exact txn id:")
+        self._time('old (phone__in + txn_id)', self._old_lookup, samples)
+        self._time('new (find_for_pop)', CashOutTransaction.find_for_pop, samples)
+
+        self.stdout.write("Short code (suffix):")
+        self._time('old (txn_id__endswith)', self._old_lookup, short_samples)
+        self._time('new (txn_id_reversed prefix)', CashOutTransaction.find_for_pop, short_samples)
+
+        phone, reference = short_samples[0]
+        self.stdout.write("\nPlan, old suffix lookup:")
+        self._explain(CashOutTransaction.objects.filter(phone=phone, txn_id__endswith=reference))
+        self.stdout.write("Plan, new suffix lookup:")
+        self._explain(CashOutTransaction.objects.filter(
+            phone_e164=to_e164(phone),
+            txn_id_reversed__startswith=reference[::-1],
+        ))
+        self.stdout.write("=" * 70)
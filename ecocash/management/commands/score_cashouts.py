@@ -0,0 +1,67 @@
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from ecocash.anomaly import DEFAULT_THRESHOLD, score_cashouts
+from ecocash.models import CashOutTransaction
+
+
+class Command(BaseCommand):
+    help = 'Score CashOutTransaction history for anomalies (velocity, repeats, round amounts, balance gaps)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Only score the last N days (default: full history)',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=DEFAULT_THRESHOLD,
+            help='Score at or above which a cashout is listed as suspicious',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compute scores without writing them back',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Suspicious cashouts to print',
+        )
+
+    def handle(self, *args, **options):
+        queryset = CashOutTransaction.objects.all()
+        if options['days']:
+            queryset = queryset.filter(timestamp__gte=timezone.now() - timedelta(days=options['days']))
+
+        started = time.perf_counter()
+        result = score_cashouts(queryset, dry_run=options['dry_run'])
+        elapsed = time.perf_counter() - started
+
+        if not result['scored']:
+            self.stdout.write(self.style.WARNING("No cashouts to score"))
+            return
+
+        scores = result['scores']
+        suspicious = np.flatnonzero(scores >= options['threshold'])
+        suspicious = suspicious[np.argsort(-scores[suspicious], kind='stable')]
+
+        self.stdout.write(f"Scored {result['scored']} cashouts in {elapsed:.2f}s")
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"DRY RUN: {result['updated']} rows would change"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Updated {result['updated']} rows"))
+
+        self.stdout.write(f"{len(suspicious)} cashouts at or above {options['threshold']:.2f}")
+        if len(suspicious):
+            self.stdout.write("-" * 70)
+            self.stdout.write(f"{'ID':<10} {'Score':<8} Reasons")
+            self.stdout.write("-" * 70)
+            for i in suspicious[:options['limit']]:
+                self.stdout.write(f"{result['ids'][i]:<10} {scores[i]:<8.2f} {result['reasons'][i]}")
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+def canonical_phone(number):
+    # Frozen copy of ecocash.models.canonical_phone
+    if not number:
+        return ''
+    digits = ''.join(ch for ch in str(number) if ch.isdigit())
+    if digits.startswith('263'):
+        digits = digits[3:]
+    digits = digits.lstrip('0')
+    if not digits:
+        return ''
+    return f'+263{digits}'
+
+
+def backfill_lookup_columns(apps, schema_editor):
+    CashOutTransaction = apps.get_model('ecocash', 'CashOutTransaction')
+    batch = []
+    for txn in CashOutTransaction.objects.only('id', 'phone', 'txn_id').iterator(chunk_size=2000):
+        txn.phone_e164 = canonical_phone(txn.phone)
+        txn.txn_id_reversed = (txn.txn_id or '')[::-1]
+        batch.append(txn)
+        if len(batch) >= 2000:
+            CashOutTransaction.objects.bulk_update(batch, ['phone_e164', 'txn_id_reversed'])
+            batch = []
+    if batch:
+        CashOutTransaction.objects.bulk_update(batch, ['phone_e164', 'txn_id_reversed'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecocash', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cashouttransaction',
+            name='phone_e164',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='cashouttransaction',
+            name='txn_id_reversed',
+            field=models.CharField(blank=True, default='', editable=False, max_length=500),
+        ),
+        migrations.RunPython(backfill_lookup_columns, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='cashouttransaction',
+            index=models.Index(fields=['phone_e164', 'txn_id_reversed'], name='cashout_phone_txnrev_idx', opclasses=['varchar_pattern_ops', 'varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='cashouttransaction',
+            index=models.Index(fields=['txn_id_reversed'], name='cashout_txnrev_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
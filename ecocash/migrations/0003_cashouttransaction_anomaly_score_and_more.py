@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecocash', '0002_cashouttransaction_phone_e164_txn_id_reversed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cashouttransaction',
+            name='anomaly_score',
+            field=models.FloatField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='cashouttransaction',
+            name='anomaly_reasons',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='cashouttransaction',
+            name='scored_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
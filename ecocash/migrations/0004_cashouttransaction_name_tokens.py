@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:40
+
+import re
+
+from django.db import migrations, models
+
+
+def tokens_key(name):
+    # Frozen copy of accounts.names.tokens_key
+    if not name:
+        return ''
+    name = re.sub(r"^(?:mr|mrs|ms|miss|dr)\.?\s+", "", name.strip(), flags=re.IGNORECASE)
+    tokens = {part.lower().strip('.') for part in re.split(r"\s+", name)}
+    return ' '.join(sorted(token for token in tokens if token))
+
+
+def backfill_name_tokens(apps, schema_editor):
+    CashOutTransaction = apps.get_model('ecocash', 'CashOutTransaction')
+    batch = []
+    for txn in CashOutTransaction.objects.only('id', 'name').iterator(chunk_size=2000):
+        txn.name_tokens = tokens_key(txn.name)
+        batch.append(txn)
+        if len(batch) >= 2000:
+            CashOutTransaction.objects.bulk_update(batch, ['name_tokens'])
+            batch = []
+    if batch:
+        CashOutTransaction.objects.bulk_update(batch, ['name_tokens'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecocash', '0003_cashouttransaction_anomaly_score_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cashouttransaction',
+            name='name_tokens',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(backfill_name_tokens, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,11 @@
 from django.db import models
 from accounts.models import User
+from accounts.phone import to_e164
+from accounts.names import tokens_key
 import random
 import string
 
+
 class CashOutTransaction(models.Model):
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     name = models.CharField(max_length=100)
@@ -22,11 +25,66 @@ class CashOutTransaction(models.Model):
     flag_reason = models.TextField(blank=True, null=True)
     flagged_by = models.CharField(max_length=100, blank=True, null=True)
 
+    # Lookup columns, maintained in save()
+    phone_e164 = models.CharField(max_length=21, blank=True, default='')
+    txn_id_reversed = models.CharField(max_length=500, blank=True, default='', editable=False)
+    name_tokens = models.CharField(max_length=100, blank=True, default='', editable=False)
+
+    # Batch anomaly scoring (ecocash.anomaly / manage.py score_cashouts)
+    anomaly_score = models.FloatField(default=0, db_index=True)
+    anomaly_reasons = models.CharField(max_length=255, blank=True, default='')
+    scored_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # "short code" POP lookups: txn_id ends with X  ==  reversed starts with X[::-1]
+            models.Index(
+                fields=['phone_e164', 'txn_id_reversed'],
+                name='cashout_phone_txnrev_idx',
+                opclasses=['varchar_pattern_ops', 'varchar_pattern_ops'],
+            ),
+            models.Index(
+                fields=['txn_id_reversed'],
+                name='cashout_txnrev_idx',
+                opclasses=['varchar_pattern_ops'],
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.pk and not self.verification_code:
             self.verification_code = ''.join(random.choices(string.digits, k=6))
+        self.phone_e164 = to_e164(self.phone)
+        self.txn_id_reversed = (self.txn_id or '')[::-1]
+        self.name_tokens = tokens_key(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'phone' in update_fields:
+                update_fields.add('phone_e164')
+            if 'txn_id' in update_fields:
+                update_fields.add('txn_id_reversed')
+            if 'name' in update_fields:
+                update_fields.add('name_tokens')
+            kwargs['update_fields'] = update_fields
         super().save(*args, **kwargs)
 
+    @classmethod
+    def find_for_pop(cls, phone, reference):
+        """
+        Find the cashout a client's POP refers to.
+        Exact txn_id first, then a suffix ("short code") match - both are index seeks.
+        """
+        if not reference:
+            return None
+        phone_e164 = to_e164(phone)
+        cashout = cls.objects.filter(phone_e164=phone_e164, txn_id=reference).first()
+        if not cashout:
+            cashout = cls.objects.filter(
+                phone_e164=phone_e164,
+                txn_id_reversed__startswith=reference[::-1],
+            ).first()
+        return cashout
+
     def __str__(self):
         return f"{self.txn_id} - {self.amount}"
 
@@ -2,7 +2,7 @@
 from django.contrib import admin
 from django.http import HttpResponseRedirect
 from django.urls import reverse
-from .models import EcoCashTransaction, TransactionReceipt, TransactionCharge, BillingCycle
+from .models import EcoCashTransaction, TransactionReceipt, TransactionCharge, BillingCycle, BillingFeeLine
 
 @admin.register(TransactionCharge)
 class TransactionChargeAdmin(admin.ModelAdmin):
@@ -76,7 +76,7 @@ class BillingCycleAdmin(admin.ModelAdmin):
     )
     list_filter = ("paid", "start_date", "end_date")
     search_fields = ("client_name",)
-    actions = ["mark_as_paid"]
+    actions = ["mark_as_paid", "recompute_totals"]
 
     def mark_as_paid(self, request, queryset):
         """Custom action to mark selected cycles as paid and start new ones."""
@@ -85,3 +85,26 @@ class BillingCycleAdmin(admin.ModelAdmin):
                 billing.close_cycle()
         self.message_user(request, f"{queryset.count()} billing cycles marked as paid and new cycles started.")
     mark_as_paid.short_description = "Mark selected billing cycles as paid and start new cycles"
+
+    def recompute_totals(self, request, queryset):
+        """Rebuild the totals of selected cycles from their fee lines."""
+        for billing in queryset:
+            billing.recompute()
+        self.message_user(request, f"Recomputed {queryset.count()} billing cycles from their fee lines.")
+    recompute_totals.short_description = "Recompute totals from fee lines"
+
+
+@admin.register(BillingFeeLine)
+class BillingFeeLineAdmin(admin.ModelAdmin):
+    # Append-only - fix totals with recompute_billing, not by editing lines
+    list_display = ("cycle", "transaction", "transaction_type", "amount", "fee_rate", "fee", "created_at")
+    list_filter = ("transaction_type", "cycle")
+    search_fields = ("transaction__reference_number",)
+    raw_id_fields = ("transaction",)
+    readonly_fields = ("cycle", "transaction", "transaction_type", "amount", "fee_rate", "fee", "transactions", "created_at")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,154 @@
+# finance/charges.py
+"""
+In-memory charge schedules built from the TransactionCharge table.
+
+Charge lookups used to query the table on every call - up to three
+queries in TransactionCharge.get_charge_for_amount (run on every deposit
+save) and a full scan plus a fallback query for each POP in
+WhatsAppService._calculate_net_amount_and_charge. The active bands for a
+transaction type are now loaded once and indexed:
+
+    schedule = charge_schedule('deposit')
+    schedule.charge_for(Decimal('50'))          # charge on a net amount
+    schedule.split_gross(Decimal('55.90'))      # (net, charge) from what was paid
+
+Both directions resolve the band with one bisect over precomputed
+boundaries, so a lookup does no queries and allocates nothing beyond the
+Decimal arithmetic, and gives the same band the old queries did: the
+lowest band by min_amount wins where bands overlap, percentage bands
+before fixed ones for charge_for, the highest percentage band when no
+band matches.
+
+Schedules are dropped when a TransactionCharge is saved or deleted in
+this process (finance.signals) and rebuilt every REFRESH_INTERVAL seconds
+so other workers pick up admin changes.
+"""
+import time
+from bisect import bisect_left
+from decimal import Decimal
+
+REFRESH_INTERVAL = 30           # seconds before a schedule is reloaded
+
+HUNDRED = Decimal('100')
+ONE = Decimal('1')
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+# Band tuple layout - plain tuples keep lookups allocation-free
+MIN, MAX, IS_PERCENTAGE, FIXED, RATE, ADDITIONAL = range(6)
+
+
+class IntervalIndex:
+    """
+    Closed intervals [lo, hi] (hi None = unbounded) with a priority order;
+    lookup(x) returns the value of the first interval containing x.
+
+    The boundaries split the line into points and the open gaps between
+    them. The winner for each is worked out once, so a lookup is a single
+    bisect.
+    """
+
+    def __init__(self, intervals):
+        points = sorted({lo for lo, _, _ in intervals} | {hi for _, hi, _ in intervals if hi is not None})
+        self.points = points
+        self.at_point = [self._first(intervals, point, point) for point in points]
+        # Gap i is (points[i], points[i + 1]); the last one runs to infinity
+        self.in_gap = [
+            self._first(intervals, point, points[i + 1] if i + 1 < len(points) else None)
+            for i, point in enumerate(points)
+        ]
+
+    @staticmethod
+    def _first(intervals, lo, hi):
+        # First interval covering [lo, hi] - boundaries are all in points, so covering
+        # both ends of a point or gap means covering all of it
+        for start, end, value in intervals:
+            if start <= lo and (end is None or (hi is not None and end >= hi)):
+                return value
+        return None
+
+    def lookup(self, x):
+        i = bisect_left(self.points, x)
+        if i < len(self.points) and self.points[i] == x:
+            return self.at_point[i]
+        if i == 0:
+            return None
+        return self.in_gap[i - 1]
+
+
+class ChargeSchedule:
+    def __init__(self, transaction_type, bands):
+        """bands: active TransactionCharge band tuples, ordered by min_amount."""
+        self.transaction_type = transaction_type
+        self.bands = bands
+        percentage = [band for band in bands if band[IS_PERCENTAGE]]
+        fixed = [band for band in bands if not band[IS_PERCENTAGE]]
+
+        # Highest percentage band - used when nothing else matches
+        self.fallback = max(percentage, key=lambda band: band[MIN]) if percentage else None
+
+        # charge_for: percentage bands first, then fixed, each lowest min_amount first
+        self.by_amount = IntervalIndex([(band[MIN], band[MAX], band) for band in percentage + fixed])
+
+        # split_gross: each band covers the totals whose net lands in it, in table order.
+        # Percentage bands only check the lower bound, as the WhatsApp flow always has.
+        self.by_gross = IntervalIndex([
+            (band[MIN] * (ONE + band[RATE] / HUNDRED) + band[ADDITIONAL], None, band)
+            if band[IS_PERCENTAGE] else
+            (band[MIN] + band[FIXED], band[MAX] + band[FIXED], band)
+            for band in bands
+        ])
+
+    def band_for(self, amount):
+        return self.by_amount.lookup(amount) or self.fallback
+
+    def charge_for(self, amount):
+        """Charge on a net ``amount`` - TransactionCharge.calculate_charge of its band."""
+        band = self.band_for(amount)
+        if band is None:
+            return ZERO
+        if band[IS_PERCENTAGE]:
+            return (amount * band[RATE] / HUNDRED) + band[ADDITIONAL]
+        return band[FIXED]
+
+    def split_gross(self, total):
+        """(net, charge) to 2dp for a gross ``total`` paid, or None without any bands."""
+        band = self.by_gross.lookup(total) or self.fallback
+        if band is None:
+            return None
+        if band[IS_PERCENTAGE]:
+            net = (total - band[ADDITIONAL]) / (ONE + band[RATE] / HUNDRED)
+            charge = total - net
+        else:
+            net = total - band[FIXED]
+            charge = band[FIXED]
+        return net.quantize(CENT), charge.quantize(CENT)
+
+
+_schedules = {}         # transaction type -> (ChargeSchedule, monotonic time loaded)
+
+
+def _load(transaction_type):
+    from .models import TransactionCharge
+
+    bands = [
+        tuple(row) for row in TransactionCharge.objects.filter(
+            transaction_type=transaction_type, is_active=True,
+        ).order_by('min_amount', 'id').values_list(
+            'min_amount', 'max_amount', 'is_percentage', 'fixed_charge', 'percentage_rate', 'additional_fee',
+        )
+    ]
+    return ChargeSchedule(transaction_type, bands)
+
+
+def charge_schedule(transaction_type):
+    """The cached ChargeSchedule for ``transaction_type``."""
+    entry = _schedules.get(transaction_type)
+    if entry is None or time.monotonic() - entry[1] > REFRESH_INTERVAL:
+        entry = _schedules[transaction_type] = (_load(transaction_type), time.monotonic())
+    return entry[0]
+
+
+def invalidate():
+    """Charge table changed - rebuild every schedule on next use."""
+    _schedules.clear()
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from finance import rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily transaction rollups behind the admin dashboard'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='First day to rebuild (YYYY-MM-DD); the whole history by default',
+        )
+        parser.add_argument(
+            '--until',
+            type=str,
+            help='Last day to rebuild (YYYY-MM-DD); up to today by default',
+        )
+
+    def _date(self, value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        date_from = self._date(options['since']) if options['since'] else None
+        date_to = self._date(options['until']) if options['until'] else None
+        if date_from and date_to and date_from > date_to:
+            raise CommandError("--since is after --until")
+
+        written = rollups.rebuild(date_from, date_to)
+        span = f"{date_from or 'the start'} to {date_to or 'today'}"
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} rollup rows from {span}"))
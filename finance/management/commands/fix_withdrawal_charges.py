@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
+from django.db.models import Count, Sum, Avg, Max, Min
+from finance import rollups
 from finance.models import EcoCashTransaction  # Replace with your actual app name
 
 class Command(BaseCommand):
@@ -64,7 +66,6 @@ class Command(BaseCommand):
         self.stdout.write("CHARGE SUMMARY:")
         
         # Group by charge value to show distribution
-        from django.db.models import Count, Sum, Avg, Max, Min
         charge_stats = problem_transactions.values('charge').annotate(
             count=Count('id'),
             total_amount=Sum('amount'),
@@ -107,7 +108,7 @@ class Command(BaseCommand):
                 f"\nDRY RUN: Would set charges to 0 for {total_count} withdrawal transactions"
             ))
             if total_count > 0:
-                total_amount_saved = sum(tx.charge for tx in problem_transactions)
+                total_amount_saved = problem_transactions.aggregate(total=Sum('charge'))['total'] or 0
                 self.stdout.write(self.style.WARNING(
                     f"Total charges that would be removed: ${total_amount_saved:.2f}"
                 ))
@@ -123,16 +124,19 @@ class Command(BaseCommand):
         # Actually update the transactions
         self.stdout.write("\nUpdating transactions...")
         
-        updated_count = 0
+        # Totals first - the rows stop matching the filter once updated
+        total_charges_removed = problem_transactions.aggregate(total=Sum('charge'))['total'] or 0
+        status_dist = list(problem_transactions.values('status').annotate(
+            count=Count('id'),
+            total_charges=Sum('charge')
+        ))
+        
+        # One UPDATE instead of a save() per row
         with transaction.atomic():
-            for tx in problem_transactions.iterator(chunk_size=100):
-                old_charge = tx.charge
-                tx.charge = 0
-                tx.save(update_fields=['charge'])
-                updated_count += 1
-                
-                if updated_count % 100 == 0:
-                    self.stdout.write(f"Updated {updated_count}/{total_count} transactions...")
+            updated_count = problem_transactions.update(charge=0)
+        if updated_count:
+            # The update skips save() - bring the dashboard rollups back in line
+            rollups.rebuild()
         
         self.stdout.write(self.style.SUCCESS(
             f"\n✅ Successfully updated {updated_count} withdrawal transactions to have 0 charges!"
@@ -143,19 +147,9 @@ class Command(BaseCommand):
             self.stdout.write("\n" + "="*50)
             self.stdout.write("UPDATE SUMMARY:")
             
-            # Calculate some stats
-            total_charges_removed = sum(tx.charge for tx in problem_transactions)
-            
             self.stdout.write(f"Total transactions fixed: {updated_count}")
             self.stdout.write(f"Total charges removed: ${total_charges_removed:.2f}")
             
-            # Show distribution by status
-            from django.db.models import Count
-            status_dist = problem_transactions.values('status').annotate(
-                count=Count('id'),
-                total_charges=Sum('charge')
-            )
-            
             if status_dist:
                 self.stdout.write("\nFixed by status:")
                 for stat in status_dist:
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from finance.models import BillingCycle
+
+
+class Command(BaseCommand):
+    help = 'Rebuild billing cycle totals from their fee lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cycle',
+            type=int,
+            action='append',
+            help='Billing cycle id to rebuild (repeatable); open cycles by default',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Rebuild every cycle, paid ones included',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without writing',
+        )
+
+    def handle(self, *args, **options):
+        cycles = BillingCycle.objects.order_by('id')
+        if options['cycle']:
+            cycles = cycles.filter(pk__in=options['cycle'])
+            missing = set(options['cycle']) - set(cycles.values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f"No billing cycle with id {', '.join(map(str, sorted(missing)))}")
+        elif not options['all']:
+            cycles = cycles.filter(paid=False)
+
+        dry_run = options['dry_run']
+        drifted = 0
+        for cycle in cycles:
+            with transaction.atomic():
+                # Lock the row so completions landing meanwhile wait for the rewrite
+                cycle = BillingCycle.objects.select_for_update().get(pk=cycle.pk)
+                before = (cycle.transactions_count, cycle.amount_due)
+                totals = cycle.recompute(commit=False)
+                changed = before != (totals['transactions_count'], totals['amount_due'])
+                if changed and not dry_run:
+                    cycle.recompute()
+
+            status = 'drift' if changed else 'ok'
+            self.stdout.write(
+                f"cycle {cycle.pk} {cycle.client_name} ({status}): "
+                f"{before[0]} / ${before[1]} -> "
+                f"{totals['transactions_count']} / ${totals['amount_due']}"
+            )
+            drifted += changed
+
+        verb = 'Would rebuild' if dry_run else 'Rebuilt'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {drifted} of {cycles.count()} billing cycles"))
@@ -0,0 +1,149 @@
+from datetime import datetime, time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from finance import rollups
+from finance.charge_engine import ChargeEngine, from_cents, to_cents
+from finance.charges import charge_schedule
+from finance.models import EcoCashTransaction
+
+# Types whose charge comes from the charge table; the rest are always 0 (see EcoCashTransaction.save)
+CHARGED_TYPES = ('deposit', 'weltrade_deposit')
+FREE_TYPES = ('withdrawal', 'book_subscription')
+
+
+class Command(BaseCommand):
+    help = 'Recompute transaction charges from the current charge table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type',
+            choices=CHARGED_TYPES + FREE_TYPES,
+            action='append',
+            help='Transaction type to recompute (repeatable); all types by default',
+        )
+        parser.add_argument(
+            '--status',
+            type=str,
+            help='Only transactions with this status (e.g. pending)',
+        )
+        parser.add_argument(
+            '--include-completed',
+            action='store_true',
+            help='Also rewrite completed transactions (already billed) when --status is not given',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recompute every matching transaction, with no --status or date range',
+        )
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Only transactions created on or after this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--until',
+            type=str,
+            help='Only transactions created on or before this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows read and written per batch',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would change without writing',
+        )
+
+    def _date(self, value, end_of_day=False):
+        try:
+            day = datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+        return timezone.make_aware(datetime.combine(day, time.max if end_of_day else time.min))
+
+    def handle(self, *args, **options):
+        if not (options['status'] or options['since'] or options['until'] or options['all']):
+            raise CommandError("Give --status, --since/--until, or --all to recompute every transaction")
+
+        queryset = EcoCashTransaction.objects.all()
+        if options['status']:
+            queryset = queryset.filter(status=options['status'])
+        elif not options['include_completed']:
+            # Completed charges were billed at the old rate - only rewrite them when asked to
+            queryset = queryset.exclude(status='completed')
+        if options['since']:
+            queryset = queryset.filter(created_at__gte=self._date(options['since']))
+        if options['until']:
+            queryset = queryset.filter(created_at__lte=self._date(options['until'], end_of_day=True))
+
+        chunk_size = max(1, options['chunk_size'])
+        dry_run = options['dry_run']
+        totals = {'rows': 0, 'changed': 0, 'old': 0, 'new': 0}
+
+        for transaction_type in options['type'] or CHARGED_TYPES + FREE_TYPES:
+            if transaction_type in CHARGED_TYPES:
+                engine = ChargeEngine(charge_schedule(transaction_type))
+            else:
+                engine = None
+            stats = self._recompute(
+                queryset.filter(transaction_type=transaction_type), engine, chunk_size, dry_run,
+            )
+            self.stdout.write(
+                f"{transaction_type:<18} {stats['rows']} rows, {stats['changed']} changed, "
+                f"charges ${from_cents(stats['old'])} -> ${from_cents(stats['new'])}"
+            )
+            for key in totals:
+                totals[key] += stats[key]
+
+        if totals['changed'] and not dry_run:
+            # bulk_update skips save(), so the dashboard rollups are rebuilt for the range
+            rollups.rebuild(
+                self._date(options['since']).date() if options['since'] else None,
+                self._date(options['until']).date() if options['until'] else None,
+            )
+
+        verb = 'Would change' if dry_run else 'Changed'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {totals['changed']} of {totals['rows']} transactions; "
+            f"charges ${from_cents(totals['old'])} -> ${from_cents(totals['new'])}"
+        ))
+
+    def _recompute(self, queryset, engine, chunk_size, dry_run):
+        stats = {'rows': 0, 'changed': 0, 'old': 0, 'new': 0}
+        last_id = 0
+        while True:
+            # Keyset pagination - stable while rows are being updated
+            rows = list(
+                queryset.filter(id__gt=last_id).order_by('id').values_list('id', 'amount', 'charge')[:chunk_size]
+            )
+            if not rows:
+                return stats
+            last_id = rows[-1][0]
+
+            ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            old = to_cents(row[2] for row in rows)
+            if engine is not None:
+                new = engine.charge_cents(to_cents(row[1] for row in rows))
+            else:
+                new = np.zeros(len(rows), dtype=np.int64)
+
+            changed = np.flatnonzero(old != new)
+            stats['rows'] += len(rows)
+            stats['changed'] += len(changed)
+            stats['old'] += int(old.sum())
+            stats['new'] += int(new.sum())
+
+            if dry_run or not len(changed):
+                continue
+            # Only the charge column is written; save() is skipped so completed
+            # transactions are not billed again
+            updates = [EcoCashTransaction(id=int(ids[i]), charge=from_cents(new[i])) for i in changed]
+            with transaction.atomic():
+                EcoCashTransaction.objects.bulk_update(updates, ['charge'], batch_size=chunk_size)
@@ -0,0 +1,152 @@
+import json
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from finance.reconciliation import (
+    DEFAULT_MARGIN, Reconciler, load_binance_withdrawals, load_cashouts,
+    load_deriv_statement, load_transactions,
+)
+
+# Findings that mean money may have been lost or paid twice
+CRITICAL_FINDINGS = (
+    'duplicate_redemptions',
+    'transactions_without_cashout',
+    'duplicate_deriv_ids',
+    'deriv_without_transaction',
+    'binance_without_transaction',
+    'binance_failed_but_completed',
+)
+
+
+class Command(BaseCommand):
+    help = 'Reconcile EcoCash cashouts against transactions, Deriv transfers and Binance withdrawals'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=1,
+            help='Reconcile the last N hours (ignored when --since is given)',
+        )
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Window start, ISO format (e.g. 2026-10-01 or 2026-10-01T08:00)',
+        )
+        parser.add_argument(
+            '--until',
+            type=str,
+            help='Window end, ISO format (default: now)',
+        )
+        parser.add_argument(
+            '--margin-hours',
+            type=int,
+            default=int(DEFAULT_MARGIN.total_seconds() // 3600),
+            help='Extra hours loaded either side of the window so edge pairs still match',
+        )
+        parser.add_argument(
+            '--skip-deriv',
+            action='store_true',
+            help='Do not fetch the Deriv statement',
+        )
+        parser.add_argument(
+            '--skip-binance',
+            action='store_true',
+            help='Do not fetch Binance withdraw history',
+        )
+        parser.add_argument(
+            '--json',
+            type=str,
+            help='Write the full report to this file',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=10,
+            help='Rows to print per finding',
+        )
+
+    def _parse(self, value):
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f"Invalid date: {value}")
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
+
+    def handle(self, *args, **options):
+        until = self._parse(options['until']) if options['until'] else timezone.now()
+        if options['since']:
+            since = self._parse(options['since'])
+        else:
+            since = until - timedelta(hours=options['hours'])
+        if since >= until:
+            raise CommandError("--since must be before --until")
+        margin = timedelta(hours=options['margin_hours'])
+
+        self.stdout.write(f"Reconciling {since:%Y-%m-%d %H:%M} -> {until:%Y-%m-%d %H:%M}")
+        timings = {}
+
+        started = time.perf_counter()
+        cashouts = load_cashouts(since - margin, until)
+        transactions = load_transactions(since - margin, until + margin)
+        timings['database'] = time.perf_counter() - started
+
+        deriv_rows = None
+        if not options['skip_deriv']:
+            started = time.perf_counter()
+            deriv_rows = load_deriv_statement(since, until + margin)
+            timings['deriv'] = time.perf_counter() - started
+            if deriv_rows is None:
+                self.stdout.write(self.style.WARNING("Deriv statement unavailable - Deriv checks skipped"))
+
+        binance_rows = None
+        if not options['skip_binance']:
+            started = time.perf_counter()
+            try:
+                binance_rows = load_binance_withdrawals(since, until + margin)
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f"Binance history unavailable ({e}) - Binance checks skipped"))
+            timings['binance'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        report = Reconciler(since, until, cashouts, transactions, deriv_rows, binance_rows).run()
+        timings['matching'] = time.perf_counter() - started
+        report['timings'] = {key: round(value, 3) for key, value in timings.items()}
+
+        self._print(report, options['limit'])
+
+        if options['json']:
+            with open(options['json'], 'w') as handle:
+                json.dump(report, handle, indent=2, default=str)
+            self.stdout.write(f"Report written to {options['json']}")
+
+    def _print(self, report, limit):
+        sources = report['sources']
+        findings = report['findings']
+
+        self.stdout.write("\n" + "=" * 60)
+        self.stdout.write("RECONCILIATION REPORT")
+        self.stdout.write("=" * 60)
+        for name, count in sources.items():
+            self.stdout.write(f"  {name:<14} {'n/a' if count is None else count}")
+        self.stdout.write(
+            "  timings        " + ", ".join(f"{key} {value:.2f}s" for key, value in report['timings'].items())
+        )
+        self.stdout.write("-" * 60)
+
+        if not findings:
+            self.stdout.write(self.style.SUCCESS("Everything reconciles"))
+            return
+
+        for name, rows in findings.items():
+            style = self.style.ERROR if name in CRITICAL_FINDINGS else self.style.WARNING
+            self.stdout.write(style(f"{name}: {len(rows)}"))
+            for row in rows[:limit]:
+                self.stdout.write(f"    {json.dumps(row, default=str)}")
+            if len(rows) > limit:
+                self.stdout.write(f"    ... {len(rows) - limit} more")
+        self.stdout.write("=" * 60)
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-19 10:05
+
+from django.db import migrations, models
+
+
+def to_e164(number):
+    # Frozen copy of accounts.phone.to_e164 as this migration was written
+    if not number:
+        return ''
+    digits = ''.join(ch for ch in str(number) if ch.isdigit())
+    if digits.startswith('263'):
+        digits = digits[3:]
+    digits = digits.lstrip('0')
+    if not digits:
+        return ''
+    return f'+263{digits}'
+
+
+def backfill_phone_e164(apps, schema_editor):
+    EcoCashTransaction = apps.get_model('finance', 'EcoCashTransaction')
+    batch = []
+    for obj in EcoCashTransaction.objects.only('id', 'ecocash_number').iterator(chunk_size=2000):
+        obj.phone_e164 = to_e164(obj.ecocash_number)
+        batch.append(obj)
+        if len(batch) >= 2000:
+            EcoCashTransaction.objects.bulk_update(batch, ['phone_e164'])
+            batch = []
+    if batch:
+        EcoCashTransaction.objects.bulk_update(batch, ['phone_e164'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0011_alter_ecocashtransaction_deriv_account_number_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ecocashtransaction',
+            name='phone_e164',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=16),
+        ),
+        migrations.RunPython(backfill_phone_e164, migrations.RunPython.noop),
+    ]
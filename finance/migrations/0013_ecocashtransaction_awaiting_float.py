@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0012_ecocashtransaction_phone_e164'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ecocashtransaction',
+            name='awaiting_float',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
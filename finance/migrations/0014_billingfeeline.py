@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def opening_balances(apps, schema_editor):
+    # Cycles billed before fee lines existed keep their totals as one opening line,
+    # so recompute_billing rebuilds them unchanged
+    BillingCycle = apps.get_model('finance', 'BillingCycle')
+    BillingFeeLine = apps.get_model('finance', 'BillingFeeLine')
+    BillingFeeLine.objects.bulk_create([
+        BillingFeeLine(cycle_id=cycle.pk, fee=cycle.amount_due, transactions=cycle.transactions_count)
+        for cycle in BillingCycle.objects.exclude(transactions_count=0, amount_due=0)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0013_ecocashtransaction_awaiting_float'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillingFeeLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_type', models.CharField(blank=True, choices=[('deposit', 'Deposit'), ('withdrawal', 'Withdrawal'), ('weltrade_deposit', 'weltrade_deposit'), ('book_subscription', 'book_subscription')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('fee_rate', models.DecimalField(decimal_places=4, default=0, max_digits=8)),
+                ('fee', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('transactions', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('cycle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fee_lines', to='finance.billingcycle')),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='fee_lines', to='finance.ecocashtransaction')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.RunPython(opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:40
+
+from django.db import migrations
+
+SEQUENCE = 'finance_reference_block_seq'
+COUNTER_TABLE = 'finance_reference_block_counter'
+
+
+def create_counter(apps, schema_editor):
+    # Counter blocks for finance.references - one nextval() reserves BLOCK_SIZE ids
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCE} START 1")
+    else:
+        # No sequences elsewhere - a one-row table the allocator increments instead
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {COUNTER_TABLE} (id INTEGER PRIMARY KEY, value BIGINT NOT NULL)"
+        )
+        schema_editor.execute(f"INSERT INTO {COUNTER_TABLE} (id, value) VALUES (1, 0)")
+
+
+def drop_counter(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP SEQUENCE IF EXISTS {SEQUENCE}")
+    else:
+        schema_editor.execute(f"DROP TABLE IF EXISTS {COUNTER_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0014_billingfeeline'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_counter, drop_counter),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.8 on 2026-10-19 21:10
+
+from django.db import migrations, models
+
+
+def to_e164(number):
+    # Frozen copy of accounts.phone.to_e164 - foreign country codes are kept
+    text = str(number or '').strip()
+    digits = ''.join(ch for ch in text if ch.isdigit())
+    if text.startswith('+'):
+        foreign = digits
+    elif digits.startswith('00'):
+        foreign = digits[2:]
+    elif digits.startswith('0') or digits.startswith('263') or len(digits) <= 9:
+        foreign = ''
+    else:
+        foreign = digits
+    if foreign and not foreign.startswith('263'):
+        return f'+{foreign}'
+    if digits.startswith('00263'):
+        digits = digits[2:]
+    if digits.startswith('263'):
+        digits = digits[3:]
+    digits = digits.lstrip('0')
+    return f'+263{digits}' if digits else ''
+
+
+def renormalise_phone_e164(apps, schema_editor):
+    # Numbers with a foreign country code used to get 263 put in front
+    EcoCashTransaction = apps.get_model('finance', 'EcoCashTransaction')
+    batch = []
+    for obj in EcoCashTransaction.objects.only('id', 'ecocash_number', 'phone_e164').iterator(chunk_size=2000):
+        phone_e164 = to_e164(obj.ecocash_number)
+        if phone_e164 == obj.phone_e164:
+            continue
+        obj.phone_e164 = phone_e164
+        batch.append(obj)
+        if len(batch) >= 2000:
+            EcoCashTransaction.objects.bulk_update(batch, ['phone_e164'])
+            batch = []
+    if batch:
+        EcoCashTransaction.objects.bulk_update(batch, ['phone_e164'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0016_dailyrollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ecocashtransaction',
+            name='phone_e164',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=21),
+        ),
+        migrations.RunPython(renormalise_phone_e164, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.8 on 2026-10-19 22:30
+
+from django.db import migrations
+
+# finance.references.FORMATS as of this migration
+KINDS = ('transaction', 'transfer', 'signal', 'signal_job')
+
+SHARED_SEQUENCE = 'finance_reference_block_seq'
+SHARED_TABLE = 'finance_reference_block_counter'
+SEQUENCE = 'finance_reference_{kind}_seq'
+COUNTER_TABLE = 'finance_reference_counter'
+
+
+def split_counter(apps, schema_editor):
+    # Every kind starts past the shared counter, so no value it handed out is reused
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f"SELECT last_value FROM {SHARED_SEQUENCE}")
+            start = cursor.fetchone()[0] + 1
+            for kind in KINDS:
+                schema_editor.execute(
+                    f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCE.format(kind=kind)} START {start}"
+                )
+            return
+
+        cursor.execute(f"SELECT value FROM {SHARED_TABLE} WHERE id = 1")
+        row = cursor.fetchone()
+        start = row[0] if row else 0
+        schema_editor.execute(
+            f"CREATE TABLE {COUNTER_TABLE} (kind VARCHAR(32) PRIMARY KEY, value BIGINT NOT NULL)"
+        )
+        for kind in KINDS:
+            schema_editor.execute(
+                f"INSERT INTO {COUNTER_TABLE} (kind, value) VALUES (%s, %s)", [kind, start]
+            )
+        schema_editor.execute(f"DROP TABLE {SHARED_TABLE}")
+
+
+def join_counter(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        for kind in KINDS:
+            schema_editor.execute(f"DROP SEQUENCE IF EXISTS {SEQUENCE.format(kind=kind)}")
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MAX(value) FROM {COUNTER_TABLE}")
+        value = cursor.fetchone()[0] or 0
+    schema_editor.execute(
+        f"CREATE TABLE {SHARED_TABLE} (id INTEGER PRIMARY KEY, value BIGINT NOT NULL)"
+    )
+    schema_editor.execute(f"INSERT INTO {SHARED_TABLE} (id, value) VALUES (1, %s)", [value])
+    schema_editor.execute(f"DROP TABLE {COUNTER_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0017_alter_ecocashtransaction_phone_e164'),
+    ]
+
+    operations = [
+        migrations.RunPython(split_counter, join_counter),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-19 22:50
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0018_reference_counter_per_kind'),
+    ]
+
+    operations = [
+        # Decimal('0.00') == 0.0, so makemigrations does not pick this up on its own
+        migrations.AlterField(
+            model_name='billingcycle',
+            name='amount_due',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+    ]
@@ -1,13 +1,18 @@
 # finance/models.py
-from django.db import models
+from django.db import models, router, transaction as db_transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, pre_save
 from django.utils.timezone import now
 from django.contrib.auth import get_user_model
-import random
-import string
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
 from datetime import timedelta
 User = get_user_model()
 from django.core.exceptions import ValidationError
+from accounts.phone import to_e164, to_local, is_valid_mobile
+from . import rollups
+from .references import next_reference
+from .rollups import ROLLUP_FIELDS
 
 
 class BillingCycle(models.Model):
@@ -39,35 +44,59 @@ class BillingCycle(models.Model):
     )  # 1%
 
     transactions_count = models.PositiveIntegerField(default=0)
-    amount_due = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    amount_due = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
 
     paid = models.BooleanField(default=False)
 
-    def add_transaction(self, amount, transaction_type):
+    def fee_rate_for(self, transaction_type):
+        if transaction_type in (self.TRANSACTION_DEPOSIT, self.TRANSACTION_BOOK_SUBSCRIPTION):
+            return self.deposit_fee_rate
+        if transaction_type == self.TRANSACTION_WITHDRAWAL:
+            return self.withdrawal_fee_rate
+        if transaction_type == self.TRANSACTION_WELTRADE_DEPOSIT:
+            return self.weltrade_fee_rate
+        raise ValueError("Invalid transaction type")
+
+    def add_transaction(self, amount, transaction_type, transaction=None):
         """
         Add a completed transaction to billing
-        Fee = amount × fee_rate (based on transaction type)
+        Fee = amount × fee_rate (based on transaction type), to the cent
+
+        Each transaction gets a BillingFeeLine; the cycle totals move by one
+        UPDATE with F() increments, so concurrent completions can't overwrite
+        each other's totals. Call inside the completion's atomic block so the
+        line, the totals and the completion commit together.
         """
         amount = Decimal(amount)
-
-        if transaction_type == self.TRANSACTION_DEPOSIT:
-            fee = amount * self.deposit_fee_rate
-
-        elif transaction_type == self.TRANSACTION_WITHDRAWAL:
-            fee = amount * self.withdrawal_fee_rate
-        
-        elif transaction_type == self.TRANSACTION_WELTRADE_DEPOSIT:
-            fee = amount * self.weltrade_fee_rate
-        
-        elif transaction_type == self.TRANSACTION_BOOK_SUBSCRIPTION:
-            fee = amount * self.deposit_fee_rate
-
-        else:
-            raise ValueError("Invalid transaction type")
-
-        self.transactions_count += 1
-        self.amount_due += fee
-        self.save()
+        fee_rate = self.fee_rate_for(transaction_type)
+        fee = (amount * fee_rate).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+        BillingFeeLine.objects.create(
+            cycle=self,
+            transaction=transaction,
+            transaction_type=transaction_type,
+            amount=amount,
+            fee_rate=fee_rate,
+            fee=fee,
+        )
+        BillingCycle.objects.filter(pk=self.pk).update(
+            transactions_count=F('transactions_count') + 1,
+            amount_due=F('amount_due') + fee,
+        )
+        # Read the totals back - other completions may have moved them too
+        self.refresh_from_db(fields=['transactions_count', 'amount_due'])
+
+    def recompute(self, commit=True):
+        """Rebuild transactions_count and amount_due from the fee lines."""
+        totals = self.fee_lines.aggregate(
+            transactions_count=Coalesce(Sum('transactions'), 0),
+            amount_due=Coalesce(Sum('fee'), Decimal("0.00")),
+        )
+        if commit:
+            BillingCycle.objects.filter(pk=self.pk).update(**totals)
+            self.transactions_count = totals['transactions_count']
+            self.amount_due = totals['amount_due']
+        return totals
 
     def close_cycle(self):
         """Mark this cycle as paid and start a new billing cycle"""
@@ -84,6 +113,31 @@ class BillingCycle(models.Model):
         )
 
 
+class BillingFeeLine(models.Model):
+    """
+    One billed transaction. Append-only: BillingCycle totals are the sum of
+    its lines and can always be rebuilt from them (recompute_billing).
+    """
+    cycle = models.ForeignKey(BillingCycle, on_delete=models.CASCADE, related_name="fee_lines")
+    transaction = models.ForeignKey(
+        "EcoCashTransaction", on_delete=models.SET_NULL, null=True, blank=True, related_name="fee_lines"
+    )
+    # Blank for the opening balance carried over from before fee lines existed
+    transaction_type = models.CharField(max_length=20, choices=BillingCycle.TRANSACTION_TYPES, blank=True)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    fee_rate = models.DecimalField(max_digits=8, decimal_places=4, default=0)
+    fee = models.DecimalField(max_digits=12, decimal_places=2)
+    # Transactions this line counts towards transactions_count
+    transactions = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.cycle_id}: {self.transaction_type or 'opening balance'} ${self.fee}"
+
+
 class TransactionCharge(models.Model):
     """Fixed charges table based on amount ranges"""
     TRANSACTION_TYPES = (
@@ -156,48 +210,21 @@ class TransactionCharge(models.Model):
     @classmethod
     def get_charge_for_amount(cls, amount, transaction_type):
         """Get the appropriate charge for a given amount and transaction type"""
+        from .charges import charge_schedule
+
         try:
-            # First check for percentage-based range ($10+)
-            percentage_charge = cls.objects.filter(
-                min_amount__lte=amount,
-                max_amount__gte=amount,
-                is_percentage=True,
-                transaction_type=transaction_type,
-                is_active=True
-            ).first()
-            
-            if percentage_charge:
-                return percentage_charge.calculate_charge(amount)
-            
-            # Check for fixed fee ranges
-            fixed_charge = cls.objects.filter(
-                min_amount__lte=amount,
-                max_amount__gte=amount,
-                is_percentage=False,
-                transaction_type=transaction_type,
-                is_active=True
-            ).first()
-            
-            if fixed_charge:
-                return fixed_charge.calculate_charge(amount)
-            
-            # If no specific range found for this transaction type, 
-            # use the highest percentage range for this transaction type
-            highest_percentage = cls.objects.filter(
-                is_percentage=True,
-                transaction_type=transaction_type,
-                is_active=True
-            ).order_by('-min_amount').first()
-            
-            if highest_percentage:
-                return highest_percentage.calculate_charge(amount)
-                
+            # Cached, bisect-indexed bands for this type (see finance/charges.py)
+            return charge_schedule(transaction_type).charge_for(amount)
         except Exception:
             pass
         
         # Default fallback
         return Decimal('0.00')
 
+class StatusConflict(Exception):
+    """The row's status changed under us - the transition was not applied."""
+
+
 class EcoCashTransaction(models.Model):
     TRANSACTION_TYPES = (
         ('deposit', 'Deposit to Deriv'),
@@ -231,6 +258,7 @@ class EcoCashTransaction(models.Model):
         max_length=50,
         help_text="Your EcoCash phone number"
     )
+    phone_e164 = models.CharField(max_length=21, blank=True, default='', db_index=True, editable=False)
     ecocash_name = models.CharField(
         max_length=100,
         help_text="Name registered with your EcoCash"
@@ -239,6 +267,8 @@ class EcoCashTransaction(models.Model):
     
     # Status and timing
     status = models.CharField(max_length=12, choices=STATUS_CHOICES, default='pending')
+    # Deposit parked by the liquidity gate until the Deriv float recovers
+    awaiting_float = models.BooleanField(default=False, db_index=True)
     created_at = models.DateTimeField(default=now)
     processed_at = models.DateTimeField(null=True, blank=True)
     
@@ -295,30 +325,82 @@ class EcoCashTransaction(models.Model):
     # -----------------------------
     def clean_ecocash(self):
         """Normalise EcoCash number into 9-digit format starting with 7."""
-        number = (self.ecocash_number or "").strip()
-
-        # Remove spaces + plus sign
-        number = number.replace(" ", "").replace("+", "")
+        if not is_valid_mobile(self.ecocash_number):
+            raise ValidationError("Invalid EcoCash number format")
 
-        # Accept "2637" or "26378" formats
-        if number.startswith("263"):
-            number = number[3:]
+        return to_local(self.ecocash_number)
 
-        # Accept "07..." → convert to "7..."
-        if number.startswith("07"):
-            number = number[1:]
 
-        # Final validation
-        if not (number.isdigit() and len(number) == 9 and number.startswith("7")):
-            raise ValidationError("Invalid EcoCash number format")
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Row as loaded - save() applies a status change as a conditional UPDATE
+        # and moves the daily rollups from this snapshot. None if any field was deferred.
+        loaded = instance.__dict__
+        if all(field in loaded for field in ROLLUP_FIELDS):
+            instance._loaded_row = tuple(loaded[field] for field in ROLLUP_FIELDS)
+        else:
+            instance._loaded_row = None
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        # Whatever moved the row since it was loaded, the snapshot must follow the database
+        loaded = self.__dict__
+        if fields is None and all(field in loaded for field in ROLLUP_FIELDS):
+            self._loaded_row = tuple(loaded[field] for field in ROLLUP_FIELDS)
+        elif fields is None or set(fields) & set(ROLLUP_FIELDS):
+            self._loaded_row = None
+
+    def _previous_row(self):
+        """ROLLUP_FIELDS as they are in the database (as far as this instance knows), None if new."""
+        if self._state.adding and not self.pk:
+            return None
+        # Built by hand with an existing pk, or loaded with deferred fields
+        row = None if self._state.adding else getattr(self, '_loaded_row', None)
+        if row is None:
+            row = EcoCashTransaction.objects.filter(pk=self.pk).values_list(*ROLLUP_FIELDS).first()
+        return row
+
+    def _save_transition(self, previous, update_fields, using):
+        """
+        Write the row with UPDATE ... WHERE status = previous.
 
-        return number
+        Raises StatusConflict if another worker moved the status first, so
+        a completion can't be recorded (or billed) twice.
+        """
+        cls = self.__class__
+        if update_fields is not None:
+            update_fields = frozenset(update_fields)
+        pre_save.send(sender=cls, instance=self, raw=False, using=using, update_fields=update_fields)
+        values = {
+            field.attname: field.pre_save(self, False)
+            for field in self._meta.concrete_fields
+            if not field.primary_key and (
+                update_fields is None or field.name in update_fields or field.attname in update_fields
+            )
+        }
+        updated = cls._base_manager.using(using).filter(pk=self.pk, status=previous).update(**values)
+        if not updated:
+            raise StatusConflict(
+                f"{self.reference_number}: status is no longer '{previous}', not moving it to '{self.status}'"
+            )
+        self._state.db = using
+        post_save.send(sender=cls, instance=self, created=False, raw=False, using=using, update_fields=update_fields)
 
+    def _write(self, transition_from, args, kwargs, using):
+        if transition_from is not None:
+            self._save_transition(transition_from, kwargs.get('update_fields'), using)
+        else:
+            super().save(*args, **kwargs)
 
     def save(self, *args, **kwargs):
         # Always normalise EcoCash number
         if self.ecocash_number:
             self.ecocash_number = self.clean_ecocash()
+        self.phone_e164 = to_e164(self.ecocash_number)
+        if kwargs.get('update_fields') is not None and 'ecocash_number' in kwargs['update_fields']:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'phone_e164'}
 
         # Generate reference number if missing
         if not self.reference_number:
@@ -339,48 +421,59 @@ class EcoCashTransaction(models.Model):
         if self.status == 'completed' and not self.processed_at:
             self.processed_at = now()
         
-        # Check new completion
-        is_new_completion = False
-        if self.pk and EcoCashTransaction.objects.filter(pk=self.pk).exists():
-            original = EcoCashTransaction.objects.get(pk=self.pk)
-            if original.status != "completed" and self.status == "completed":
-                is_new_completion = True
-        else:
-            if self.status == "completed":
-                is_new_completion = True
-            
-        super().save(*args, **kwargs)
-
-        # Billing cycle integration (deposit + withdrawal)
-        if is_new_completion and self.transaction_type in ["deposit", "withdrawal","weltrade_deposit","book_subscription"]:
-            billing, created = BillingCycle.objects.get_or_create(
-                client_name="Supreme AI",
-                paid=False,
-                defaults={
-                    "start_date": now().date(),
-                    "end_date": now().date() + timedelta(days=30),
-                }
-            )
+        # Status change on an existing row -> conditional UPDATE; anything else -> plain save
+        update_fields = kwargs.get('update_fields')
+        writes_status = update_fields is None or 'status' in update_fields
+        previous_row = self._previous_row()
+        previous = previous_row[2] if previous_row else None
+        is_new_completion = writes_status and self.status == "completed" and previous != "completed"
+        is_transition = (
+            writes_status and previous is not None and previous != self.status
+            and not kwargs.get('force_insert') and not self._state.adding
+        )
+        bills = is_new_completion and self.transaction_type in ["deposit", "withdrawal", "weltrade_deposit", "book_subscription"]
 
-            billing.add_transaction(
-                amount=self.amount,
-                transaction_type=self.transaction_type
-            )
+        # The row as it will be once written - fields outside update_fields keep their old values
+        row = tuple(
+            getattr(self, field) if update_fields is None or field in update_fields or previous_row is None
+            else previous_row[i]
+            for i, field in enumerate(ROLLUP_FIELDS)
+        )
+
+        using = kwargs.get('using') or router.db_for_write(self.__class__, instance=self)
+        # The write, its billing and its rollup land together or not at all
+        with db_transaction.atomic(using=using):
+            self._write(previous if is_transition else None, args, kwargs, using)
+
+            if bills:
+                # Billing cycle integration (deposit + withdrawal)
+                billing, created = BillingCycle.objects.get_or_create(
+                    client_name="Supreme AI",
+                    paid=False,
+                    defaults={
+                        "start_date": now().date(),
+                        "end_date": now().date() + timedelta(days=30),
+                    }
+                )
+
+                billing.add_transaction(
+                    amount=self.amount,
+                    transaction_type=self.transaction_type,
+                    transaction=self,
+                )
+
+            rollups.record(previous_row, row, using)
+        self._loaded_row = row
 
     
 
     # ------------------------------------
-    # REFERENCE NUMBER GENERATOR (UNCHANGED)
+    # REFERENCE NUMBER GENERATOR
     # ------------------------------------
-    def generate_reference_number(self):
-        """Generate unique 9-character reference number: 3 letters + 6 digits."""
-        while True:
-            letters = ''.join(random.choices(string.ascii_uppercase, k=3))
-            numbers = ''.join(random.choices(string.digits, k=6))
-            ref_number = f"{letters}{numbers}"
-            
-            if not EcoCashTransaction.objects.filter(reference_number=ref_number).exists():
-                return ref_number
+    @staticmethod
+    def generate_reference_number(prefix=""):
+        """Unique 9-character reference number: 3 letters + 6 digits, after ``prefix``."""
+        return f"{prefix}{next_reference('transaction')}"
     
 
     # --------------------
@@ -451,6 +544,27 @@ class EcoCashTransaction(models.Model):
             self.admin_notes = reason
         self.save()
 
+class DailyRollup(models.Model):
+    """Transactions created on one local day, per type and current status (see finance.rollups)."""
+    date = models.DateField()
+    transaction_type = models.CharField(max_length=20, choices=EcoCashTransaction.TRANSACTION_TYPES)
+    status = models.CharField(max_length=12, choices=EcoCashTransaction.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    charge = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-date', 'transaction_type', 'status']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'transaction_type', 'status'], name='finance_dailyrollup_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.transaction_type} {self.status}: {self.count} / ${self.amount}"
+
+
 class TransactionReceipt(models.Model):
     """Store transaction receipts and proof of payment"""
     transaction = models.OneToOneField(EcoCashTransaction, on_delete=models.CASCADE, related_name='receipt')
@@ -0,0 +1,362 @@
+# finance/reconciliation.py
+"""
+Reconcile money in against money out for a time window.
+
+Money in:  CashOutTransaction rows parsed from EcoCash SMS.
+Money out: EcoCashTransaction payouts, and behind them the Deriv payment
+           agent statement and the Binance withdraw history.
+
+Every source is loaded once into plain dicts keyed by its join id and
+matched in memory (hash join), so a month of rows is a handful of
+streaming queries plus dictionary lookups instead of a query per row.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from accounts import names
+from ecocash.models import CashOutTransaction
+from .models import EcoCashTransaction
+
+AMOUNT_TOLERANCE = Decimal('0.01')
+
+# _process_weltrade_payment sends transaction.amount + 1 to cover the TRC20 fee
+BINANCE_NETWORK_FEE = Decimal('1')
+
+# Binance withdraw history status codes that mean the money never left
+BINANCE_FAILED_STATUSES = {1, 3, 5}   # cancelled, rejected, failure
+
+# Transactions that are paid for with an EcoCash cashout
+CASHOUT_FUNDED_TYPES = ('deposit', 'weltrade_deposit', 'book_subscription')
+
+# Rows either side of the window that may still be the other half of a pair
+DEFAULT_MARGIN = timedelta(hours=24)
+
+
+def short_code(reference):
+    """Last dot-separated segment of an EcoCash txn id (CO260125.1155.T9053599 -> T9053599)."""
+    if not reference:
+        return ''
+    return reference.strip().rsplit('.', 1)[-1]
+
+
+def _to_decimal(value):
+    if value is None:
+        return Decimal('0')
+    return Decimal(str(value))
+
+
+def _differs(a, b):
+    return abs(_to_decimal(a) - _to_decimal(b)) > AMOUNT_TOLERANCE
+
+
+# -----------------------------
+# LOADERS
+# -----------------------------
+def load_cashouts(since, until):
+    return list(
+        CashOutTransaction.objects.filter(timestamp__gte=since, timestamp__lt=until)
+        .values('id', 'txn_id', 'amount', 'phone_e164', 'name', 'name_tokens', 'completed', 'timestamp')
+        .iterator(chunk_size=5000)
+    )
+
+
+def load_transactions(since, until):
+    return list(
+        EcoCashTransaction.objects.filter(created_at__gte=since, created_at__lt=until)
+        .values(
+            'id', 'reference_number', 'transaction_type', 'status', 'amount', 'charge',
+            'phone_e164', 'ecocash_name', 'ecocash_reference', 'deriv_transaction_id', 'created_at',
+        )
+        .iterator(chunk_size=5000)
+    )
+
+
+def load_deriv_statement(since, until):
+    """Deriv payment agent statement rows, or None if Deriv could not be reached."""
+    from deriv.service import deriv_service
+    from deriv.views import DerivPaymentAgent
+
+    return deriv_service.run(DerivPaymentAgent().fetch_statement(since, until), timeout=300)
+
+
+def load_binance_withdrawals(since, until):
+    from weltrade.services.binance_client import binance_withdraw_history
+
+    return binance_withdraw_history(
+        start_time=int(since.timestamp() * 1000),
+        end_time=int(until.timestamp() * 1000),
+    )
+
+
+# -----------------------------
+# ENGINE
+# -----------------------------
+class Reconciler:
+    """
+    Hash-join the sources and collect findings.
+    Only rows inside [since, until) are reported; rows in the margin
+    around the window are loaded purely so edge pairs still match.
+    """
+
+    def __init__(self, since, until, cashouts, transactions, deriv_rows=None, binance_rows=None):
+        self.since = since
+        self.until = until
+        self.cashouts = cashouts
+        self.transactions = transactions
+        self.deriv_rows = deriv_rows
+        self.binance_rows = binance_rows
+        self.findings = defaultdict(list)
+
+    def _in_window(self, moment):
+        return moment is not None and self.since <= moment < self.until
+
+    def _deriv_row_in_window(self, row):
+        epoch = row.get('transaction_time')
+        if epoch is None:
+            return True
+        return self._in_window(datetime.fromtimestamp(int(epoch), tz=dt_timezone.utc))
+
+    def _binance_row_in_window(self, row):
+        # applyTime is a UTC "YYYY-MM-DD HH:MM:SS" string
+        try:
+            applied = datetime.strptime(row.get('applyTime'), '%Y-%m-%d %H:%M:%S')
+        except (TypeError, ValueError):
+            return True
+        return self._in_window(applied.replace(tzinfo=dt_timezone.utc))
+
+    def run(self):
+        self._match_cashouts()
+        if self.deriv_rows is not None:
+            self._match_deriv()
+        if self.binance_rows is not None:
+            self._match_binance()
+        return self.report()
+
+    # EcoCash cashouts <-> EcoCashTransaction
+    def _match_cashouts(self):
+        by_txn_id = {}
+        by_short_code = defaultdict(list)
+        for cashout in self.cashouts:
+            by_txn_id[cashout['txn_id']] = cashout
+            by_short_code[short_code(cashout['txn_id'])].append(cashout)
+
+        claims = defaultdict(list)
+        for txn in self.transactions:
+            if txn['transaction_type'] not in CASHOUT_FUNDED_TYPES or txn['status'] != 'completed':
+                continue
+            cashout = self._find_cashout(txn, by_txn_id, by_short_code)
+            if cashout is None:
+                if self._in_window(txn['created_at']):
+                    self.findings['transactions_without_cashout'].append(self._txn_summary(txn))
+                continue
+            claims[cashout['id']].append(txn)
+
+        cashouts_by_id = {cashout['id']: cashout for cashout in self.cashouts}
+        named_pairs = []
+        for cashout_id, txns in claims.items():
+            cashout = cashouts_by_id[cashout_id]
+            if not self._in_window(cashout['timestamp']) and not any(
+                self._in_window(txn['created_at']) for txn in txns
+            ):
+                continue
+            named_pairs.extend((cashout, txn) for txn in txns if txn['ecocash_name'])
+            if len(txns) > 1:
+                self.findings['duplicate_redemptions'].append({
+                    'cashout': self._cashout_summary(cashout),
+                    'transactions': [self._txn_summary(txn) for txn in txns],
+                })
+            for txn in txns:
+                expected = _to_decimal(txn['amount']) + _to_decimal(txn['charge'])
+                if _differs(cashout['amount'], expected):
+                    self.findings['amount_mismatches'].append({
+                        'cashout': self._cashout_summary(cashout),
+                        'transaction': self._txn_summary(txn),
+                        'difference': str(_to_decimal(cashout['amount']) - expected),
+                    })
+
+        self._match_names(named_pairs)
+
+        for cashout in self.cashouts:
+            if cashout['id'] in claims or not self._in_window(cashout['timestamp']):
+                continue
+            key = 'completed_cashouts_without_transaction' if cashout['completed'] else 'unclaimed_cashouts'
+            self.findings[key].append(self._cashout_summary(cashout))
+
+    def _match_names(self, pairs):
+        # A redeemed cashout paid by someone other than the named client was probably claimed by the wrong POP
+        token_pairs = [
+            (names.from_key(cashout['name_tokens']) or names.normalize(cashout['name']), txn['ecocash_name'])
+            for cashout, txn in pairs
+        ]
+        for (cashout, txn), (cashout_tokens, txn_name), score in zip(pairs, token_pairs, names.score_pairs(token_pairs)):
+            if score < names.MATCH_THRESHOLD and not names.shares_token(cashout_tokens, txn_name):
+                self.findings['name_mismatches'].append({
+                    'cashout': self._cashout_summary(cashout),
+                    'transaction': self._txn_summary(txn),
+                    'transaction_name': txn['ecocash_name'],
+                    'similarity': round(score, 2),
+                })
+
+    def _find_cashout(self, txn, by_txn_id, by_short_code):
+        reference = (txn['ecocash_reference'] or '').strip()
+        if not reference:
+            return None
+        cashout = by_txn_id.get(reference)
+        if cashout:
+            return cashout
+
+        # Client quoted a short code - same suffix rule as CashOutTransaction.find_for_pop
+        candidates = [
+            cashout for cashout in by_short_code.get(short_code(reference), [])
+            if cashout['txn_id'].endswith(reference)
+        ]
+        same_phone = [cashout for cashout in candidates if cashout['phone_e164'] == txn['phone_e164']]
+        if same_phone:
+            return same_phone[0]
+        return candidates[0] if len(candidates) == 1 else None
+
+    # EcoCashTransaction <-> Deriv statement
+    def _match_deriv(self):
+        statement = {}
+        for row in self.deriv_rows:
+            if row.get('action_type') != 'transfer':
+                continue
+            statement[str(row.get('transaction_id'))] = row
+
+        ours = defaultdict(list)
+        for txn in self.transactions:
+            if txn['transaction_type'] not in ('deposit', 'withdrawal') or txn['status'] != 'completed':
+                continue
+            if txn['deriv_transaction_id']:
+                ours[str(txn['deriv_transaction_id'])].append(txn)
+
+        for deriv_id, txns in ours.items():
+            in_window = [txn for txn in txns if self._in_window(txn['created_at'])]
+            if not in_window:
+                continue
+            if len(txns) > 1:
+                self.findings['duplicate_deriv_ids'].append({
+                    'deriv_transaction_id': deriv_id,
+                    'transactions': [self._txn_summary(txn) for txn in txns],
+                })
+            row = statement.get(deriv_id)
+            if row is None:
+                for txn in in_window:
+                    self.findings['missing_at_deriv'].append(self._txn_summary(txn))
+                continue
+            deriv_amount = abs(_to_decimal(row.get('amount')))
+            for txn in in_window:
+                if _differs(deriv_amount, txn['amount']):
+                    self.findings['deriv_amount_mismatches'].append({
+                        'transaction': self._txn_summary(txn),
+                        'deriv_amount': str(deriv_amount),
+                    })
+
+        for deriv_id, row in statement.items():
+            if deriv_id not in ours and self._deriv_row_in_window(row):
+                self.findings['deriv_without_transaction'].append({
+                    'deriv_transaction_id': deriv_id,
+                    'amount': str(row.get('amount')),
+                    'description': row.get('longcode') or row.get('shortcode') or '',
+                    'transaction_time': row.get('transaction_time'),
+                })
+
+    # EcoCashTransaction <-> Binance withdraw history
+    def _match_binance(self):
+        history = {}
+        for row in self.binance_rows:
+            order_id = row.get('withdrawOrderId') or ''
+            if order_id.startswith('weltrade-'):
+                history[order_id] = row
+
+        ours = {}
+        for txn in self.transactions:
+            if txn['transaction_type'] != 'weltrade_deposit' or txn['status'] != 'completed':
+                continue
+            if txn['deriv_transaction_id']:
+                ours[txn['deriv_transaction_id']] = txn
+
+        for order_id, txn in ours.items():
+            if not self._in_window(txn['created_at']):
+                continue
+            row = history.get(order_id)
+            if row is None:
+                self.findings['missing_at_binance'].append(self._txn_summary(txn))
+                continue
+            if row.get('status') in BINANCE_FAILED_STATUSES:
+                self.findings['binance_failed_but_completed'].append({
+                    'transaction': self._txn_summary(txn),
+                    'binance_status': row.get('status'),
+                    'binance_id': row.get('id'),
+                })
+            expected = _to_decimal(txn['amount']) + BINANCE_NETWORK_FEE
+            if _differs(row.get('amount'), expected):
+                self.findings['binance_amount_mismatches'].append({
+                    'transaction': self._txn_summary(txn),
+                    'binance_amount': str(row.get('amount')),
+                    'expected': str(expected),
+                })
+
+        for order_id, row in history.items():
+            if order_id not in ours and self._binance_row_in_window(row):
+                self.findings['binance_without_transaction'].append({
+                    'withdraw_order_id': order_id,
+                    'binance_id': row.get('id'),
+                    'amount': str(row.get('amount')),
+                    'status': row.get('status'),
+                    'apply_time': row.get('applyTime'),
+                })
+
+    # Output
+    @staticmethod
+    def _cashout_summary(cashout):
+        return {
+            'id': cashout['id'],
+            'txn_id': cashout['txn_id'],
+            'amount': str(cashout['amount']),
+            'phone': cashout['phone_e164'],
+            'name': cashout['name'],
+            'timestamp': cashout['timestamp'].isoformat() if cashout['timestamp'] else None,
+        }
+
+    @staticmethod
+    def _txn_summary(txn):
+        return {
+            'id': txn['id'],
+            'reference_number': txn['reference_number'],
+            'type': txn['transaction_type'],
+            'amount': str(txn['amount']),
+            'charge': str(txn['charge']),
+            'ecocash_reference': txn['ecocash_reference'],
+            'deriv_transaction_id': txn['deriv_transaction_id'],
+            'created_at': txn['created_at'].isoformat() if txn['created_at'] else None,
+        }
+
+    def report(self):
+        return {
+            'window': {'since': self.since.isoformat(), 'until': self.until.isoformat()},
+            'sources': {
+                'cashouts': len(self.cashouts),
+                'transactions': len(self.transactions),
+                'deriv_rows': None if self.deriv_rows is None else len(self.deriv_rows),
+                'binance_rows': None if self.binance_rows is None else len(self.binance_rows),
+            },
+            'findings': dict(self.findings),
+        }
+
+
+def reconcile(since, until, margin=DEFAULT_MARGIN, include_deriv=True, include_binance=True):
+    """Load every source for the window (plus margin) and return the report dict."""
+    cashouts = load_cashouts(since - margin, until)
+    transactions = load_transactions(since - margin, until + margin)
+
+    deriv_rows = None
+    if include_deriv:
+        deriv_rows = load_deriv_statement(since, until + margin)
+
+    binance_rows = None
+    if include_binance:
+        binance_rows = load_binance_withdrawals(since, until + margin)
+
+    return Reconciler(since, until, cashouts, transactions, deriv_rows, binance_rows).run()
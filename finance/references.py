@@ -0,0 +1,167 @@
+# finance/references.py
+"""
+Unique, non-guessable reference numbers with no lookups.
+
+References used to be drawn at random and checked with an existence
+query per attempt (EcoCashTransaction), taken from a uuid prefix
+(EcocashTransfers) or built from the current second (DP/WT/WD/BK...),
+which collides whenever two land in the same second. Now:
+
+    next_reference('transaction')   # 'QZK402981'
+    next_reference('transfer')      # 'ECO9F3A61C2'
+
+1. Each process reserves BLOCK_SIZE counter values of a format at a time
+   with one nextval() on that format's Postgres sequence. Sequences are
+   atomic across connections and never roll back, so no two processes or
+   nodes ever hold the same value, and allocation never waits on anyone's
+   transaction. Other databases (SQLite in tests and development) get a
+   row per format in a counter table, incremented on the caller's
+   connection; a block reserved inside the caller's transaction could be
+   rolled back with it, so only one value of it is used.
+2. The counter value is mapped into the format's id space by a keyed
+   Feistel permutation (HMAC-SHA256 rounds keyed from SECRET_KEY, cycle
+   walking down to the exact space size). A permutation never maps two
+   values to the same id, and without the key consecutive references look
+   unrelated.
+
+Every format has its own counter, so a format's id space is only used up
+by its own references and by the unused rest of blocks its processes
+reserved and dropped (restarts, forks) - at most BLOCK_SIZE - 1 values
+per process start. A new format needs its counter created by a migration
+(see finance/migrations/0018_reference_counter_per_kind.py). Rows created before the allocator carry
+random references, so one of them could in principle match a new one -
+the unique constraints still guard it.
+"""
+import hashlib
+import hmac
+import os
+import string
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction as db_transaction
+
+SEQUENCE = 'finance_reference_{kind}_seq'
+COUNTER_TABLE = 'finance_reference_counter'     # one row per kind, off Postgres
+BLOCK_SIZE = 100                # counter values reserved per nextval()
+ROUNDS = 4
+
+UPPER = string.ascii_uppercase
+DIGITS = string.digits
+HEX = '0123456789ABCDEF'
+
+# kind -> (prefix, one alphabet per character)
+FORMATS = {
+    # EcoCashTransaction: 3 letters + 6 digits, as before
+    'transaction': ('', (UPPER,) * 3 + (DIGITS,) * 6),
+    # EcocashTransfers: ECO + 8 hex, as the uuid prefix was
+    'transfer': ('ECO', (HEX,) * 8),
+    'signal': ('SIG', (DIGITS,) * 8),
+    'signal_job': ('JOB', (DIGITS,) * 8),
+}
+
+
+class FeistelPermutation:
+    """Keyed bijection on range(size)."""
+
+    def __init__(self, size, key):
+        self.size = size
+        self.key = key
+        # Balanced halves over the smallest even power of two >= size
+        self.half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+        self.mask = (1 << self.half_bits) - 1
+
+    def _round(self, i, value):
+        digest = hmac.new(self.key, bytes((i,)) + value.to_bytes(8, 'big'), hashlib.sha256).digest()
+        return int.from_bytes(digest[:8], 'big') & self.mask
+
+    def _encrypt(self, value):
+        left, right = value >> self.half_bits, value & self.mask
+        for i in range(ROUNDS):
+            left, right = right, left ^ self._round(i, right)
+        return (left << self.half_bits) | right
+
+    def __call__(self, value):
+        if not 0 <= value < self.size:
+            raise ValueError(f"{value} is outside the id space of {self.size}")
+        # Cycle walking: the domain is under 4x size, so this takes a few steps at most
+        value = self._encrypt(value)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+
+class ReferenceFormat:
+    def __init__(self, kind, prefix, alphabets):
+        self.prefix = prefix
+        self.alphabets = alphabets
+        self.size = 1
+        for alphabet in alphabets:
+            self.size *= len(alphabet)
+        key = hmac.new(settings.SECRET_KEY.encode(), f"reference:{kind}".encode(), hashlib.sha256).digest()
+        self.permute = FeistelPermutation(self.size, key)
+
+    def format(self, counter):
+        value = self.permute(counter)
+        chars = []
+        for alphabet in reversed(self.alphabets):
+            value, index = divmod(value, len(alphabet))
+            chars.append(alphabet[index])
+        return self.prefix + ''.join(reversed(chars))
+
+
+class BlockAllocator:
+    """Counter values for one format, BLOCK_SIZE at a time per process."""
+
+    def __init__(self, kind, using='default'):
+        self.kind = kind
+        self.using = using
+        self._lock = threading.Lock()
+        self._pid = None
+        self._next = 0
+        self._end = 0
+
+    def _reserve(self):
+        """First value of a newly reserved block and how many of it may be used."""
+        connection = connections[self.using]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT nextval(%s)", [SEQUENCE.format(kind=self.kind)])
+                block = cursor.fetchone()[0]
+            return (block - 1) * BLOCK_SIZE, BLOCK_SIZE
+
+        # Inside the caller's transaction the increment rolls back with it
+        usable = 1 if connection.in_atomic_block else BLOCK_SIZE
+        table = connection.ops.quote_name(COUNTER_TABLE)
+        with db_transaction.atomic(using=self.using), connection.cursor() as cursor:
+            cursor.execute(f"UPDATE {table} SET value = value + 1 WHERE kind = %s", [self.kind])
+            cursor.execute(f"SELECT value FROM {table} WHERE kind = %s", [self.kind])
+            block = cursor.fetchone()[0]
+        return (block - 1) * BLOCK_SIZE, usable
+
+    def next(self):
+        with self._lock:
+            # A forked worker must not hand out its parent's block
+            if self._pid != os.getpid() or self._next >= self._end:
+                self._next, usable = self._reserve()
+                self._end = self._next + usable
+                self._pid = os.getpid()
+            value = self._next
+            self._next += 1
+            return value
+
+
+_allocators = {}
+_formats = {}
+
+
+def next_reference(kind):
+    """A new reference in the ``kind`` format (see FORMATS)."""
+    reference_format = _formats.get(kind)
+    if reference_format is None:
+        prefix, alphabets = FORMATS[kind]
+        reference_format = _formats[kind] = ReferenceFormat(kind, prefix, alphabets)
+    allocator = _allocators.get(kind)
+    if allocator is None:
+        allocator = _allocators.setdefault(kind, BlockAllocator(kind))
+    return reference_format.format(allocator.next())
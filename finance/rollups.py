@@ -0,0 +1,144 @@
+# finance/rollups.py
+"""
+Per-day transaction totals for the admin dashboard.
+
+The dashboard used to aggregate EcoCashTransaction directly - about
+twenty count/sum queries per page load, most filtering on
+created_at__date, which can't use the created_at indexes. DailyRollup
+keeps one row per (date, transaction_type, status) with the count,
+amount and charge of the transactions created that day, so the dashboard
+reads a few dozen rows however long the history gets.
+
+Rows are kept current as transactions change:
+
+    EcoCashTransaction.save()     # moves the row it writes, in the same DB transaction
+    record_status_move(txn, old, new)   # for status changes made with queryset.update()
+
+Each change is applied as deltas (-1 from the old key, +1 on the new one)
+in a single INSERT ... ON CONFLICT DO UPDATE, keys in sorted order so
+two transitions in opposite directions can't deadlock. Writes that skip
+save() altogether (bulk_update, raw SQL) are caught up with rebuild(),
+which the backfill_rollups command runs for a date range.
+
+Dates are local (TIME_ZONE), the same day created_at__date filtered on.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connections, router, transaction as db_transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+# Order of the snapshot tuples passed to record()
+ROLLUP_FIELDS = ('created_at', 'transaction_type', 'status', 'amount', 'charge')
+
+ZERO = Decimal('0.00')
+
+
+def local_date(value):
+    if timezone.is_aware(value):
+        return timezone.localdate(value)
+    return value.date()
+
+
+def day_start(day):
+    """Aware start of a local ``day`` - for index-friendly created_at ranges."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _key(row):
+    created_at, transaction_type, status, _, _ = row
+    return local_date(created_at), transaction_type, status
+
+
+def record(old, new, using='default'):
+    """
+    Move one transaction from snapshot ``old`` to ``new`` (ROLLUP_FIELDS
+    tuples, None for a row that didn't / no longer exists).
+    """
+    if old == new:
+        return
+    deltas = {}
+    for row, sign in ((old, -1), (new, 1)):
+        if row is None:
+            continue
+        count, amount, charge = deltas.get(_key(row), (0, ZERO, ZERO))
+        deltas[_key(row)] = (
+            count + sign, amount + sign * (row[3] or ZERO), charge + sign * (row[4] or ZERO),
+        )
+    deltas = {key: delta for key, delta in deltas.items() if delta != (0, ZERO, ZERO)}
+    if deltas:
+        _apply(deltas, using)
+
+
+def record_status_move(transaction, old_status, new_status):
+    """Status changed with queryset.update() instead of save()."""
+    using = router.db_for_write(type(transaction), instance=transaction)
+    row = [getattr(transaction, field) for field in ROLLUP_FIELDS]
+    old, new = list(row), list(row)
+    old[2], new[2] = old_status, new_status
+    record(tuple(old), tuple(new), using)
+    # The instance's snapshot is stale now - its next save() reads the row again
+    transaction._loaded_row = None
+
+
+def _apply(deltas, using):
+    from .models import DailyRollup
+
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    table = qn(DailyRollup._meta.db_table)
+    placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(deltas))
+    params = []
+    for (day, transaction_type, status), (count, amount, charge) in sorted(deltas.items()):
+        params += [day, transaction_type, status, count, amount, charge]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (date, transaction_type, status, count, amount, charge) "
+            f"VALUES {placeholders} "
+            f"ON CONFLICT (date, transaction_type, status) DO UPDATE SET "
+            f"count = {table}.count + EXCLUDED.count, "
+            f"amount = {table}.amount + EXCLUDED.amount, "
+            f"charge = {table}.charge + EXCLUDED.charge",
+            params,
+        )
+
+
+def rebuild(date_from=None, date_to=None):
+    """
+    Recompute the rollups for local days date_from..date_to (open-ended
+    when None) from EcoCashTransaction. Returns the number of rows written.
+
+    Transactions saved while this runs can be counted twice or not at all
+    for the days being rebuilt - run it again for those days if so.
+    """
+    from .models import DailyRollup, EcoCashTransaction
+
+    transactions = EcoCashTransaction.objects.all()
+    rollups = DailyRollup.objects.all()
+    if date_from:
+        transactions = transactions.filter(created_at__gte=day_start(date_from))
+        rollups = rollups.filter(date__gte=date_from)
+    if date_to:
+        transactions = transactions.filter(created_at__lt=day_start(date_to + timedelta(days=1)))
+        rollups = rollups.filter(date__lte=date_to)
+
+    rows = [
+        DailyRollup(
+            date=row['day'],
+            transaction_type=row['transaction_type'],
+            status=row['status'],
+            count=row['count'],
+            amount=row['amount'] or ZERO,
+            charge=row['charge'] or ZERO,
+        )
+        for row in transactions.annotate(day=TruncDate('created_at'))
+        .values('day', 'transaction_type', 'status')
+        .annotate(count=Count('id'), amount=Sum('amount'), charge=Sum('charge'))
+        .order_by()
+    ]
+    with db_transaction.atomic():
+        rollups.delete()
+        DailyRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
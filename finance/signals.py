@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import charges, rollups
+from .models import EcoCashTransaction, TransactionCharge
+
+
+@receiver(post_save, sender=TransactionCharge)
+@receiver(post_delete, sender=TransactionCharge)
+def charge_table_changed(sender, **kwargs):
+    """Bands added, edited, toggled or removed - rebuild the cached schedules."""
+    charges.invalidate()
+
+
+@receiver(post_delete, sender=EcoCashTransaction)
+def transaction_deleted(sender, instance, using, **kwargs):
+    """Take a deleted transaction out of its daily rollup."""
+    rollups.record(tuple(getattr(instance, field) for field in rollups.ROLLUP_FIELDS), None, using)
@@ -1,3 +1,83 @@
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.models import User
+from .models import BillingCycle, EcoCashTransaction, StatusConflict
+from .references import next_reference
+
+
+class StatusSnapshotTests(TestCase):
+    """save() applies status changes with UPDATE ... WHERE status = <as loaded>."""
+
+    def setUp(self):
+        self.user = User.objects.create(
+            email='trader@example.com', username='trader', phone_number='0771234567',
+        )
+        self.transaction = EcoCashTransaction.objects.create(
+            user=self.user,
+            transaction_type='withdrawal',
+            amount=Decimal('25.00'),
+            ecocash_number='0771234567',
+            ecocash_name='Test Trader',
+            status='pending',
+        )
+
+    def _move_out_of_band(self, status):
+        EcoCashTransaction.objects.filter(pk=self.transaction.pk).update(status=status)
+
+    def test_refresh_from_db_follows_out_of_band_status_change(self):
+        self._move_out_of_band('processing')
+        self.transaction.refresh_from_db(fields=['status'])
+
+        self.transaction.mark_failed(reason='test')
+
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.status, 'failed')
+
+    def test_full_refresh_then_completion(self):
+        self._move_out_of_band('processing')
+        self.transaction.refresh_from_db()
+
+        self.transaction.mark_withdrawal_completed('ECO123')
+
+        self.assertEqual(EcoCashTransaction.objects.get(pk=self.transaction.pk).status, 'completed')
+
+    def test_stale_instance_still_conflicts(self):
+        stale = EcoCashTransaction.objects.get(pk=self.transaction.pk)
+        self._move_out_of_band('processing')
+
+        with self.assertRaises(StatusConflict):
+            stale.mark_failed(reason='test')
+        self.assertEqual(EcoCashTransaction.objects.get(pk=self.transaction.pk).status, 'processing')
+
+
+class BillingTests(TestCase):
+    def test_completion_bills_a_fresh_cycle(self):
+        user = User.objects.create(email='payer@example.com', username='payer', phone_number='0772222222')
+        transaction = EcoCashTransaction.objects.create(
+            user=user,
+            transaction_type='withdrawal',
+            amount=Decimal('50.00'),
+            ecocash_number='0772222222',
+            ecocash_name='Test Payer',
+            status='processing',
+        )
+
+        transaction.mark_withdrawal_completed('ECO456')
+
+        cycle = BillingCycle.objects.get(client_name='Supreme AI', paid=False)
+        self.assertEqual(cycle.transactions_count, 1)
+        self.assertEqual(cycle.amount_due, Decimal('0.50'))
+
+
+class ReferenceTests(TestCase):
+    """next_reference() draws from one counter per format."""
+
+    def test_references_are_unique_inside_a_transaction(self):
+        with db_transaction.atomic():
+            references = [next_reference('signal') for _ in range(50)]
+        self.assertEqual(len(set(references)), 50)
+        self.assertTrue(all(reference.startswith('SIG') for reference in references))
+
@@ -11,7 +11,9 @@ urlpatterns = [
     path('admin/', views_admin.admin_dashboard, name='admin_dashboard'),
     path('admin/transactions/', views_admin.admin_transaction_list, name='admin_transaction_list'),
     path('admin/transactions/create/', views_admin.admin_transaction_create, name='admin_transaction_create'),
+    path('admin/transactions/bulk-process/', views_admin.admin_transaction_bulk_process, name='admin_transaction_bulk_process'),
     path('api/calculate-charge/', views_admin.api_calculate_charge, name='api_calculate_charge'),
+    path('api/charges/what-if/', views_admin.api_charges_what_if, name='api_charges_what_if'),
     path('api/verify-ecocash/', views_admin.api_verify_ecocash, name='api_verify_ecocash'),
     path('admin/transactions/<int:pk>/', views_admin.admin_transaction_detail, name='admin_transaction_detail'),
     path('admin/receipts/<int:pk>/verify/', views_admin.admin_verify_receipt, name='admin_verify_receipt'),
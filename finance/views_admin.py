@@ -2,24 +2,30 @@
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import user_passes_test
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.db.models import Q, Sum, Count
 from django.core.paginator import Paginator
 from django.contrib import messages
 from django.utils import timezone
 from datetime import datetime, timedelta
 from .models import EcoCashTransaction, TransactionReceipt, TransactionCharge
+from . import rollups
+from .charges import charge_schedule, invalidate as invalidate_charge_schedules
+from .charge_engine import ChargeEngine, from_cents, schedule_from_dicts, to_cents
 from .forms import AdminTransactionForm, TransactionChargeForm
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 import asyncio
-import re
-from difflib import SequenceMatcher
 from django.contrib.auth.decorators import login_required, user_passes_test
 from accounts.models import User
+from accounts.phone import to_e164
+from accounts import names
 from whatsapp.models import ClientVerification
 from ecocash.models import CashOutTransaction
 from django.views.decorators.http import require_POST
 from django.db import transaction
+from django.db import connections
+from django.conf import settings
+from concurrent.futures import ThreadPoolExecutor
 from .forms import CashOutTransactionForm
 import random
 import string
@@ -108,6 +114,8 @@ def admin_transaction_list(request):
         'filter_date_from': date_from,
         'filter_date_to': date_to,
         'filter_search': search,
+        'bulk_statuses': BULK_RETRY_STATUSES,
+        'bulk_concurrency': getattr(settings, 'DERIV_BULK_CONCURRENCY', 4),
     }
     
     return render(request, 'finance/admin/transaction_list.html', context)
@@ -168,7 +176,7 @@ def admin_transaction_create(request):
             try:
                 # Save the transaction first
                 transaction = form.save(commit=False)
-                transaction.reference_number = f"DP{datetime.now().strftime('%Y%m%d%H%M%S')}"
+                transaction.reference_number = EcoCashTransaction.generate_reference_number("DP")
                 transaction.status = 'pending'
                 transaction.save()
                 
@@ -206,26 +214,165 @@ def admin_transaction_create(request):
     return render(request, 'finance/admin/transaction_create.html', context)
 
 
-def process_admin_deposit_transaction(transaction):
-    """Process deposit transaction similar to WhatsApp flow (for admin)"""
+# Deposits staff may re-push in bulk; completed ones are never touched again.
+# awaiting_pop is left out - nothing shows those were ever paid.
+BULK_RETRY_STATUSES = ('pending', 'failed')
+BULK_MAX_CONCURRENCY = 10
+
+
+def bulk_process_deposit(pk):
+    """
+    Re-push one stuck deposit through the Deriv transfer pipeline.
+
+    Idempotent per transaction: the deposit is claimed with a conditional
+    UPDATE (status -> processing), so a second bulk run, a double-click or
+    another admin can't send it twice. Returns a progress dict for the stream.
+    """
+    try:
+        txn = EcoCashTransaction.objects.filter(pk=pk).only(
+            'reference_number', 'status', 'transaction_type', 'deriv_transaction_id', 'awaiting_float',
+            'created_at', 'amount', 'charge',
+        ).first()
+        if txn is None:
+            return {'id': pk, 'reference': '', 'outcome': 'skipped', 'message': 'Transaction not found'}
+
+        result = {'id': pk, 'reference': txn.reference_number}
+        if txn.transaction_type != 'deposit':
+            return {**result, 'outcome': 'skipped', 'status': txn.status, 'message': 'Not a Deriv deposit'}
+
+        previous_status = txn.status
+        claimed = EcoCashTransaction.objects.filter(
+            Q(deriv_transaction_id__isnull=True) | Q(deriv_transaction_id=''),
+            pk=pk,
+            status=previous_status,
+            status__in=BULK_RETRY_STATUSES,
+            awaiting_float=False,
+        ).update(status='processing')
+        if not claimed:
+            return {**result, 'outcome': 'skipped', 'status': txn.status,
+                    'message': f'Already {txn.get_status_display().lower()} - left alone'}
+        rollups.record_status_move(txn, previous_status, 'processing')
+
+        transaction = EcoCashTransaction.objects.select_related('user').get(pk=pk)
+        outcome = process_admin_deposit_transaction(transaction, recalculate=False)
+
+        if outcome['success']:
+            return {**result, 'outcome': 'completed', 'status': 'completed',
+                    'message': outcome.get('message', 'Transfer successful')}
+
+        error = outcome.get('error', 'Unknown error')
+        if outcome.get('float_low'):
+            # Nothing was sent - hand it back as it was
+            if EcoCashTransaction.objects.filter(pk=pk, status='processing').update(status=previous_status):
+                rollups.record_status_move(txn, 'processing', previous_status)
+            return {**result, 'outcome': 'skipped', 'status': previous_status, 'message': error}
+        if outcome.get('uncertain'):
+            # The transfer may have gone through - keep it out of the next bulk run
+            transaction.admin_notes = f"Bulk re-push: {error}. Check the Deriv statement before retrying."
+            transaction.save()
+            return {**result, 'outcome': 'uncertain', 'status': 'processing', 'message': error}
+
+        transaction.mark_failed(reason=f"Bulk re-push failed: {error}")
+        return {**result, 'outcome': 'failed', 'status': 'failed', 'message': error}
+    except Exception as e:
+        print(f"Bulk deposit {pk} error: {e}")
+        return {'id': pk, 'reference': '', 'outcome': 'failed', 'message': str(e)}
+    finally:
+        # Pool threads are thrown away after the run - don't leave their connections open
+        connections.close_all()
+
+
+def _bulk_concurrency(value):
+    default = getattr(settings, 'DERIV_BULK_CONCURRENCY', 4)
+    try:
+        concurrency = int(value or default)
+    except (TypeError, ValueError):
+        concurrency = default
+    return max(1, min(concurrency, BULK_MAX_CONCURRENCY))
+
+
+@require_POST
+async def admin_transaction_bulk_process(request):
+    """
+    Re-push the selected deposits to Deriv, ``concurrency`` at a time.
+
+    Progress is streamed back as server-sent events (one ``progress`` event
+    per transaction, then ``done``) so the transaction list can update each
+    row as its transfer finishes. Served from supreme.asgi like the live feed.
+    """
+    user = await request.auser()
+    if not (user.is_active and user.is_staff and user.user_type == 'admin'):
+        return HttpResponseForbidden('Admin only')
+
+    ids = []
+    for value in request.POST.getlist('transaction_ids'):
+        if value.isdigit() and int(value) not in ids:
+            ids.append(int(value))
+    concurrency = _bulk_concurrency(request.POST.get('concurrency'))
+
+    async def event_stream():
+        totals = {'completed': 0, 'failed': 0, 'uncertain': 0, 'skipped': 0}
+        yield f"event: start\ndata: {json.dumps({'total': len(ids), 'concurrency': concurrency})}\n\n"
+
+        loop = asyncio.get_running_loop()
+        pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='bulk-deposit')
+        try:
+            jobs = [loop.run_in_executor(pool, bulk_process_deposit, pk) for pk in ids]
+            for done, job in enumerate(asyncio.as_completed(jobs), start=1):
+                result = await job
+                totals[result['outcome']] = totals.get(result['outcome'], 0) + 1
+                result['done'] = done
+                yield f"event: progress\ndata: {json.dumps(result, default=str)}\n\n"
+        finally:
+            # A closed page stops queued deposits; ones already sending finish
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        yield f"event: done\ndata: {json.dumps(totals)}\n\n"
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def process_admin_deposit_transaction(transaction, recalculate=True):
+    """
+    Process deposit transaction similar to WhatsApp flow (for admin).
+    recalculate=False sends transaction.amount as it is - for deposits whose
+    charge was already taken off (re-pushed failed/stuck deposits).
+    """
     try:
         # Import DerivPaymentAgent
         from deriv.views import DerivPaymentAgent
+        from deriv import name_cache
         
-        # Calculate net amount and charge
-        net_amount, charge = calculate_net_amount_and_charge_admin(transaction.amount)
+        if recalculate:
+            # Calculate net amount and charge
+            net_amount, charge = calculate_net_amount_and_charge_admin(transaction.amount)
+            
+            # Update transaction with calculated values
+            transaction.amount = net_amount
+            transaction.charge = charge
+            transaction.save()
+        else:
+            net_amount = transaction.amount
         
-        # Update transaction with calculated values
-        transaction.amount = net_amount
-        transaction.charge = charge
-        transaction.save()
+        # Refuse up front if the live float can't cover it (no Deriv call)
+        from deriv.balance import balance_monitor
+        float_state = balance_monitor.snapshot()
+        if float_state['known'] and (float_state['low'] or net_amount > float_state['balance']):
+            return {
+                'success': False,
+                'float_low': True,
+                'error': f"Deriv float too low ({float_state['currency']} {float_state['balance']}). Top up before processing."
+            }
         
         # Initialize Deriv agent
         deriv_agent = DerivPaymentAgent()
         
-        # Step 1: Fetch recipient details from Deriv
-        details_result = asyncio.run(
-            deriv_agent.fetch_payment_agent_transfer_details(net_amount, transaction.deriv_account_number)
+        # Step 1: Fetch recipient details (cached name or Deriv dry run)
+        details_result = name_cache.fetch_recipient_details(
+            deriv_agent, net_amount, transaction.deriv_account_number
         )
         
         # Handle error response (WhatsApp URL)
@@ -241,11 +388,21 @@ def process_admin_deposit_transaction(transaction):
             local_name = transaction.ecocash_name
             
             # Normalize names for comparison
-            deriv_tokens = normalize_name_admin(deriv_name)
-            local_tokens = normalize_name_admin(local_name)
+            deriv_tokens = names.normalize(deriv_name)
+            local_tokens = names.normalize(local_name)
+            
+            if not names.shares_token(deriv_tokens, local_tokens) and details_result.get('cached'):
+                # Cached name may be out of date - confirm with Deriv before treating it as a mismatch
+                fresh_result = name_cache.fetch_recipient_details(
+                    deriv_agent, net_amount, transaction.deriv_account_number, fresh=True
+                )
+                if isinstance(fresh_result, dict) and 'client_to_full_name' in fresh_result:
+                    details_result = fresh_result
+                    deriv_name = fresh_result['client_to_full_name']
+                    deriv_tokens = names.normalize(deriv_name)
             
-            # Step 2: Check if names match
-            if deriv_tokens & local_tokens or names_match_admin(deriv_name, local_name):
+            # Step 2: Check if names match - crediting needs a shared name, not just a similar one
+            if names.shares_token(deriv_tokens, local_tokens):
                 # ✅ Names match, process transfer
                 return process_admin_transfer(
                     deriv_agent, net_amount, transaction, 
@@ -311,9 +468,13 @@ def calculate_net_amount_and_charge_admin(total_amount):
 
 def process_admin_transfer(deriv_agent, net_amount, transaction, details_result, deriv_name):
     """Process the actual transfer for admin"""
+    from deriv.service import deriv_service
+    
     try:
-        transfer_result = asyncio.run(
-            deriv_agent.create_payment_agent_transfer(net_amount, transaction.deriv_account_number)
+        # No timeout here: the executor bounds the wait and raises TransferUncertain instead
+        transfer_result = deriv_service.run(
+            deriv_agent.create_payment_agent_transfer(net_amount, transaction.deriv_account_number),
+            timeout=None,
         )
         
         if isinstance(transfer_result, dict) and 'transaction_id' in transfer_result:
@@ -338,8 +499,10 @@ def process_admin_transfer(deriv_agent, net_amount, transaction, details_result,
             }
             
     except Exception as e:
+        # The request may have reached Deriv (TransferUncertain) - the outcome is unknown
         return {
             'success': False,
+            'uncertain': True,
             'error': f"Transfer error: {str(e)}"
         }
 
@@ -349,11 +512,11 @@ def handle_admin_name_mismatch(deriv_agent, net_amount, transaction, details_res
     from whatsapp.models import ClientVerification
     
     # Check for client verification
-    client_verification = ClientVerification.objects.filter(ecocash_number=transaction.ecocash_number,verified=True).first()
+    client_verification = ClientVerification.objects.filter(phone_e164=to_e164(transaction.ecocash_number),verified=True).first()
     
     if client_verification:
         verified_name = client_verification.name
-        if names_match_admin(verified_name, local_name):
+        if names.shares_token(verified_name, local_name):
             # ✅ Verified name matches, process transfer
             return process_admin_transfer(
                 deriv_agent, net_amount, transaction,
@@ -367,26 +530,6 @@ def handle_admin_name_mismatch(deriv_agent, net_amount, transaction, details_res
     }
 
 
-def normalize_name_admin(name: str) -> set:
-    """Normalize name for admin comparison"""
-    if not name:
-        return set()
-
-    # Remove titles
-    name = re.sub(r"^(mr|mrs|ms|miss|dr)\.?\s+", "", name, flags=re.IGNORECASE)
-
-    # Split into parts
-    tokens = re.split(r"\s+", name.strip())
-    return set(token.lower().strip(".") for token in tokens if token)
-
-
-def names_match_admin(name1: str, name2: str) -> bool:
-    """Check if names match for admin"""
-    n1, n2 = normalize_name_admin(name1), normalize_name_admin(name2)
-    ratio = SequenceMatcher(None, n1, n2).ratio()
-    return ratio >= 0.75
-
-
 def parse_deriv_error(transfer_result):
     """Parse Deriv API error messages"""
     if isinstance(transfer_result, str):
@@ -441,14 +584,32 @@ def admin_charges_management(request):
         form = TransactionChargeForm(request.POST)
         if form.is_valid():
             form.save()
+            invalidate_charge_schedules()
             messages.success(request, 'Charge added successfully')
             return redirect('finance:admin_charges_management')
     else:
         form = TransactionChargeForm()
     
+    # Current active bands, as the starting point for the what-if panel
+    what_if_bands = [
+        {
+            'transaction_type': charge.transaction_type,
+            'min_amount': str(charge.min_amount),
+            'max_amount': str(charge.max_amount),
+            'is_percentage': charge.is_percentage,
+            'fixed_charge': str(charge.fixed_charge),
+            'percentage_rate': str(charge.percentage_rate),
+            'additional_fee': str(charge.additional_fee),
+        }
+        for charge in charges if charge.is_active
+    ]
+    
     context = {
         'charges': charges,
         'form': form,
+        'what_if_bands': what_if_bands,
+        'what_if_from': (timezone.now() - timedelta(days=30)).date().isoformat(),
+        'what_if_to': timezone.now().date().isoformat(),
     }
     return render(request, 'finance/admin/charges_management.html', context)
 
@@ -461,6 +622,7 @@ def admin_edit_charge(request, pk):
         form = TransactionChargeForm(request.POST, instance=charge)
         if form.is_valid():
             form.save()
+            invalidate_charge_schedules()
             messages.success(request, 'Charge updated successfully')
             return redirect('finance:admin_charges_management')
     else:
@@ -478,6 +640,7 @@ def admin_toggle_charge(request, pk):
     charge = get_object_or_404(TransactionCharge, pk=pk)
     charge.is_active = not charge.is_active
     charge.save()
+    invalidate_charge_schedules()
     
     status = "activated" if charge.is_active else "deactivated"
     messages.success(request, f'Charge {status} successfully')
@@ -545,6 +708,60 @@ def api_calculate_charge(request):
         return JsonResponse({'error': str(e)}, status=400)
 
 
+@admin_required
+@require_POST
+def api_charges_what_if(request):
+    """Charge revenue under a proposed charge table vs the current one, over past transactions"""
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    
+    transaction_type = payload.get('transaction_type') or 'deposit'
+    if transaction_type not in ('deposit', 'weltrade_deposit'):
+        return JsonResponse({'error': 'Only deposit and weltrade_deposit have charges'}, status=400)
+    
+    try:
+        date_to = datetime.strptime(payload['date_to'], '%Y-%m-%d').date() if payload.get('date_to') else timezone.now().date()
+        date_from = datetime.strptime(payload['date_from'], '%Y-%m-%d').date() if payload.get('date_from') else date_to - timedelta(days=30)
+        proposed = schedule_from_dicts(transaction_type, payload.get('bands') or [])
+    except (KeyError, TypeError, ValueError, InvalidOperation) as e:
+        return JsonResponse({'error': f'Invalid input: {e}'}, status=400)
+    
+    rows = list(EcoCashTransaction.objects.filter(
+        transaction_type=transaction_type,
+        status=payload.get('status') or 'completed',
+        created_at__date__gte=date_from,
+        created_at__date__lte=date_to,
+    ).values_list('amount', 'charge'))
+    amounts = to_cents(row[0] for row in rows)
+    recorded = to_cents(row[1] for row in rows)
+    
+    # Both tables over the same net amounts, one vectorised pass each
+    current = ChargeEngine(charge_schedule(transaction_type)).summary(amounts)
+    simulated = ChargeEngine(proposed).summary(amounts)
+    difference = simulated['charges'] - current['charges']
+    
+    def serialise(summary):
+        return {
+            'revenue': str(summary['revenue']),
+            'bands': [dict(band, revenue=str(band['revenue'])) for band in summary['bands']],
+        }
+    
+    return JsonResponse({
+        'transaction_type': transaction_type,
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'transactions': len(rows),
+        'recorded_revenue': str(from_cents(recorded.sum())),
+        'current': serialise(current),
+        'proposed': serialise(simulated),
+        'difference': str(from_cents(difference.sum())),
+        'paying_more': int((difference > 0).sum()),
+        'paying_less': int((difference < 0).sum()),
+    })
+
+
 @admin_required
 def api_verify_ecocash(request):
     """API endpoint to verify EcoCash number"""
@@ -559,19 +776,11 @@ def api_verify_ecocash(request):
         from ecocash.models import CashOutTransaction
         
         # Normalize phone number
-        normalized = number.lstrip('0')
-        if normalized.startswith('263'):
-            normalized = normalized[3:]
+        phone_e164 = to_e164(number)
         
         # Check ClientVerification
         verification = ClientVerification.objects.filter(
-            ecocash_number__in=[
-                number,
-                normalized,
-                '0' + normalized,
-                '263' + normalized,
-                '+263' + normalized
-            ],
+            phone_e164=phone_e164,
             verified=True
         ).first()
         
@@ -584,14 +793,8 @@ def api_verify_ecocash(request):
         
         # Check recent CashOutTransactions
         cashout = CashOutTransaction.objects.filter(
-            phone__in=[
-                number,
-                normalized,
-                '0' + normalized,
-                '263' + normalized,
-                '+263' + normalized
-            ]
-        ).order_by('-created_at').first()
+            phone_e164=phone_e164
+        ).order_by('-timestamp').first()
         
         if cashout:
             return JsonResponse({
@@ -641,6 +844,29 @@ def client_verification_list(request):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
+    # Compare each client's name with the payer name on their latest cashout (one query, one batch score)
+    page_clients = list(page_obj.object_list)
+    latest_cashouts = {
+        row['phone_e164']: row
+        for row in CashOutTransaction.objects.filter(
+            phone_e164__in={client.phone_e164 for client in page_clients if client.phone_e164}
+        ).order_by('phone_e164', '-timestamp').distinct('phone_e164').values('phone_e164', 'name', 'name_tokens')
+    }
+    compared = [client for client in page_clients if client.phone_e164 in latest_cashouts]
+    scores = names.score_pairs(
+        (
+            names.from_key(client.name_tokens) or names.normalize(client.name),
+            names.from_key(latest_cashouts[client.phone_e164]['name_tokens'])
+            or names.normalize(latest_cashouts[client.phone_e164]['name']),
+        )
+        for client in compared
+    )
+    for client, score in zip(compared, scores):
+        cashout = latest_cashouts[client.phone_e164]
+        client.cashout_name = cashout['name']
+        client.name_score = round(score * 100)
+        client.name_match = names.names_match(client.name, cashout['name'])
+    
     # Get all admins for filter
     admins = User.objects.filter(is_staff=True, user_type='admin')
     
@@ -664,7 +890,7 @@ def client_verification_detail(request, pk):
     
     # Get related transactions
     related_transactions = EcoCashTransaction.objects.filter(
-        ecocash_number=client.ecocash_number
+        phone_e164=client.phone_e164
     ).order_by('-created_at')[:10]
     
     context = {
@@ -683,19 +909,9 @@ def client_verification_create(request):
             name = request.POST.get('name')
             ecocash_number = request.POST.get('ecocash_number')
             
-            # Normalize phone number
-            normalized_phone = ecocash_number.lstrip('0')
-            if not normalized_phone.startswith('263'):
-                normalized_phone = '263' + normalized_phone
-            
             # Check if client already exists
             existing_client = ClientVerification.objects.filter(
-                ecocash_number__in=[
-                    ecocash_number,
-                    normalized_phone,
-                    '0' + normalized_phone[3:],
-                    '263' + normalized_phone[3:] if len(normalized_phone) > 9 else normalized_phone
-                ]
+                phone_e164=to_e164(ecocash_number)
             ).first()
             
             if existing_client:
@@ -705,7 +921,7 @@ def client_verification_create(request):
             # Create new client
             client = ClientVerification.objects.create(
                 name=name,
-                ecocash_number=normalized_phone
+                ecocash_number=ecocash_number
             )
             
             # Handle file uploads if provided
@@ -786,14 +1002,9 @@ def client_verification_update(request, pk):
             name = request.POST.get('name')
             ecocash_number = request.POST.get('ecocash_number')
             
-            # Normalize phone number
-            normalized_phone = ecocash_number.lstrip('0')
-            if not normalized_phone.startswith('263'):
-                normalized_phone = '263' + normalized_phone
-            
             # Check if phone number is already taken by another client
             existing_client = ClientVerification.objects.filter(
-                ecocash_number=normalized_phone
+                phone_e164=to_e164(ecocash_number)
             ).exclude(pk=client.pk).first()
             
             if existing_client:
@@ -802,7 +1013,7 @@ def client_verification_update(request, pk):
             
             # Update client
             client.name = name
-            client.ecocash_number = normalized_phone
+            client.ecocash_number = ecocash_number
             
             # Handle file uploads
             if 'national_id_image' in request.FILES:
@@ -832,7 +1043,7 @@ def client_verification_delete(request, pk):
             
             # Check if client has related transactions
             related_transactions = EcoCashTransaction.objects.filter(
-                ecocash_number=client.ecocash_number
+                phone_e164=client.phone_e164
             ).count()
             
             if related_transactions > 0:
@@ -882,7 +1093,7 @@ def client_verification_bulk_action(request):
             deletable_clients = []
             for client in clients:
                 transaction_count = EcoCashTransaction.objects.filter(
-                    ecocash_number=client.ecocash_number
+                    phone_e164=client.phone_e164
                 ).count()
                 if transaction_count == 0:
                     deletable_clients.append(client.id)
@@ -999,14 +1210,9 @@ def verify_ecocash_api(request):
         return JsonResponse({'error': 'EcoCash number required'}, status=400)
     
     try:
-        # Normalize phone number
-        normalized = ecocash_number.lstrip('0')
-        if not normalized.startswith('263'):
-            normalized = '263' + normalized
-        
         # Check ClientVerification
         client = ClientVerification.objects.filter(
-            ecocash_number=normalized
+            phone_e164=to_e164(ecocash_number)
         ).first()
         
         if client:
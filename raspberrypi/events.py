@@ -0,0 +1,200 @@
+# raspberrypi/events.py
+"""
+Live feed bus for incoming EcoCash SMS and parsed cashouts.
+
+One producer thread per process watches IncomingMessage and
+CashOutTransaction by primary key and fans new rows out to every
+connected Server-Sent Events client. However many dashboards are open,
+the database only sees a single cheap "id > last_seen" query per table
+per tick instead of one paginated query per watcher.
+
+Rows written by this process (post_save) wake the producer straight
+away; rows written by other workers are picked up on the next poll.
+
+Ids are handed out when a row is inserted but become visible when its
+transaction commits, so a row can appear behind the cursor. Each poll
+re-reads the LOOKBACK ids behind it and skips the ones already streamed;
+a row that commits more than LOOKBACK ids late is still missed.
+"""
+import asyncio
+import logging
+import threading
+
+from django.db import close_old_connections, connection
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 2.0        # seconds between DB checks when nothing woke us
+BATCH_SIZE = 100           # max rows per table per tick
+LOOKBACK = 50              # ids re-read behind the cursor, for rows that commit out of order
+SUBSCRIBER_QUEUE_SIZE = 200
+
+
+def serialize_message(message):
+    return {
+        'id': message.id,
+        'sender_id': message.sender_id,
+        'message_body': message.message_body,
+        'received_at': message.received_at.isoformat() if message.received_at else None,
+    }
+
+
+def serialize_cashout(txn):
+    return {
+        'id': txn.id,
+        'amount': str(txn.amount),
+        'name': txn.name,
+        'phone': txn.phone,
+        'txn_id': txn.txn_id,
+        'completed': txn.completed,
+        'flagged': txn.flagged,
+        'flag_reason': txn.flag_reason,
+        'timestamp': txn.timestamp.isoformat() if txn.timestamp else None,
+    }
+
+
+class _Subscriber:
+    """An asyncio.Queue bound to the event loop of the request that owns it."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def _put(self, event):
+        # Slow client: drop the oldest event rather than grow without bound
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(event)
+
+    def push(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # Loop already closed - the stream is gone
+            pass
+
+
+class LiveFeedBus:
+    def __init__(self, poll_interval=POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._last_message_id = None
+        self._last_cashout_id = None
+        self._seen_messages = set()     # ids streamed within LOOKBACK of the cursor
+        self._seen_cashouts = set()
+
+    # -----------------------------
+    # Subscriber management
+    # -----------------------------
+    def subscribe(self):
+        subscriber = _Subscriber(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='live-feed-producer', daemon=True
+                )
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+        self._wake.set()
+
+    def notify(self):
+        """Wake the producer early (called from post_save)."""
+        self._wake.set()
+
+    # -----------------------------
+    # Producer
+    # -----------------------------
+    def _run(self):
+        try:
+            self._seed_cursors()
+            while True:
+                with self._lock:
+                    if not self._subscribers:
+                        self._thread = None
+                        # The next producer starts from what is new then, not from here
+                        self._last_message_id = None
+                        self._last_cashout_id = None
+                        return
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                try:
+                    self._poll()
+                except Exception as e:
+                    logger.error(f"Live feed poll failed: {e}")
+                    close_old_connections()
+        finally:
+            connection.close()
+
+    def _seed_cursors(self):
+        from ecocash.models import CashOutTransaction
+        from .models import IncomingMessage
+
+        # Only stream what arrives after the first watcher connected
+        if self._last_message_id is None:
+            self._last_message_id, self._seen_messages = self._seed(IncomingMessage)
+        if self._last_cashout_id is None:
+            self._last_cashout_id, self._seen_cashouts = self._seed(CashOutTransaction)
+
+    @staticmethod
+    def _seed(model):
+        # Rows already in the lookback window are old news too
+        recent = list(model.objects.order_by('-id').values_list('id', flat=True)[:LOOKBACK])
+        return (recent[0] if recent else 0), set(recent)
+
+    @staticmethod
+    def _new_rows(model, last_id, seen):
+        """Rows past ``last_id`` or late in the window behind it -> (rows, last_id, seen, more)."""
+        limit = BATCH_SIZE + LOOKBACK
+        fetched = list(model.objects.filter(id__gt=max(0, last_id - LOOKBACK)).order_by('id')[:limit])
+        rows = [row for row in fetched if row.id not in seen]
+        if fetched:
+            last_id = max(last_id, fetched[-1].id)
+        floor = last_id - LOOKBACK
+        seen = {pk for pk in seen if pk > floor} | {row.id for row in rows if row.id > floor}
+        return rows, last_id, seen, len(fetched) == limit
+
+    def _poll(self):
+        from ecocash.models import CashOutTransaction
+        from .models import IncomingMessage
+
+        events = []
+
+        new_messages, self._last_message_id, self._seen_messages, more_messages = self._new_rows(
+            IncomingMessage, self._last_message_id, self._seen_messages
+        )
+        for message in new_messages:
+            events.append(('message', message.id, serialize_message(message)))
+
+        new_cashouts, self._last_cashout_id, self._seen_cashouts, more_cashouts = self._new_rows(
+            CashOutTransaction, self._last_cashout_id, self._seen_cashouts
+        )
+        for txn in new_cashouts:
+            events.append(('cashout', txn.id, serialize_cashout(txn)))
+
+        # A full batch means there is more waiting - go again without sleeping
+        if more_messages or more_cashouts:
+            self._wake.set()
+
+        if events:
+            self._publish(events)
+
+    def _publish(self, events):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            for event in events:
+                subscriber.push(event)
+
+
+live_feed = LiveFeedBus()
@@ -19,6 +19,9 @@ urlpatterns = [
     path('api/send-message/', views.api_send_message, name='api_send_message'),
     path('api/messages/<int:message_id>/delete/', views.api_delete_message, name='api_delete_message'),
     path('api/messages/bulk-action/', views.api_bulk_action, name='api_bulk_action'),
+
+    # Live push feed (SSE, served from supreme.asgi)
+    path('api/live-feed/', views.live_feed_stream, name='live_feed'),
     
     # API endpoints for transactions
     path('api/create-transaction/', views.api_create_transaction, name='api_create_transaction'),
@@ -2,8 +2,9 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+import asyncio
 import json
 from datetime import datetime, timedelta
 import uuid
@@ -15,6 +16,7 @@ from django.db import models
 from django.conf import settings
 from .models import IncomingMessage, IncomingCall, OutgoingMessage, EcocashTransfers, TransactionOTP
 from .forms import MoneyTransferForm
+from .events import live_feed
 from whatsapp.services import WhatsAppService
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
@@ -28,6 +30,8 @@ ECO_USERNAME = settings.ECO_USERNAME
 ECO_PASSWORD = settings.ECO_PASSWORD
 ECO_API_URL = settings.ECO_API_URL
 
+LIVE_FEED_HEARTBEAT = 15  # seconds
+
 @login_required
 def message_dashboard(request):
     """econet Dashboard"""
@@ -634,3 +638,38 @@ def api_bulk_action(request):
     
     return JsonResponse({'success': False, 'error': 'Method not allowed'})
 
+
+
+@login_required
+async def live_feed_stream(request):
+    """
+    Server-Sent Events stream of new SMS and parsed cashouts.
+    Served from supreme.asgi so each open dashboard is one idle coroutine,
+    all fed by the single producer in raspberrypi.events.
+    """
+    user = await request.auser()
+    if not user.is_staff:
+        return HttpResponseForbidden('Staff only')
+
+    async def event_stream():
+        subscriber = live_feed.subscribe()
+        try:
+            # Tell EventSource to reconnect quickly if the stream drops
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    event_type, event_id, payload = await asyncio.wait_for(
+                        subscriber.queue.get(), timeout=LIVE_FEED_HEARTBEAT
+                    )
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f"event: {event_type}\nid: {event_type}-{event_id}\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            live_feed.unsubscribe(subscriber)
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
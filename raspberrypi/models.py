@@ -2,6 +2,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from finance.references import next_reference
 
 User = get_user_model()
 
@@ -67,8 +68,7 @@ class EcocashTransfers(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.reference_number:
-            import uuid
-            self.reference_number = f"ECO{str(uuid.uuid4())[:8].upper()}"
+            self.reference_number = next_reference('transfer')
         super().save(*args, **kwargs)
     
     def mark_as_successful(self):
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from ecocash.models import CashOutTransaction
+from .events import live_feed
+from .models import IncomingMessage
+
+
+@receiver(post_save, sender=IncomingMessage)
+def incoming_message_saved(sender, instance, created, **kwargs):
+    if created:
+        live_feed.notify()
+
+
+@receiver(post_save, sender=CashOutTransaction)
+def cashout_saved(sender, instance, created, **kwargs):
+    if created:
+        live_feed.notify()
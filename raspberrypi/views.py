@@ -12,6 +12,7 @@ from .serializers import (
 import re
 from decimal import Decimal
 from ecocash.models import CashOutTransaction, CashInTransaction
+from accounts.phone import to_local
 from django.shortcuts import render
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
@@ -27,16 +28,7 @@ def normalize_phone(number):
     Normalize Ecocash numbers to format: 786xxxxxxx
     Supports: +263786..., 263786..., 0786...
     """
-    if not number:
-        return None
-    number = number.strip()
-    if number.startswith("+"):
-        number = number[1:]
-    if number.startswith("263"):
-        number = number[3:]
-    if number.startswith("0"):
-        number = number[1:]
-    return number
+    return to_local(number) or None
 
 
 @api_view(['POST'])
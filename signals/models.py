@@ -2,8 +2,7 @@ from django.db import models
 from django.utils import timezone
 from accounts.models import User
 from subscriptions.models import SubscriptionPlans, Subscribers
-import random
-import string
+from finance.references import next_reference
 
 class Signal(models.Model):
     SIGNAL_TYPES = (
@@ -99,6 +98,11 @@ Note: {{risk_note}}
     
     def __str__(self):
         return f"{self.signal_id} - {self.asset_name} - {self.get_signal_type_display()}"
+
+    def save(self, *args, **kwargs):
+        if not self.signal_id:
+            self.signal_id = next_reference('signal')
+        super().save(*args, **kwargs)
     
     def get_formatted_message(self):
         """Format the WhatsApp template with actual values"""
@@ -249,7 +253,7 @@ class BulkSignalJob(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.job_id:
-            self.job_id = f"JOB{''.join(random.choices(string.digits, k=8))}"
+            self.job_id = next_reference('signal_job')
         super().save(*args, **kwargs)
     
     @property
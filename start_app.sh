@@ -1,2 +1,2 @@
-venv/bin/gunicorn --access-logfile - --workers 1 --bind 0.0.0.0:8025 supreme.wsgi:application
+venv/bin/gunicorn --access-logfile - --workers 1 -k uvicorn_worker.UvicornWorker --bind 0.0.0.0:8025 supreme.asgi:application
 
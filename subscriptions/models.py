@@ -1,5 +1,6 @@
 from django.db import models
 from accounts.models import User
+from accounts.phone import to_e164
 
 class SubscriptionPlans(models.Model):
     plan_name = models.CharField(max_length=100)
@@ -13,10 +14,17 @@ class Subscribers(models.Model):
     trader = models.ForeignKey(User, on_delete=models.CASCADE)
     plan = models.ForeignKey(SubscriptionPlans, on_delete=models.CASCADE)
     ecocash_number = models.CharField(max_length=15, blank=True, null=True)
+    phone_e164 = models.CharField(max_length=21, blank=True, default='', db_index=True, editable=False)
     pop_image = models.ImageField(upload_to='pop/', blank=True, null=True)
     subscribed_on = models.DateTimeField(auto_now_add=True)
     active = models.BooleanField(default=True)
     expiry_date = models.DateTimeField(blank=True, null=True)
 
+    def save(self, *args, **kwargs):
+        self.phone_e164 = to_e164(self.ecocash_number)
+        if kwargs.get('update_fields') is not None and 'ecocash_number' in kwargs['update_fields']:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'phone_e164'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return str(self.trader.username) + " - " + str(self.plan.plan_name)
\ No newline at end of file
@@ -5,6 +5,12 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+The econet live feed (econet:live_feed) and the bulk deposit re-push are
+async Server-Sent Events views and have to be served from here - a sync
+WSGI worker would be tied up by every open stream. start_app.sh runs:
+
+    gunicorn -k uvicorn_worker.UvicornWorker supreme.asgi:application
 """
 
 import os
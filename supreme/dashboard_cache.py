@@ -0,0 +1,102 @@
+# supreme/dashboard_cache.py
+"""
+Shared cache for the admin dashboard's computed context.
+
+Every staff member refreshing the dashboard used to recompute the same
+figures. Contexts are now cached per (day, time_filter, date_from,
+date_to):
+
+    context = dashboard_cache.get(key, lambda: dashboard_context(...))
+
+- Younger than FRESH_TTL and not invalidated: served as is.
+- Older, or invalidated since: still served, while one background
+  thread per key recomputes it (stale-while-revalidate), so a refresh
+  never waits on the aggregation.
+- Older than STALE_TTL, or never computed: computed inline.
+
+A completed transaction or a new user invalidates every entry once the
+write commits. The cache is per process, like the charge schedules -
+other workers catch up within FRESH_TTL.
+"""
+import threading
+import time
+
+from django.db import connections, transaction as db_transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from accounts.models import User
+from finance.models import EcoCashTransaction
+
+FRESH_TTL = 30                  # seconds an entry is served without a refresh
+STALE_TTL = 600                 # seconds a stale entry may still be served while refreshing
+MAX_ENTRIES = 64                # distinct filter combinations kept
+
+_entries = {}                   # key -> (context, monotonic time computed, generation)
+_refreshing = set()
+_lock = threading.Lock()
+_generation = 0
+
+
+def _compute(key, compute):
+    generation = _generation
+    context = compute()
+    with _lock:
+        # Started before an invalidation - keep it, but as already stale
+        _entries[key] = (context, time.monotonic(), generation)
+        if len(_entries) > MAX_ENTRIES:
+            oldest = min(_entries, key=lambda k: _entries[k][1])
+            del _entries[oldest]
+    return context
+
+
+def _refresh(key, compute):
+    try:
+        _compute(key, compute)
+    except Exception as e:
+        print(f"Dashboard refresh failed for {key}: {e}")
+    finally:
+        with _lock:
+            _refreshing.discard(key)
+        # This thread's connections die with it
+        connections.close_all()
+
+
+def get(key, compute):
+    """Cached context for ``key``, computing it with ``compute()`` when needed."""
+    entry = _entries.get(key)
+    now = time.monotonic()
+    if entry is None or now - entry[1] > STALE_TTL:
+        return _compute(key, compute)
+
+    context, computed_at, generation = entry
+    if now - computed_at > FRESH_TTL or generation != _generation:
+        with _lock:
+            start = key not in _refreshing
+            _refreshing.add(key)
+        if start:
+            threading.Thread(
+                target=_refresh, args=(key, compute), name='dashboard-refresh', daemon=True,
+            ).start()
+    return context
+
+
+def invalidate():
+    """Mark every entry stale - the next request for each gets it refreshed."""
+    global _generation
+    with _lock:
+        _generation += 1
+
+
+@receiver(post_save, sender=EcoCashTransaction)
+def transaction_saved(sender, instance, **kwargs):
+    # post_save runs before save() refreshes the loaded row, so it still has the old status
+    previous = getattr(instance, '_loaded_row', None)
+    if instance.status == 'completed' and (previous is None or previous[2] != 'completed'):
+        db_transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        db_transaction.on_commit(invalidate)
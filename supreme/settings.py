@@ -175,6 +175,22 @@ SMS_API_USER=config('SMS_API_USER')
 SMS_API_PASSWORD=config('SMS_API_PASSWORD')
 DERIV_API_TOKEN=config('DERIV_API_TOKEN')
 DERIV_APP_ID=config('DERIV_APP_ID')
+# The payment agent account that sends transfers. DerivPaymentAgent, the pooled
+# connections and the float monitor all use it, so the float gate watches the payer
+DERIV_AGENT_APP_ID=config('DERIV_AGENT_APP_ID', default=115043, cast=int)
+DERIV_AGENT_API_TOKEN=config('DERIV_AGENT_API_TOKEN', default='ktNM7pwMjvGKtf2')
+# Override the Deriv websocket host, e.g. ws://127.0.0.1:8765 for the local simulator
+DERIV_ENDPOINT=config('DERIV_ENDPOINT', default='')
+# Deriv account holder names are reused for this many seconds instead of a fresh dry run
+DERIV_NAME_CACHE_TTL=config('DERIV_NAME_CACHE_TTL', default=7 * 24 * 3600, cast=int)
+# Transfers of this amount (USD) or more always confirm the name with Deriv
+DERIV_NAME_CACHE_MAX_AMOUNT=config('DERIV_NAME_CACHE_MAX_AMOUNT', default=500, cast=float)
+# Deposits are queued while the payment-agent float is below this (USD)
+DERIV_MIN_FLOAT=config('DERIV_MIN_FLOAT', default=100, cast=float)
+# Deposits sent to Deriv at once by the admin bulk re-push
+DERIV_BULK_CONCURRENCY=config('DERIV_BULK_CONCURRENCY', default=4, cast=int)
+# Override the Binance API host, e.g. http://127.0.0.1:8766 for the local simulator
+BINANCE_BASE_URL=config('BINANCE_BASE_URL', default='https://api.binance.com')
 WHATSAPP_TOKEN=config('WHATSAPP_TOKEN')
 WHATSAPP_URL = config('WHATSAPP_URL')
 WHATSAPP_NUMBER=config('WHATSAPP_NUMBER')
@@ -1,4 +1,12 @@
 from django.contrib import admin
-from .models import BinanceSettings
+from .models import BinanceSettings, WeltradePayout
 
-admin.site.register(BinanceSettings)
\ No newline at end of file
+admin.site.register(BinanceSettings)
+
+
+@admin.register(WeltradePayout)
+class WeltradePayoutAdmin(admin.ModelAdmin):
+    list_display = ('withdraw_order_id', 'amount', 'status', 'binance_status', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    search_fields = ('withdraw_order_id', 'binance_id', 'tx_id', 'address')
+    readonly_fields = ('transaction', 'cashout', 'account')
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import time
+import uuid
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from weltrade.services.binance_client import AsyncBinanceClient, BinanceClient, _sign_params
+from weltrade.services.credentials import BinanceCredential
+from weltrade.simulator import BinanceSimulator
+
+MODES = ('per-request', 'session', 'async')
+
+# Tron address format, never a real wallet - the simulator accepts anything
+TEST_ADDRESS = 'TLoadTestAddressXXXXXXXXXXXXXXXXXX'
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark Weltrade USDT withdrawals against the local Binance simulator'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--withdrawals',
+            type=int,
+            default=50,
+            help='Withdrawals per mode',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=8,
+            help='Withdrawals in flight at once in async mode',
+        )
+        parser.add_argument(
+            '--keys',
+            type=int,
+            default=2,
+            help='Test API keys to spread the withdrawals over',
+        )
+        parser.add_argument(
+            '--mode',
+            choices=MODES,
+            action='append',
+            help='Mode to run (repeatable); all modes by default',
+        )
+        parser.add_argument('--latency', type=float, default=300, help='Simulator latency (ms)')
+        parser.add_argument('--jitter', type=float, default=100, help='Simulator jitter (ms)')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Simulator withdrawal error rate (0-1)')
+        parser.add_argument('--port', type=int, default=0, help='Simulator port (0 picks a free one)')
+        parser.add_argument(
+            '--endpoint',
+            type=str,
+            help='Use an already running simulator at this http:// URL instead of starting one',
+        )
+
+    def handle(self, *args, **options):
+        simulator = None
+        endpoint = options['endpoint']
+        if not endpoint:
+            simulator = BinanceSimulator(
+                port=options['port'],
+                latency=options['latency'] / 1000,
+                jitter=options['jitter'] / 1000,
+                error_rate=options['error_rate'],
+            )
+            simulator.start_in_thread()
+            endpoint = simulator.endpoint
+        elif not endpoint.startswith('http://'):
+            # Real Binance is https - refuse to fire test withdrawals at it
+            raise CommandError("--endpoint must be a local http:// simulator, never the real Binance API")
+
+        # Throwaway keys, never BinanceSettings rows
+        self.credentials = [
+            BinanceCredential(-(i + 1), f"loadtest-key-{i}", f"loadtest-secret-{i}")
+            for i in range(max(1, options['keys']))
+        ]
+        self.endpoint = endpoint
+        count = options['withdrawals']
+
+        self.stdout.write(f"{count} withdrawals per mode over {len(self.credentials)} keys, Binance at {endpoint}")
+        try:
+            for mode in options['mode'] or MODES:
+                before = dict(simulator.stats) if simulator else {}
+                started = time.perf_counter()
+                if mode == 'async':
+                    results = asyncio.run(self._run_async(count, options['concurrency']))
+                else:
+                    results = self._run_sync(mode, count)
+                elapsed = time.perf_counter() - started
+                self._report(mode, results, elapsed, before, simulator)
+        finally:
+            if simulator:
+                simulator.stop()
+
+    def _withdrawal(self, i):
+        return {
+            'address': TEST_ADDRESS,
+            'amount': str(10 + i % 90),
+            'withdraw_order_id': f"loadtest-{uuid.uuid4().hex}",
+            'credential': self.credentials[i % len(self.credentials)],
+        }
+
+    def _per_request(self, credential, address, amount, withdraw_order_id):
+        # How payouts went out before BinanceClient: a fresh connection per call
+        params = {
+            'coin': 'USDT', 'network': 'TRX', 'address': address, 'amount': amount,
+            'withdrawOrderId': withdraw_order_id, 'timestamp': int(time.time() * 1000),
+        }
+        url = f"{self.endpoint}/sapi/v1/capital/withdraw/apply?{_sign_params(params, credential.api_secret)}"
+        response = requests.post(url, headers={'X-MBX-APIKEY': credential.api_key}, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    def _timed(self, func, **kwargs):
+        started = time.perf_counter()
+        try:
+            func(**kwargs)
+            return {'ok': True, 'latency': time.perf_counter() - started, 'error': None}
+        except Exception as e:
+            return {'ok': False, 'latency': time.perf_counter() - started, 'error': str(e)}
+
+    def _run_sync(self, mode, count):
+        client = BinanceClient(base_url=self.endpoint)
+        try:
+            func = self._per_request if mode == 'per-request' else client.withdraw_usdt_trc20
+            return [self._timed(func, **self._withdrawal(i)) for i in range(count)]
+        finally:
+            client.close()
+
+    async def _run_async(self, count, concurrency):
+        client = BinanceClient(base_url=self.endpoint, pool_size=concurrency)
+        async_client = AsyncBinanceClient(client, max_in_flight=concurrency)
+
+        async def one(i):
+            started = time.perf_counter()
+            try:
+                await async_client.withdraw_usdt_trc20(**self._withdrawal(i))
+                return {'ok': True, 'latency': time.perf_counter() - started, 'error': None}
+            except Exception as e:
+                return {'ok': False, 'latency': time.perf_counter() - started, 'error': str(e)}
+
+        try:
+            return await asyncio.gather(*(one(i) for i in range(count)))
+        finally:
+            client.close()
+
+    def _report(self, mode, results, elapsed, before, simulator):
+        succeeded = [result for result in results if result['ok']]
+        self.stdout.write("\n" + "=" * 60)
+        self.stdout.write(f"MODE {mode}")
+        self.stdout.write("=" * 60)
+        self.stdout.write(f"  withdrawals     {len(results)} in {elapsed:.2f}s")
+        self.stdout.write(f"  succeeded       {len(succeeded)}")
+        self.stdout.write(f"  withdrawals/sec {len(succeeded) / elapsed if elapsed else 0:.2f}")
+        if simulator:
+            delta = {key: value - before.get(key, 0) for key, value in simulator.stats.items()}
+            self.stdout.write(f"  simulator       {json.dumps(delta)}")
+
+        values = sorted(result['latency'] for result in succeeded)
+        if values:
+            self.stdout.write(
+                "  latency         "
+                + "  ".join(f"p{pct} {_percentile(values, pct) * 1000:.0f}ms" for pct in (50, 90, 95, 99))
+                + f"  max {values[-1] * 1000:.0f}ms"
+            )
+
+        errors = [result['error'] for result in results if result['error']]
+        for error in errors[:5]:
+            self.stdout.write(self.style.ERROR(f"  error: {error}"))
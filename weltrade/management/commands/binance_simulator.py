@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from weltrade.simulator import BinanceSimulator
+
+
+class Command(BaseCommand):
+    help = 'Run a local Binance withdraw API simulator (set BINANCE_BASE_URL to point the app at it)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', type=str, default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8766)
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=300,
+            help='Milliseconds added to every response',
+        )
+        parser.add_argument(
+            '--jitter',
+            type=float,
+            default=100,
+            help='Random +/- milliseconds on top of --latency',
+        )
+        parser.add_argument(
+            '--error-rate',
+            type=float,
+            default=0.0,
+            help='Fraction of withdrawals refused with an error (0-1)',
+        )
+        parser.add_argument(
+            '--fail-rate',
+            type=float,
+            default=0.0,
+            help='Fraction of accepted withdrawals that end in Failure (0-1)',
+        )
+        parser.add_argument(
+            '--settle-after',
+            type=float,
+            default=5,
+            help='Seconds a withdrawal stays Processing before it completes',
+        )
+
+    def handle(self, *args, **options):
+        simulator = BinanceSimulator(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'] / 1000,
+            jitter=options['jitter'] / 1000,
+            error_rate=options['error_rate'],
+            fail_rate=options['fail_rate'],
+            settle_after=options['settle_after'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Binance simulator on {simulator.endpoint}"))
+        self.stdout.write(f"Set BINANCE_BASE_URL={simulator.endpoint} to use it. Ctrl+C to stop.")
+        try:
+            simulator.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f"Stats: {simulator.stats}")
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from weltrade.models import WeltradePayout
+from weltrade.payouts import payout_worker
+
+
+class Command(BaseCommand):
+    help = 'Submit queued Weltrade USDT payouts and poll Binance until they settle'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Make a single pass (for cron) instead of running until stopped',
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            payout_worker.run_once()
+            counts = {
+                status: WeltradePayout.objects.filter(status=status).count()
+                for status in ('queued', 'submitting', 'submitted')
+            }
+            self.stdout.write(f"Pending payouts: {counts}")
+            return
+
+        self.stdout.write(self.style.SUCCESS("Weltrade payout worker running. Ctrl+C to stop."))
+        try:
+            payout_worker.run_forever()
+        except KeyboardInterrupt:
+            pass
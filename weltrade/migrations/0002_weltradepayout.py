@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecocash', '0004_cashouttransaction_name_tokens'),
+        ('finance', '0013_ecocashtransaction_awaiting_float'),
+        ('weltrade', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeltradePayout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(max_length=100)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('withdraw_order_id', models.CharField(max_length=64, unique=True)),
+                ('binance_id', models.CharField(blank=True, default='', max_length=64)),
+                ('binance_status', models.IntegerField(blank=True, null=True)),
+                ('tx_id', models.CharField(blank=True, default='', max_length=128)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('submitting', 'Submitting'), ('submitted', 'Submitted'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=12)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('submitted_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('account', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='weltrade.binancesettings')),
+                ('cashout', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='ecocash.cashouttransaction')),
+                ('transaction', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='weltrade_payout', to='finance.ecocashtransaction')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='weltrade_payout_status_idx')],
+            },
+        ),
+    ]
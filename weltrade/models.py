@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class BinanceSettings(models.Model):
     api_key = models.TextField()
@@ -7,4 +8,53 @@ class BinanceSettings(models.Model):
     last_used_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
-        return f"Binance Key {self.id}"
\ No newline at end of file
+        return f"Binance Key {self.id}"
+
+class WeltradePayout(models.Model):
+    """
+    A Weltrade deposit waiting to be paid out in USDT (TRC20) from Binance.
+
+    Rows are worked by weltrade.payouts: queued -> submitting -> submitted
+    -> completed / failed. withdraw_order_id is fixed when the row is
+    created, so a retried submission can be matched against Binance's
+    history instead of paying twice.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('submitting', 'Submitting'),
+        ('submitted', 'Submitted'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+
+    transaction = models.OneToOneField(
+        'finance.EcoCashTransaction', on_delete=models.CASCADE, related_name='weltrade_payout'
+    )
+    cashout = models.ForeignKey(
+        'ecocash.CashOutTransaction', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    address = models.CharField(max_length=100)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    withdraw_order_id = models.CharField(max_length=64, unique=True)
+    # Key the withdrawal was sent with - its history is where the withdrawal shows up
+    account = models.ForeignKey(BinanceSettings, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    binance_id = models.CharField(max_length=64, blank=True, default='')
+    binance_status = models.IntegerField(null=True, blank=True)
+    tx_id = models.CharField(max_length=128, blank=True, default='')
+
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    submitted_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='weltrade_payout_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.withdraw_order_id} - {self.amount} USDT - {self.status}"
@@ -0,0 +1,317 @@
+# weltrade/payouts.py
+"""
+Queued USDT payouts for Weltrade deposits.
+
+The WhatsApp thread used to call Binance's withdraw/apply inline and
+report the deposit completed as soon as Binance accepted it. Now it
+queues a WeltradePayout and returns:
+
+    enqueue_payout(transaction, cashout, address, amount)
+
+and the worker takes it from there:
+
+1. Queued rows are claimed with SELECT ... SKIP LOCKED (so the in-process
+   thread and the run_weltrade_payouts command never take the same row)
+   and sent together through AsyncBinanceClient, with the
+   withdrawOrderId fixed when the row was created.
+2. A retried row first looks its withdrawOrderId up in the history of the
+   key it was sent with; only if Binance never saw it is it sent again.
+3. Submitted rows are polled with one withdraw/history call per key per
+   HISTORY_BATCH ids until Binance reports a final status. Completed
+   deposits and failures are then recorded on the EcoCashTransaction and
+   the trader is told.
+
+The POP's cashout is marked used when the payout is queued and released
+again if the payout fails, as before.
+"""
+import asyncio
+import logging
+import os
+import threading
+import uuid
+from datetime import timedelta
+
+import requests
+from django.db import close_old_connections, transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ecocash.models import CashOutTransaction
+
+from .models import BinanceSettings, WeltradePayout
+from .services.binance_client import AsyncBinanceClient, BinanceAPIError, binance_client
+from .services.credentials import INSUFFICIENT_FUNDS_CODES, BinanceCredential, credential_pool
+
+logger = logging.getLogger(__name__)
+
+SUBMIT_BATCH = 8                # withdrawals sent at once
+HISTORY_BATCH = 45              # ids per withdraw/history call (Binance's idList limit)
+POLL_INTERVAL = 15              # seconds between passes while payouts are in flight
+IDLE_INTERVAL = 60              # seconds between passes when nothing is pending
+SUBMIT_LEASE = 120              # seconds before an unfinished submission is retried
+RETRY_DELAYS = (30, 120, 600)   # seconds before each resubmission
+MAX_ATTEMPTS = len(RETRY_DELAYS) + 1
+
+# Binance withdraw history statuses
+STATUS_COMPLETED = 6
+FAILED_STATUSES = {1: 'cancelled', 3: 'rejected', 5: 'failed'}
+
+
+class PayoutFailed(Exception):
+    def __init__(self, message, status_code=None, payload=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.payload = payload or {}
+
+
+def enqueue_payout(transaction, cashout, address, amount):
+    """Queue the USDT payout for a Weltrade deposit and wake the worker."""
+    with db_transaction.atomic():
+        payout = WeltradePayout.objects.create(
+            transaction=transaction,
+            cashout=cashout,
+            address=address,
+            amount=amount,
+            withdraw_order_id=f"weltrade-{uuid.uuid4().hex}",
+        )
+        if cashout is not None:
+            # The POP can't be redeemed again while its payout is in flight
+            CashOutTransaction.objects.filter(pk=cashout.pk).update(completed=True)
+    payout_worker.wake()
+    return payout
+
+
+def _retryable(exc):
+    if isinstance(exc, requests.RequestException):
+        # Timeout or dropped connection - Binance may or may not have it
+        return True
+    if isinstance(exc, BinanceAPIError):
+        code = exc.payload.get('code') if isinstance(exc.payload, dict) else None
+        return exc.status_code in (418, 429) or exc.status_code >= 500 or code in INSUFFICIENT_FUNDS_CODES
+    return True
+
+
+def _credential(account_id):
+    for credential in credential_pool.credentials():
+        if credential.id == account_id:
+            return credential
+    # Deactivated since - its history still has to be read
+    account = BinanceSettings.objects.filter(pk=account_id).first()
+    if account is None:
+        return None
+    return BinanceCredential(account.id, account.api_key, account.api_secret)
+
+
+class PayoutWorker:
+    def __init__(self):
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def wake(self):
+        self._ensure_started()
+        self._wake.set()
+
+    def _ensure_started(self):
+        # A forked worker inherits the attribute but not the thread - start again
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self.run_forever, name='weltrade-payouts', daemon=True)
+            self._thread.start()
+
+    def run_forever(self):
+        while True:
+            try:
+                pending = self.run_once()
+            except Exception as e:
+                logger.exception(f"Weltrade payout pass failed: {e}")
+                pending = True
+            finally:
+                close_old_connections()
+            self._wake.wait(POLL_INTERVAL if pending else IDLE_INTERVAL)
+            self._wake.clear()
+
+    def run_once(self):
+        """One pass: recover, submit, poll. Returns True while payouts are in flight."""
+        self._recover_stale()
+        self._submit(self._claim())
+        self._poll()
+        return WeltradePayout.objects.filter(status__in=('queued', 'submitting', 'submitted')).exists()
+
+    # -----------------------------
+    # Submission
+    # -----------------------------
+    def _recover_stale(self):
+        # Claimed by a process that died mid-submission; the retry checks history first
+        recovered = WeltradePayout.objects.filter(
+            status='submitting', next_attempt_at__lte=timezone.now(),
+        ).update(status='queued')
+        if recovered:
+            logger.warning(f"Requeued {recovered} Weltrade payouts left mid-submission")
+
+    def _claim(self):
+        now = timezone.now()
+        with db_transaction.atomic():
+            payouts = list(
+                WeltradePayout.objects.select_for_update(skip_locked=True)
+                .filter(status='queued', next_attempt_at__lte=now)
+                .order_by('next_attempt_at')[:SUBMIT_BATCH]
+            )
+            WeltradePayout.objects.filter(pk__in=[payout.pk for payout in payouts]).update(
+                status='submitting', attempts=F('attempts') + 1, next_attempt_at=now + timedelta(seconds=SUBMIT_LEASE),
+            )
+        for payout in payouts:
+            payout.attempts += 1
+        return payouts
+
+    def _already_sent(self, payout):
+        """History row for a retried payout, None if Binance never got it. Raises if unknown."""
+        credential = _credential(payout.account_id)
+        if credential is None:
+            raise PayoutFailed(f"Binance key {payout.account_id} is gone - check {payout.withdraw_order_id} by hand")
+        rows = binance_client.withdraw_history(credential, withdrawOrderId=payout.withdraw_order_id)
+        return rows[0] if rows else None
+
+    def _submit(self, payouts):
+        to_send = []
+        for payout in payouts:
+            if payout.account_id:
+                try:
+                    row = self._already_sent(payout)
+                except Exception as e:
+                    # Can't tell whether it went out - never resend blind
+                    self._retry_later(payout, e, resend=False)
+                    continue
+                if row is not None:
+                    self._mark_submitted(payout, row.get('id', ''), row.get('status'))
+                    continue
+            try:
+                credential = credential_pool.acquire()
+            except Exception as e:
+                self._retry_later(payout, e)
+                continue
+            WeltradePayout.objects.filter(pk=payout.pk).update(account_id=credential.id)
+            to_send.append((payout, credential))
+
+        if not to_send:
+            return
+
+        results = asyncio.run(AsyncBinanceClient(max_in_flight=SUBMIT_BATCH).withdraw_many([
+            {
+                'address': payout.address,
+                'amount': format(payout.amount, 'f'),
+                'withdraw_order_id': payout.withdraw_order_id,
+                'credential': credential,
+            }
+            for payout, credential in to_send
+        ]))
+
+        for (payout, _), result in zip(to_send, results):
+            if not isinstance(result, Exception) and result.get('id'):
+                self._mark_submitted(payout, str(result['id']), None)
+            elif not isinstance(result, Exception):
+                # Accepted without an id to poll by - the next pass finds it by withdrawOrderId
+                self._retry_later(payout, f"No withdrawal id in Binance response: {result}", resend=False)
+            elif _retryable(result) and payout.attempts < MAX_ATTEMPTS:
+                self._retry_later(payout, result)
+            else:
+                self._fail(payout, result)
+
+    def _mark_submitted(self, payout, binance_id, binance_status):
+        WeltradePayout.objects.filter(pk=payout.pk, status='submitting').update(
+            status='submitted', binance_id=binance_id, binance_status=binance_status,
+            submitted_at=timezone.now(), last_error='',
+        )
+
+    def _retry_later(self, payout, error, resend=True):
+        delay = RETRY_DELAYS[min(payout.attempts, len(RETRY_DELAYS)) - 1] if resend else POLL_INTERVAL
+        WeltradePayout.objects.filter(pk=payout.pk, status='submitting').update(
+            status='queued', next_attempt_at=timezone.now() + timedelta(seconds=delay), last_error=str(error),
+        )
+        logger.warning(f"Weltrade payout {payout.withdraw_order_id} retrying in {delay}s: {error}")
+
+    # -----------------------------
+    # Status polling
+    # -----------------------------
+    def _poll(self):
+        by_account = {}
+        for payout in WeltradePayout.objects.filter(status='submitted').exclude(binance_id=''):
+            by_account.setdefault(payout.account_id, []).append(payout)
+        if not by_account:
+            return
+
+        batches = []
+        for account_id, payouts in by_account.items():
+            credential = _credential(account_id) if account_id else None
+            if credential is None:
+                logger.error(f"No Binance key to poll {len(payouts)} Weltrade payouts on account {account_id}")
+                continue
+            for start in range(0, len(payouts), HISTORY_BATCH):
+                batches.append((credential, payouts[start:start + HISTORY_BATCH]))
+
+        async def fetch():
+            client = AsyncBinanceClient()
+            return await asyncio.gather(
+                *(client.withdraw_history(credential, idList=','.join(payout.binance_id for payout in chunk))
+                  for credential, chunk in batches),
+                return_exceptions=True,
+            )
+
+        for (credential, chunk), rows in zip(batches, asyncio.run(fetch())):
+            if isinstance(rows, Exception):
+                logger.warning(f"Could not poll Binance key {credential.id}: {rows}")
+                continue
+            by_id = {str(row.get('id')): row for row in rows}
+            for payout in chunk:
+                row = by_id.get(payout.binance_id)
+                if row is not None:
+                    self._apply_status(payout, row)
+
+    def _apply_status(self, payout, row):
+        status = row.get('status')
+        if status == STATUS_COMPLETED:
+            self._complete(payout, row)
+        elif status in FAILED_STATUSES:
+            self._fail(payout, PayoutFailed(
+                f"Binance withdrawal {FAILED_STATUSES[status]}", payload={'msg': row.get('info') or f"status {status}"},
+            ))
+        elif status != payout.binance_status:
+            WeltradePayout.objects.filter(pk=payout.pk, status='submitted').update(binance_status=status)
+
+    # -----------------------------
+    # Outcomes
+    # -----------------------------
+    def _complete(self, payout, row):
+        claimed = WeltradePayout.objects.filter(pk=payout.pk, status='submitted').update(
+            status='completed', binance_status=STATUS_COMPLETED, tx_id=row.get('txId') or '', finished_at=timezone.now(),
+        )
+        if not claimed:
+            return
+        from whatsapp.services import WhatsAppService
+
+        transaction = payout.transaction
+        WhatsAppService()._handle_weltrade_success(
+            transaction, payout.cashout, payout.withdraw_order_id, row, transaction.amount,
+        )
+
+    def _fail(self, payout, error):
+        claimed = WeltradePayout.objects.filter(pk=payout.pk, status__in=('submitting', 'submitted')).update(
+            status='failed', last_error=str(error), finished_at=timezone.now(),
+        )
+        if not claimed:
+            return
+        from whatsapp.services import WhatsAppService
+
+        if payout.cashout_id:
+            # Nothing was paid - the trader can use the POP again
+            CashOutTransaction.objects.filter(pk=payout.cashout_id).update(completed=False)
+        transaction = payout.transaction
+        WhatsAppService()._handle_weltrade_withdrawal_error(transaction, error, transaction.user)
+
+
+payout_worker = PayoutWorker()
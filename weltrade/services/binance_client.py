@@ -1,11 +1,14 @@
+import asyncio
+import os
+import threading
 import time
 import hmac
 import hashlib
-import random
 from urllib.parse import urlencode
 import requests
-from django.utils import timezone
-from ..models import BinanceSettings
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from .credentials import credential_pool
 
 
 # ============================
@@ -14,6 +17,11 @@ from ..models import BinanceSettings
 
 BINANCE_BASE_URL = "https://api.binance.com"
 
+CONNECT_TIMEOUT = 5             # seconds to open a connection
+READ_TIMEOUT = 30               # seconds to wait for Binance to answer
+SESSION_POOL_SIZE = 10          # keep-alive connections per API key
+MAX_IN_FLIGHT = 8               # concurrent requests from AsyncBinanceClient
+
 # ============================
 # ERRORS
 # ============================
@@ -30,18 +38,11 @@ class BinanceAPIError(Exception):
 
 def get_random_binance_credentials():
     """
-    Select a random active Binance API account from DB.
+    Next active Binance API account from the in-memory credential pool
+    (weighted round-robin, skipping keys that are cooling down).
     """
-    accounts = BinanceSettings.objects.filter(is_active=True)
-
-    if not accounts.exists():
-        raise Exception("No active Binance API accounts found")
-
-    account = random.choice(list(accounts))
-    account.last_used_at = timezone.now()
-    account.save(update_fields=["last_used_at"])
-
-    return account.api_key, account.api_secret
+    credential = credential_pool.acquire()
+    return credential.api_key, credential.api_secret
 
 
 def _sign_params(params: dict, api_secret: str) -> str:
@@ -56,39 +57,20 @@ def _sign_params(params: dict, api_secret: str) -> str:
     ).hexdigest()
     return f"{query}&signature={signature}"
 
-# ============================
-# MAIN BINANCE METHODS
-# ============================
 
-def binance_withdraw_usdt_trc20(*, address: str, amount: str, withdraw_order_id: str) -> dict:
+def _parse_response(credential, response):
     """
-    Withdraw USDT via TRC20 using a random Binance account from DB.
+    JSON body of a Binance response, raising BinanceAPIError on failure.
+    The outcome and weight headers are reported back to the credential pool.
     """
-    api_key, api_secret = get_random_binance_credentials()
-    ts = int(time.time() * 1000)
-
-    params = {
-        "coin": "USDT",
-        "network": "TRX",
-        "address": address,
-        "amount": amount,
-        "withdrawOrderId": withdraw_order_id,
-        "timestamp": ts,
-    }
-
-    signed_query = _sign_params(params, api_secret)
-    url = f"{BINANCE_BASE_URL}/sapi/v1/capital/withdraw/apply?{signed_query}"
-
-    headers = {
-        "X-MBX-APIKEY": api_key,
-    }
-
-    response = requests.post(url, headers=headers, timeout=30)
-
     try:
         data = response.json()
     except Exception:
-        raise BinanceAPIError(response.status_code, {"error": "Non-JSON response", "text": response.text})
+        data = {"error": "Non-JSON response", "text": response.text}
+        credential_pool.report(credential, response.status_code, response.headers, data)
+        raise BinanceAPIError(response.status_code, data)
+
+    credential_pool.report(credential, response.status_code, response.headers, data)
 
     if response.status_code != 200:
         raise BinanceAPIError(response.status_code, data)
@@ -99,46 +81,183 @@ def binance_withdraw_usdt_trc20(*, address: str, amount: str, withdraw_order_id:
     return data
 
 # ============================
-# FAILOVER SAFE WRAPPER
+# CLIENT
 # ============================
 
-def safe_binance_withdraw_usdt_trc20(*, address: str, amount: str, withdraw_order_id: str):
+class BinanceClient:
     """
-    Try withdrawal using all active accounts until one succeeds.
+    Signed Binance SAPI calls over one keep-alive requests.Session per API
+    key, so back-to-back payouts skip the TCP and TLS handshakes.
+
+    Safe to share between threads; the module-level ``binance_client`` is
+    what the helper functions below use. The base URL comes from the
+    BINANCE_BASE_URL setting unless given, so the local simulator
+    (weltrade.simulator) can stand in for Binance.
     """
-    accounts = list(BinanceSettings.objects.filter(is_active=True))
 
-    if not accounts:
-        raise Exception("No active Binance accounts available")
+    def __init__(self, base_url=None, pool_size=SESSION_POOL_SIZE,
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)):
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._sessions = {}
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return (self.base_url or getattr(settings, "BINANCE_BASE_URL", "") or BINANCE_BASE_URL).rstrip("/")
+
+    def _session(self, api_key):
+        with self._lock:
+            # A forked worker must not share the parent's sockets
+            if self._pid != os.getpid():
+                self._sessions = {}
+                self._pid = os.getpid()
+            session = self._sessions.get(api_key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers["X-MBX-APIKEY"] = api_key
+                self._sessions[api_key] = session
+            return session
+
+    def signed_request(self, credential, method: str, path: str, params: dict):
+        params = dict(params, timestamp=int(time.time() * 1000))
+        signed_query = _sign_params(params, credential.api_secret)
+        url = f"{self.url}{path}?{signed_query}"
 
-    for account in accounts:
         try:
-            ts = int(time.time() * 1000)
+            response = self._session(credential.api_key).request(method, url, timeout=self.timeout)
+        except requests.RequestException as e:
+            credential_pool.report_exception(credential, e)
+            raise
+
+        return _parse_response(credential, response)
+
+    def withdraw_usdt_trc20(self, *, address: str, amount: str, withdraw_order_id: str, credential=None) -> dict:
+        """Withdraw USDT via TRC20 with ``credential`` (next pooled key if omitted)."""
+        credential = credential or credential_pool.acquire()
+        return self.signed_request(credential, "POST", "/sapi/v1/capital/withdraw/apply", {
+            "coin": "USDT",
+            "network": "TRX",
+            "address": address,
+            "amount": amount,
+            "withdrawOrderId": withdraw_order_id,
+        })
+
+    def withdraw_history(self, credential, **params) -> list:
+        """One page of withdraw history for ``credential`` (Binance query params as kwargs)."""
+        data = self.signed_request(credential, "GET", "/sapi/v1/capital/withdraw/history", params)
+        if not isinstance(data, list):
+            raise BinanceAPIError(200, data)
+        return data
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            session.close()
+
+
+class AsyncBinanceClient:
+    """
+    asyncio front for BinanceClient, for running several payouts at once:
+
+        client = AsyncBinanceClient()
+        results = await client.withdraw_many([
+            {"address": ..., "amount": "25", "withdraw_order_id": ...},
+            ...
+        ])
+
+    Each call runs on a worker thread over the same keep-alive sessions;
+    at most ``max_in_flight`` requests are out at once.
+    """
+
+    def __init__(self, client=None, max_in_flight=MAX_IN_FLIGHT):
+        self.client = client or binance_client
+        self.max_in_flight = max_in_flight
+        self._semaphore = None
+
+    def _limit(self):
+        # Created on first use so it binds to the running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._semaphore
 
-            params = {
-                "coin": "USDT",
-                "network": "TRX",
-                "address": address,
-                "amount": amount,
-                "withdrawOrderId": withdraw_order_id,
-                "timestamp": ts,
-            }
+    async def withdraw_usdt_trc20(self, *, address: str, amount: str, withdraw_order_id: str, credential=None) -> dict:
+        async with self._limit():
+            return await asyncio.to_thread(
+                self.client.withdraw_usdt_trc20,
+                address=address, amount=amount, withdraw_order_id=withdraw_order_id, credential=credential,
+            )
 
-            signed_query = _sign_params(params, account.api_secret)
-            url = f"{BINANCE_BASE_URL}/sapi/v1/capital/withdraw/apply?{signed_query}"
+    async def withdraw_history(self, credential, **params) -> list:
+        async with self._limit():
+            return await asyncio.to_thread(self.client.withdraw_history, credential, **params)
 
-            headers = {
-                "X-MBX-APIKEY": account.api_key,
-            }
+    async def withdraw_many(self, withdrawals) -> list:
+        """Results (or the raised exceptions) in the order given."""
+        return await asyncio.gather(
+            *(self.withdraw_usdt_trc20(**withdrawal) for withdrawal in withdrawals),
+            return_exceptions=True,
+        )
 
-            response = requests.post(url, headers=headers, timeout=30)
-            data = response.json()
 
-            if response.status_code == 200 and not ("code" in data and data.get("code")):
-                account.last_used_at = timezone.now()
-                account.save(update_fields=["last_used_at"])
-                return data
+binance_client = BinanceClient()
 
+# ============================
+# MAIN BINANCE METHODS
+# ============================
+
+def binance_withdraw_usdt_trc20(*, address: str, amount: str, withdraw_order_id: str) -> dict:
+    """
+    Withdraw USDT via TRC20 using the next account from the credential pool.
+    """
+    return binance_client.withdraw_usdt_trc20(
+        address=address, amount=amount, withdraw_order_id=withdraw_order_id,
+    )
+
+def binance_withdraw_history(*, start_time: int, end_time: int, coin: str = "USDT") -> list:
+    """
+    Withdraw history (ms timestamps, max 90 day window) across every active account.
+    Each row gets the owning BinanceSettings id under "account_id".
+    """
+    history = []
+
+    for account in credential_pool.credentials():
+        offset = 0
+        while True:
+            data = binance_client.withdraw_history(
+                account, coin=coin, startTime=start_time, endTime=end_time, offset=offset, limit=1000,
+            )
+
+            for row in data:
+                row["account_id"] = account.id
+            history.extend(data)
+
+            if len(data) < 1000:
+                break
+            offset += 1000
+
+    return history
+
+# ============================
+# FAILOVER SAFE WRAPPER
+# ============================
+
+def safe_binance_withdraw_usdt_trc20(*, address: str, amount: str, withdraw_order_id: str):
+    """
+    Try withdrawal using all active accounts until one succeeds,
+    healthiest first.
+    """
+    for credential in credential_pool.candidates():
+        try:
+            return binance_client.withdraw_usdt_trc20(
+                address=address, amount=amount, withdraw_order_id=withdraw_order_id, credential=credential,
+            )
         except Exception:
             continue
 
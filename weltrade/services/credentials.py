@@ -0,0 +1,269 @@
+# weltrade/services/credentials.py
+"""
+In-memory pool of Binance API credentials.
+
+Every Weltrade payout used to query all active BinanceSettings, pick one
+at random and write last_used_at back - two round-trips and a write per
+withdrawal, blind to keys that were rate-limited or out of funds. The
+pool keeps the active keys in memory and picks with smooth weighted
+round-robin:
+
+    credential = credential_pool.acquire()
+    response = requests.post(url, headers={"X-MBX-APIKEY": credential.api_key}, ...)
+    credential_pool.report(credential, response.status_code, response.headers, payload)
+
+- A key's weight is the headroom left in its Binance request-weight budget,
+  read from the X-SAPI-USED-*-WEIGHT-1M / X-MBX-USED-WEIGHT-1M response
+  headers, so busy keys are picked less often.
+- Keys that return errors cool down: Retry-After on 418/429, a longer
+  pause on insufficient balance, exponential backoff otherwise.
+- last_used_at is written by a background flush every FLUSH_INTERVAL
+  seconds, with a queryset update (no save(), so no reload signal).
+
+The pool reloads when a BinanceSettings row is saved or deleted in this
+process (weltrade.signals) and every REFRESH_INTERVAL seconds to pick up
+changes made by other workers. Runtime state (cooldowns, weights) is kept
+across reloads by row id.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INTERVAL = 60           # seconds between reloads from the database
+FLUSH_INTERVAL = 30             # seconds between last_used_at writes
+WEIGHT_WINDOW = 60              # Binance weight counters reset every minute
+
+# Per-minute budgets behind the used-weight headers
+WEIGHT_LIMITS = {
+    'x-sapi-used-ip-weight-1m': 12000,
+    'x-sapi-used-uid-weight-1m': 180000,
+    'x-mbx-used-weight-1m': 6000,
+}
+
+MIN_WEIGHT = 0.05               # a nearly exhausted key still gets the odd request
+ERROR_COOLDOWN = 30             # seconds, doubled for each consecutive error
+MAX_COOLDOWN = 15 * 60
+RATE_LIMIT_COOLDOWN = 60        # 429/418 without a Retry-After header
+INSUFFICIENT_FUNDS_COOLDOWN = 10 * 60
+
+# Binance error codes for an empty wallet - other keys may still have funds
+INSUFFICIENT_FUNDS_CODES = {-4026, -5002}
+
+
+class BinanceCredential:
+    def __init__(self, pk, api_key, api_secret):
+        self.id = pk
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.used_weight = {}           # header -> (value, monotonic time read)
+        self.cooldown_until = 0.0
+        self.errors = 0
+        self.current = 0.0              # smooth weighted round-robin state
+
+    def headroom(self, now):
+        """Fraction of the tightest weight budget still unused this minute."""
+        headroom = 1.0
+        for header, (used, read_at) in self.used_weight.items():
+            if now - read_at > WEIGHT_WINDOW:
+                continue
+            headroom = min(headroom, 1 - used / WEIGHT_LIMITS[header])
+        return max(headroom, 0.0)
+
+    def weight(self, now):
+        if self.cooldown_until > now:
+            return 0.0
+        return max(self.headroom(now), MIN_WEIGHT)
+
+    def __repr__(self):
+        return f"<BinanceCredential {self.id}>"
+
+
+class CredentialPool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._credentials = []
+        self._loaded_at = None
+        self._stale = True
+        self._last_used = {}            # id -> datetime waiting to be flushed
+        self._flusher = None
+
+    # -----------------------------
+    # Loading
+    # -----------------------------
+    def invalidate(self):
+        """Reload on next use (BinanceSettings changed)."""
+        self._stale = True
+
+    def _ensure_loaded(self):
+        if not self._stale and self._loaded_at is not None and time.monotonic() - self._loaded_at < REFRESH_INTERVAL:
+            return
+        from ..models import BinanceSettings
+
+        rows = list(BinanceSettings.objects.filter(is_active=True).order_by('id').values_list('id', 'api_key', 'api_secret'))
+        with self._lock:
+            previous = {credential.id: credential for credential in self._credentials}
+            credentials = []
+            for pk, api_key, api_secret in rows:
+                credential = previous.get(pk)
+                if credential is None or credential.api_key != api_key or credential.api_secret != api_secret:
+                    credential = BinanceCredential(pk, api_key, api_secret)
+                credentials.append(credential)
+            self._credentials = credentials
+            self._loaded_at = time.monotonic()
+            self._stale = False
+
+    def credentials(self):
+        """Every active credential, for calls that must cover all accounts."""
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._credentials)
+
+    # -----------------------------
+    # Selection
+    # -----------------------------
+    def _ordered(self, now):
+        # Smooth weighted round-robin (nginx): each pick adds every key's weight
+        # to its counter, takes the highest and subtracts the total from it
+        weights = [(credential, credential.weight(now)) for credential in self._credentials]
+        total = sum(weight for _, weight in weights)
+        if total <= 0:
+            return None
+        for credential, weight in weights:
+            credential.current += weight
+        chosen = max((pair for pair in weights if pair[1] > 0), key=lambda pair: pair[0].current)[0]
+        chosen.current -= total
+        return chosen
+
+    def acquire(self):
+        """Next credential to use. Raises if no key is active."""
+        self._ensure_loaded()
+        now = time.monotonic()
+        with self._lock:
+            if not self._credentials:
+                raise Exception("No active Binance API accounts found")
+            credential = self._ordered(now)
+            if credential is None:
+                # Every key is cooling down - use the one that recovers first rather than fail
+                credential = min(self._credentials, key=lambda c: c.cooldown_until)
+            self._last_used[credential.id] = timezone.now()
+        self._ensure_flusher()
+        return credential
+
+    def candidates(self):
+        """All active credentials, best first - for failover across accounts."""
+        first = self.acquire()
+        now = time.monotonic()
+        with self._lock:
+            rest = sorted(
+                (credential for credential in self._credentials if credential is not first),
+                key=lambda credential: credential.weight(now),
+                reverse=True,
+            )
+        return [first] + rest
+
+    # -----------------------------
+    # Feedback
+    # -----------------------------
+    def record_headers(self, credential, headers):
+        if not headers:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for header in WEIGHT_LIMITS:
+                value = headers.get(header)
+                if value is None:
+                    continue
+                try:
+                    credential.used_weight[header] = (int(value), now)
+                except (TypeError, ValueError):
+                    pass
+
+    def report(self, credential, status_code, headers=None, payload=None):
+        """Feed a Binance response back: weight headers, then success or cooldown."""
+        self.record_headers(credential, headers)
+        code = payload.get('code') if isinstance(payload, dict) else None
+        if status_code == 200 and code in (0, None):
+            with self._lock:
+                credential.errors = 0
+                credential.cooldown_until = 0.0
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            credential.errors += 1
+            if status_code in (418, 429):
+                cooldown = _retry_after(headers) or RATE_LIMIT_COOLDOWN
+            elif code in INSUFFICIENT_FUNDS_CODES:
+                cooldown = INSUFFICIENT_FUNDS_COOLDOWN
+            else:
+                cooldown = min(ERROR_COOLDOWN * 2 ** (credential.errors - 1), MAX_COOLDOWN)
+            credential.cooldown_until = now + cooldown
+        logger.warning(f"Binance key {credential.id} cooling down for {cooldown}s after {status_code} {payload}")
+
+    def report_exception(self, credential, exc):
+        """Network failure with no response - back off like any other error."""
+        self.report(credential, None, None, {'error': str(exc)})
+
+    def snapshot(self):
+        """Per-key state for the admin screen."""
+        self._ensure_loaded()
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    'id': credential.id,
+                    'headroom': round(credential.headroom(now), 2),
+                    'cooling_down_for': max(0, round(credential.cooldown_until - now)),
+                    'errors': credential.errors,
+                }
+                for credential in self._credentials
+            ]
+
+    # -----------------------------
+    # last_used_at flush
+    # -----------------------------
+    def _ensure_flusher(self):
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name='binance-last-used', daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        from ..models import BinanceSettings
+
+        with self._lock:
+            pending, self._last_used = self._last_used, {}
+        if not pending:
+            return
+        try:
+            for pk, used_at in pending.items():
+                BinanceSettings.objects.filter(pk=pk).update(last_used_at=used_at)
+        except Exception as e:
+            logger.warning(f"Could not record Binance last_used_at: {e}")
+        finally:
+            close_old_connections()
+
+
+def _retry_after(headers):
+    try:
+        return int((headers or {}).get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+credential_pool = CredentialPool()
+atexit.register(credential_pool.flush)
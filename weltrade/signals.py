@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import BinanceSettings
+from .services.credentials import credential_pool
+
+
+@receiver(post_save, sender=BinanceSettings)
+@receiver(post_delete, sender=BinanceSettings)
+def reload_binance_credentials(sender, **kwargs):
+    """Keys added, edited, toggled or removed - rebuild the in-memory pool."""
+    credential_pool.invalidate()
@@ -0,0 +1,235 @@
+# weltrade/simulator.py
+"""
+Local stand-in for the Binance withdraw API, for load tests.
+
+Implements the two SAPI endpoints Weltrade payouts use -
+POST /sapi/v1/capital/withdraw/apply and GET /sapi/v1/capital/withdraw/history -
+over HTTP/1.1 keep-alive, with configurable latency and error injection.
+Point the app at it with BINANCE_BASE_URL:
+
+    python manage.py binance_simulator --port 8766 --latency 300
+    BINANCE_BASE_URL=http://127.0.0.1:8766 python manage.py runserver
+
+or start it in-process (see the binance_load_test command):
+
+    simulator = BinanceSimulator(latency=0.3)
+    simulator.start_in_thread()
+
+Signatures are not checked. Every response carries the used-weight
+headers Binance sends, counted per API key per minute, and a key over
+its budget gets 429 with Retry-After. Withdrawals show as Processing (4)
+in the history until ``settle_after`` seconds have passed, then Completed
+(6) - or Failure (5) for a ``fail_rate`` fraction of them.
+"""
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+WITHDRAW_WEIGHT = 600           # UID weight Binance charges per withdraw/apply
+HISTORY_WEIGHT = 10             # IP weight per withdraw/history page
+UID_WEIGHT_LIMIT = 180000
+IP_WEIGHT_LIMIT = 12000
+
+# Errors the real API returns for withdrawals, picked at random by error injection
+INJECTED_ERRORS = (
+    (-4026, 'User has insufficient balance.'),
+    (-1021, 'Timestamp for this request is outside of the recvWindow.'),
+    (-4005, 'Too many requests'),
+)
+
+STATUS_PROCESSING = 4
+STATUS_FAILURE = 5
+STATUS_COMPLETED = 6
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'       # keep-alive, like Binance
+
+    def setup(self):
+        super().setup()
+        self.server.simulator._count('connections')
+
+    def do_GET(self):
+        self._serve('GET')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        self._serve('POST')
+
+    def _serve(self, method):
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        status, body, headers = self.server.simulator.respond(
+            method, url.path, params, self.headers.get('X-MBX-APIKEY', ''),
+        )
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in headers.items():
+            self.send_header(key, str(value))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class BinanceSimulator:
+    def __init__(self, host='127.0.0.1', port=8766, latency=0.3, jitter=0.1,
+                 error_rate=0.0, fail_rate=0.0, settle_after=5.0, seed=None):
+        """
+        latency/jitter: seconds added to every response (uniform +/- jitter).
+        error_rate: fraction of withdraw/apply requests answered with an error.
+        fail_rate: fraction of accepted withdrawals that end in Failure.
+        settle_after: seconds a withdrawal stays Processing.
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.fail_rate = fail_rate
+        self.settle_after = settle_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._withdrawals = {}              # withdrawOrderId -> record
+        self._weights = {}                  # (api key, kind) -> (minute, used)
+        self._server = None
+        self.stats = {'requests': 0, 'connections': 0, 'withdrawals': 0, 'errors_injected': 0, 'rate_limited': 0}
+
+    # -----------------------------
+    # Server lifecycle
+    # -----------------------------
+    @property
+    def endpoint(self):
+        return f"http://{self.host}:{self._server.server_address[1] if self._server else self.port}"
+
+    def _make_server(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.simulator = self
+        return self._server
+
+    def serve_forever(self):
+        server = self._make_server()
+        logger.info(f"Binance simulator listening on {self.endpoint}")
+        server.serve_forever()
+
+    def start_in_thread(self):
+        """Serve on a daemon thread; returns once the socket is listening."""
+        server = self._make_server()
+        thread = threading.Thread(target=server.serve_forever, name='binance-simulator', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    # -----------------------------
+    # Requests
+    # -----------------------------
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _use_weight(self, api_key, kind, weight):
+        minute = int(time.time() // 60)
+        with self._lock:
+            used_minute, used = self._weights.get((api_key, kind), (minute, 0))
+            used = (used if used_minute == minute else 0) + weight
+            self._weights[(api_key, kind)] = (minute, used)
+        return used
+
+    def respond(self, method, path, params, api_key):
+        """(status, body, headers) for one request."""
+        self._count('requests')
+        delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if method == 'POST' and path == '/sapi/v1/capital/withdraw/apply':
+            used = self._use_weight(api_key, 'uid', WITHDRAW_WEIGHT)
+            headers = {'X-SAPI-USED-UID-WEIGHT-1M': used}
+            if used > UID_WEIGHT_LIMIT:
+                self._count('rate_limited')
+                return 429, {'code': -1003, 'msg': 'Too many requests; please use the websocket for live updates.'}, dict(headers, **{'Retry-After': 60 - int(time.time()) % 60})
+            return self._withdraw(params) + (headers,)
+
+        if method == 'GET' and path == '/sapi/v1/capital/withdraw/history':
+            used = self._use_weight(api_key, 'ip', HISTORY_WEIGHT)
+            headers = {'X-SAPI-USED-IP-WEIGHT-1M': used}
+            if used > IP_WEIGHT_LIMIT:
+                self._count('rate_limited')
+                return 429, {'code': -1003, 'msg': 'Too many requests.'}, dict(headers, **{'Retry-After': 60 - int(time.time()) % 60})
+            return 200, self._history(params), headers
+
+        return 404, {'code': -1000, 'msg': f'Unknown endpoint {method} {path}'}, {}
+
+    def _withdraw(self, params):
+        for key in ('coin', 'address', 'amount'):
+            if not params.get(key):
+                return 400, {'code': -1102, 'msg': f"Mandatory parameter '{key}' was not sent."}
+
+        if self.error_rate and self._random.random() < self.error_rate:
+            self._count('errors_injected')
+            code, message = self._random.choice(INJECTED_ERRORS)
+            return 400, {'code': code, 'msg': message}
+
+        order_id = params.get('withdrawOrderId') or uuid.uuid4().hex
+        with self._lock:
+            if order_id in self._withdrawals:
+                return 400, {'code': -4052, 'msg': 'Duplicate withdrawOrderId.'}
+            record = {
+                'id': f"sim{next(self._ids):010d}",
+                'withdrawOrderId': order_id,
+                'amount': params['amount'],
+                'transactionFee': '1',
+                'coin': params['coin'],
+                'network': params.get('network', 'TRX'),
+                'address': params['address'],
+                'applyTime': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()),
+                '_applied': time.time(),
+                '_fails': self._random.random() < self.fail_rate,
+            }
+            self._withdrawals[order_id] = record
+            self.stats['withdrawals'] += 1
+        return 200, {'id': record['id']}
+
+    def _row(self, record, now):
+        row = {key: value for key, value in record.items() if not key.startswith('_')}
+        if now - record['_applied'] < self.settle_after:
+            row['status'] = STATUS_PROCESSING
+        elif record['_fails']:
+            row['status'] = STATUS_FAILURE
+        else:
+            row['status'] = STATUS_COMPLETED
+            row['txId'] = f"simtx{record['id']}"
+        return row
+
+    def _history(self, params):
+        now = time.time()
+        with self._lock:
+            records = list(self._withdrawals.values())
+        if params.get('withdrawOrderId'):
+            records = [record for record in records if record['withdrawOrderId'] == params['withdrawOrderId']]
+        if params.get('idList'):
+            wanted = set(params['idList'].split(','))
+            records = [record for record in records if record['id'] in wanted]
+        records.sort(key=lambda record: record['_applied'], reverse=True)
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 1000)
+        return [self._row(record, now) for record in records[offset:offset + limit]]
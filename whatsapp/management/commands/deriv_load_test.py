@@ -0,0 +1,260 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.test.utils import override_settings
+from accounts.models import User
+from deriv.executor import timing_stats
+from deriv.models import DerivAccountName
+from deriv.simulator import DerivSimulator
+from ecocash.models import CashOutTransaction
+from finance.models import EcoCashTransaction, TransactionCharge
+from whatsapp.handlers import MessageHandler
+from whatsapp.models import EcocashPop, InitiateOrders, Switch, WhatsAppSession
+from whatsapp.prefetch import prefetch_recipient
+
+
+class _SinkHandler(BaseHTTPRequestHandler):
+    """Accepts the WhatsApp / SMS API calls the deposit flow makes."""
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        self.server.requests += 1
+        body = json.dumps({'messages': [{'id': f"wamid.sim{self.server.requests}"}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = 'Replay WhatsApp deposit conversations through MessageHandler against the local Deriv simulator'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--deposits',
+            type=int,
+            default=50,
+            help='Number of deposit conversations to replay',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=5,
+            help='Conversations in flight at once',
+        )
+        parser.add_argument(
+            '--think-time',
+            type=float,
+            default=0,
+            help='Milliseconds a trader waits between messages',
+        )
+        parser.add_argument('--latency', type=float, default=100, help='Simulator latency (ms)')
+        parser.add_argument('--jitter', type=float, default=50, help='Simulator jitter (ms)')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Simulator transfer error rate (0-1)')
+        parser.add_argument('--drop-rate', type=float, default=0.0, help='Simulator connection drop rate (0-1)')
+        parser.add_argument('--port', type=int, default=8765, help='Simulator port')
+        parser.add_argument(
+            '--endpoint',
+            type=str,
+            help='Use an already running simulator at this ws:// URL instead of starting one',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the load-test users, cashouts and transactions afterwards',
+        )
+
+    def handle(self, *args, **options):
+        switch = Switch.objects.filter(transaction_type='deposit').first()
+        if not switch or not switch.is_active:
+            raise CommandError("The deposit Switch must exist and be active - run this against a staging database")
+
+        run = random.randint(100, 999)
+        self.phone_prefix = f"26371{run}"
+        self.login_prefix = f"CR9{run}"
+        self.txn_prefix = f"LT{datetime.now():%y%m%d}.{run}"
+        count = options['deposits']
+        self.think = options['think_time'] / 1000
+
+        accounts = {f"{self.login_prefix}{i:04d}": f"Load Trader {i}" for i in range(count)}
+
+        simulator = None
+        endpoint = options['endpoint']
+        if not endpoint:
+            simulator = DerivSimulator(
+                port=options['port'],
+                latency=options['latency'] / 1000,
+                jitter=options['jitter'] / 1000,
+                error_rate=options['error_rate'],
+                drop_rate=options['drop_rate'],
+                accounts=accounts,
+                default_name='Load Trader',
+            )
+            simulator.start_in_thread()
+            endpoint = simulator.endpoint
+        elif not endpoint.startswith('ws://'):
+            raise CommandError("--endpoint must be a local ws:// simulator, never the real Deriv API")
+
+        sink = ThreadingHTTPServer(('127.0.0.1', 0), _SinkHandler)
+        sink.requests = 0
+        threading.Thread(target=sink.serve_forever, name='whatsapp-sink', daemon=True).start()
+        sink_url = f"http://127.0.0.1:{sink.server_address[1]}/"
+
+        self.stdout.write(f"Run {run}: {count} deposits, concurrency {options['concurrency']}, Deriv at {endpoint}")
+
+        results = []
+        timing_stats.reset()
+        try:
+            with override_settings(DERIV_ENDPOINT=endpoint, WHATSAPP_URL=sink_url, SMS_API_URL=sink_url):
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                    futures = [executor.submit(self._conversation, i) for i in range(count)]
+                    for future in as_completed(futures):
+                        results.append(future.result())
+                elapsed = time.perf_counter() - started
+        finally:
+            sink.shutdown()
+            if simulator:
+                simulator.stop()
+
+        self._report(results, elapsed, sink.requests, simulator)
+
+        if not options['keep']:
+            self._cleanup()
+
+    def _pause(self):
+        if self.think:
+            time.sleep(self.think)
+
+    def _conversation(self, i):
+        phone = f"{self.phone_prefix}{i:04d}"
+        ecocash_number = phone[3:]
+        account_number = f"{self.login_prefix}{i:04d}"
+        amount = Decimal(random.randint(5, 200))
+        handler = MessageHandler()
+        result = {'ok': False, 'status': None, 'total': None, 'pop_to_credit': None, 'error': None}
+
+        try:
+            started = time.perf_counter()
+
+            # 1. Trader picks Deriv deposit from the menu
+            handler.handle_incoming_message(phone, 'deriv_deposit', phone)
+            self._pause()
+
+            # 2. Deposit flow submitted - same as views.create_deposit_order
+            user = User.objects.get(phone_number=phone)
+            InitiateOrders.objects.filter(trader=user).delete()
+            order = InitiateOrders.objects.create(
+                trader=user, amount=amount, account_number=account_number, ecocash_number=ecocash_number,
+            )
+            prefetch_recipient(order)
+            WhatsAppSession.objects.filter(phone_number=phone).update(
+                current_step='waiting_for_ecocash_pop', previous_step='order_creation',
+            )
+            handler.handle_incoming_message(phone, 'done', phone)
+            self._pause()
+
+            # 3. Trader pays; the EcoCash cashout SMS lands
+            total = amount + TransactionCharge.get_charge_for_amount(amount, 'deposit')
+            txn_id = f"{self.txn_prefix}.T{i:07d}"
+            sms = (
+                f"Ecocash CashOut Confirmation: USD {total:.2f} transfered from {ecocash_number} - "
+                f"LOAD TRADER {i} was successful. Txn ID : {txn_id}"
+            )
+            CashOutTransaction.objects.create(
+                amount=total, name=f"LOAD TRADER {i}", phone=ecocash_number, txn_id=txn_id, body=sms,
+            )
+            self._pause()
+
+            # 4. POP flow submitted, then the message that triggers processing
+            EcocashPop.objects.create(order=order, ecocash_message=sms, has_image=False)
+            WhatsAppSession.objects.filter(phone_number=phone).update(
+                current_step='finish_order_creation', previous_step='order_creation',
+            )
+            pop_started = time.perf_counter()
+            handler.handle_incoming_message(phone, 'pop', phone)
+            finished = time.perf_counter()
+
+            transaction = EcoCashTransaction.objects.filter(user=user, transaction_type='deposit').order_by('-id').first()
+            result['status'] = transaction.status if transaction else 'no transaction'
+            result['ok'] = result['status'] == 'completed'
+            result['total'] = finished - started
+            result['pop_to_credit'] = finished - pop_started
+        except Exception as e:
+            result['error'] = str(e)
+        finally:
+            close_old_connections()
+        return result
+
+    def _report(self, results, elapsed, whatsapp_calls, simulator):
+        completed = [result for result in results if result['ok']]
+        statuses = {}
+        for result in results:
+            key = 'error' if result['error'] else result['status']
+            statuses[key] = statuses.get(key, 0) + 1
+
+        self.stdout.write("\n" + "=" * 60)
+        self.stdout.write("DEPOSIT LOAD TEST")
+        self.stdout.write("=" * 60)
+        self.stdout.write(f"  conversations   {len(results)} in {elapsed:.2f}s")
+        self.stdout.write(f"  completed       {len(completed)}")
+        self.stdout.write(f"  deposits/sec    {len(completed) / elapsed if elapsed else 0:.2f}")
+        self.stdout.write(f"  outcomes        {json.dumps(statuses)}")
+        self.stdout.write(f"  whatsapp calls  {whatsapp_calls}")
+        if simulator:
+            self.stdout.write(f"  simulator       {json.dumps(simulator.stats)}")
+
+        for label, key in (('POP -> credit', 'pop_to_credit'), ('conversation', 'total')):
+            values = sorted(result[key] for result in completed)
+            if not values:
+                continue
+            self.stdout.write(
+                f"  {label:<15} "
+                + "  ".join(f"p{pct} {_percentile(values, pct) * 1000:.0f}ms" for pct in (50, 90, 95, 99))
+                + f"  max {values[-1] * 1000:.0f}ms"
+            )
+
+        # Where the time goes inside _process_deposit_payment
+        for step, summary in timing_stats.summary().items():
+            self.stdout.write(
+                f"  step {step:<10} n={summary['count']}  p50 {summary['p50']:.0f}ms  "
+                f"p95 {summary['p95']:.0f}ms  max {summary['max']:.0f}ms"
+            )
+
+        errors = [result['error'] for result in results if result['error']]
+        for error in errors[:5]:
+            self.stdout.write(self.style.ERROR(f"  error: {error}"))
+        self.stdout.write("=" * 60)
+
+        if len(completed) == len(results):
+            self.stdout.write(self.style.SUCCESS("All deposits completed"))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(results) - len(completed)} deposits did not complete"))
+
+    def _cleanup(self):
+        CashOutTransaction.objects.filter(txn_id__startswith=self.txn_prefix).delete()
+        DerivAccountName.objects.filter(login_id__startswith=self.login_prefix).delete()
+        deleted, _ = User.objects.filter(phone_number__startswith=self.phone_prefix).delete()
+        self.stdout.write(f"Cleaned up load-test data ({deleted} rows)")
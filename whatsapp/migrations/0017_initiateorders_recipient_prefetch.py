@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0016_clientverification_phone_e164'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='initiateorders',
+            name='recipient_account',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='initiateorders',
+            name='recipient_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='initiateorders',
+            name='recipient_checked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='initiateorders',
+            name='recipient_name',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:40
+
+import re
+
+from django.db import migrations, models
+
+
+def tokens_key(name):
+    # Frozen copy of accounts.names.tokens_key
+    if not name:
+        return ''
+    name = re.sub(r"^(?:mr|mrs|ms|miss|dr)\.?\s+", "", name.strip(), flags=re.IGNORECASE)
+    tokens = {part.lower().strip('.') for part in re.split(r"\s+", name)}
+    return ' '.join(sorted(token for token in tokens if token))
+
+
+def backfill_name_tokens(apps, schema_editor):
+    ClientVerification = apps.get_model('whatsapp', 'ClientVerification')
+    batch = []
+    for obj in ClientVerification.objects.only('id', 'name').iterator(chunk_size=2000):
+        obj.name_tokens = tokens_key(obj.name)
+        batch.append(obj)
+        if len(batch) >= 2000:
+            ClientVerification.objects.bulk_update(batch, ['name_tokens'])
+            batch = []
+    if batch:
+        ClientVerification.objects.bulk_update(batch, ['name_tokens'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0017_initiateorders_recipient_prefetch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientverification',
+            name='name_tokens',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_name_tokens, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,8 @@
 from decimal import Decimal
 from django.db import models
 from accounts.models import User
+from accounts.phone import to_e164, to_local, is_valid_mobile
+from accounts.names import tokens_key
 
 class WhatsAppSession(models.Model):
     """Track WhatsApp bot sessions and user interactions"""
@@ -58,6 +60,11 @@ class InitiateOrders(models.Model):
      txn_Id = models.CharField(max_length=100, blank=True, null=True)
      account_number = models.CharField(max_length=100)
      order_type = models.CharField(max_length=50, choices=ORDER_TYPES, default='deposit')
+     # Deriv dry-run result fetched in the background when the order is created
+     recipient_name = models.CharField(max_length=255, blank=True, null=True)
+     recipient_amount = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+     recipient_account = models.CharField(max_length=100, blank=True, null=True)
+     recipient_checked_at = models.DateTimeField(blank=True, null=True)
 
      def __str__(self):
             return self.account_number
@@ -104,6 +111,9 @@ class ClientVerification(models.Model):
     trader = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     name = models.CharField(max_length=255)
     ecocash_number = models.CharField(max_length=20, unique=True)
+    phone_e164 = models.CharField(max_length=21, blank=True, default='', db_index=True, editable=False)
+    # accounts.names.tokens_key(name), maintained in save()
+    name_tokens = models.CharField(max_length=255, blank=True, default='', editable=False)
 
     national_id_image = models.ImageField(upload_to='clients/ids/', blank=True, null=True)
     selfie_with_id = models.ImageField(upload_to='clients/selfies/', blank=True, null=True)
@@ -125,27 +135,24 @@ class ClientVerification(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     def clean_ecocash(self):
-        number = self.ecocash_number.strip()
-
-        # remove spaces and +
-        number = number.replace(" ", "").replace("+", "")
-
-        # If starts with 263
-        if number.startswith("263"):
-            number = number[3:]   # remove 263 → "786976684"
-
-        # If starts with 07
-        if number.startswith("07"):
-            number = number[1:]   # remove "0" → "786976684"
-
-        # Final validation: must start with 7 and be 9 digits
-        if not (number.startswith("7") and number.isdigit() and len(number) == 9):
+        # Must be a 9-digit mobile number starting with 7 once normalised
+        if not is_valid_mobile(self.ecocash_number):
             raise ValidationError("Invalid EcoCash number format")
 
-        return number
+        return to_local(self.ecocash_number)
 
     def save(self, *args, **kwargs):
         self.ecocash_number = self.clean_ecocash()
+        self.phone_e164 = to_e164(self.ecocash_number)
+        self.name_tokens = tokens_key(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'ecocash_number' in update_fields:
+                update_fields.add('phone_e164')
+            if 'name' in update_fields:
+                update_fields.add('name_tokens')
+            kwargs['update_fields'] = update_fields
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -0,0 +1,117 @@
+# whatsapp/outbox.py
+"""
+Background delivery of trader notifications.
+
+WhatsApp messages are plain HTTP calls to an outside gateway; making
+them inline held the Deriv callback (and the trader's browser) until
+the gateway had answered. Callers queue them instead and return
+straight away:
+
+    from whatsapp.outbox import whatsapp_outbox
+
+    whatsapp_outbox.home_button(trader.phone_number, message)
+
+The outbox has one worker thread, so messages to a trader arrive in the
+order they were queued. A send fails when it raises - the gateway calls
+time out after GATEWAY_TIMEOUT, so a stalled gateway holds the worker
+for that long at most - or when the gateway answers with a non-2xx
+status; failed sends are retried after RETRY_DELAYS.
+Whatever is still queued at shutdown is flushed before the process
+exits - but a crash loses it, so only notices belong here. Anything
+that moves money (the EcoCash payout SMS) is sent inline.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAYS = (2, 10, 30)      # seconds before each retry of a failed send
+FLUSH_TIMEOUT = 10              # seconds given to queued sends at shutdown
+
+
+class Outbox:
+    def __init__(self, name):
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # A forked worker inherits the attribute but not the thread - start again
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def put(self, func, *args, description='', retry=True):
+        """Queue ``func(*args)`` for the worker thread."""
+        self._ensure_started()
+        self._queue.put((func, args, description or getattr(func, '__name__', 'send'), retry))
+
+    def _run(self):
+        while True:
+            func, args, description, retry = self._queue.get()
+            try:
+                self._deliver(func, args, description, retry)
+            finally:
+                self._queue.task_done()
+                close_old_connections()
+
+    def _deliver(self, func, args, description, retry):
+        attempts = len(RETRY_DELAYS) + 1 if retry else 1
+        for attempt in range(attempts):
+            try:
+                func(*args)
+                return
+            except Exception as e:
+                if attempt + 1 >= attempts:
+                    logger.error(f"{self.name}: giving up on {description}: {e}")
+                    return
+                logger.warning(f"{self.name}: {description} failed ({e}), retrying")
+                time.sleep(RETRY_DELAYS[attempt])
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """Wait up to ``timeout`` seconds for queued sends to go out."""
+        if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+
+class WhatsAppOutbox(Outbox):
+    @staticmethod
+    def _service():
+        from .services import WhatsAppService
+        return WhatsAppService()
+
+    @classmethod
+    def _send(cls, method, phone_number, message):
+        response = getattr(cls._service(), method)(phone_number, message)
+        # The gateway reports rejected sends in the status, not by raising
+        response.raise_for_status()
+
+    def home_button(self, phone_number, message):
+        self.put(self._send, 'home_button', phone_number, message, description=f"WhatsApp to {phone_number}")
+
+    def cancel_button(self, phone_number, message):
+        self.put(self._send, 'cancel_button', phone_number, message, description=f"WhatsApp to {phone_number}")
+
+
+whatsapp_outbox = WhatsAppOutbox('whatsapp-outbox')
+
+
+@atexit.register
+def _flush_outboxes():
+    whatsapp_outbox.flush()
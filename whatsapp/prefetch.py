@@ -0,0 +1,134 @@
+# whatsapp/prefetch.py
+"""
+Speculative Deriv recipient lookup for deposit orders.
+
+The Deriv account number and amount are known as soon as the deposit
+flow creates the InitiateOrders row, but the paymentagent_transfer dry
+run that returns client_to_full_name used to wait until the POP had been
+matched. prefetch_recipient() starts that dry run in the background when
+the order is created and stores the result on the order;
+_process_deposit_payment then asks cached_recipient() first and only
+goes back to Deriv when the cached lookup is missing, stale, or was made
+for a different account or amount.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import InitiateOrders
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_TTL = timedelta(minutes=10)    # how long a dry-run result is trusted
+PREFETCH_WAIT = 10                      # seconds to wait for a lookup still in flight
+
+# ORM writes can't run on the Deriv loop thread, so lookups run here and
+# block on deriv_service instead
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='deriv-prefetch')
+_inflight = {}      # order id -> Future
+_lock = threading.Lock()
+
+
+def _forget(order_id, future):
+    with _lock:
+        if _inflight.get(order_id) is future:
+            del _inflight[order_id]
+
+
+def _net_amount(order):
+    from .services import WhatsAppService
+
+    try:
+        total_amount = Decimal(str(order.amount))
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    if total_amount <= 0:
+        return None
+    net_amount, _charge = WhatsAppService._calculate_net_amount_and_charge(total_amount, order.order_type)
+    return net_amount
+
+
+def _prefetch(order_id):
+    from deriv.service import deriv_service
+    from deriv.views import DerivPaymentAgent
+
+    try:
+        order = InitiateOrders.objects.get(pk=order_id)
+        net_amount = _net_amount(order)
+        if net_amount is None:
+            return None
+        account_number = order.account_number.strip()
+
+        details = deriv_service.run(
+            DerivPaymentAgent().fetch_payment_agent_transfer_details(net_amount, account_number)
+        )
+        # Errors come back as a WhatsApp support link - leave them for the live run to report
+        if not isinstance(details, dict) or 'client_to_full_name' not in details:
+            return None
+
+        # Filter on the inputs too: if the trader restarted the flow the row is gone or changed
+        InitiateOrders.objects.filter(
+            pk=order_id, account_number=order.account_number, amount=order.amount,
+        ).update(
+            recipient_name=details['client_to_full_name'],
+            recipient_amount=net_amount,
+            recipient_account=account_number,
+            recipient_checked_at=timezone.now(),
+        )
+        return details
+    except Exception as e:
+        logger.warning(f"Recipient prefetch failed for order {order_id}: {e}")
+        return None
+    finally:
+        close_old_connections()
+
+
+def prefetch_recipient(order):
+    """Start the Deriv dry run for a new deposit order in the background."""
+    if order.order_type != 'deposit' or not order.amount or not order.account_number:
+        return None
+    future = _executor.submit(_prefetch, order.pk)
+    with _lock:
+        _inflight[order.pk] = future
+    future.add_done_callback(lambda f, order_id=order.pk: _forget(order_id, f))
+    return future
+
+
+def cached_recipient(order, account_number, amount):
+    """
+    Dry-run details prefetched for ``order`` if they are still fresh and were
+    fetched for this account and net amount, otherwise None.
+    """
+    if order is None or order.pk is None:
+        return None
+
+    with _lock:
+        future = _inflight.get(order.pk)
+    if future is not None:
+        try:
+            future.result(PREFETCH_WAIT)
+        except Exception:
+            pass
+
+    try:
+        order.refresh_from_db(fields=[
+            'recipient_name', 'recipient_amount', 'recipient_account', 'recipient_checked_at',
+        ])
+    except InitiateOrders.DoesNotExist:
+        return None
+
+    if not order.recipient_name or order.recipient_checked_at is None:
+        return None
+    if timezone.now() - order.recipient_checked_at > PREFETCH_TTL:
+        return None
+    if (order.recipient_account or '').strip() != str(account_number).strip():
+        return None
+    if order.recipient_amount is None or Decimal(str(amount)).quantize(Decimal('0.01')) != order.recipient_amount:
+        return None
+
+    return {'client_to_full_name': order.recipient_name, 'prefetched': True}
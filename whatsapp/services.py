@@ -1,10 +1,11 @@
 # whatsapp/services.py (updated)
-from difflib import SequenceMatcher
 import requests
 from django.conf import settings
 from django.core.files.base import ContentFile
 from accounts.models import User
-from finance.models import EcoCashTransaction, TransactionReceipt, TransactionCharge
+from finance.models import AuditLog, EcoCashTransaction, StatusConflict, TransactionReceipt, TransactionCharge
+from finance import rollups
+from finance.charges import charge_schedule
 from .models import WhatsAppSession, WhatsAppMessage
 from .ocr_service import EcoCashOCRService
 from decimal import Decimal, InvalidOperation
@@ -12,12 +13,16 @@ import base64
 import io
 from .models import InitiateOrders, EcocashPop, ClientVerification, InitiateSubscription
 from ecocash.models import CashOutTransaction
+from accounts.phone import to_e164
+from accounts import names
 import re
 import uuid
 from datetime import datetime
-import asyncio
 from datetime import timedelta
 from books.models import Book
+
+GATEWAY_TIMEOUT = 15    # seconds per WhatsApp / SMS gateway call
+
 class WhatsAppService:
     def __init__(self):
         self.api_url = settings.WHATSAPP_URL
@@ -35,7 +40,7 @@ class WhatsAppService:
                 "type": "text",
                 "text": {"body": message}
                 }
-        response = requests.post(self.api_url, headers=headers, json=payload)
+        response = requests.post(self.api_url, headers=headers, json=payload, timeout=GATEWAY_TIMEOUT)
         ans = response.json()
         self.log_message(phone_number, message, 'outgoing')
         print("Response: ", ans)
@@ -108,7 +113,7 @@ class WhatsAppService:
                 }
             
                 }
-        response = requests.post(self.api_url, headers=headers, json=payload)
+        response = requests.post(self.api_url, headers=headers, json=payload, timeout=GATEWAY_TIMEOUT)
         ans = response.json()
         print(ans)
         return True
@@ -135,7 +140,7 @@ class WhatsAppService:
                     }
                             
                 
-        response = requests.post(settings.WHATSAPP_URL, headers=headers, json=payload)
+        response = requests.post(settings.WHATSAPP_URL, headers=headers, json=payload, timeout=GATEWAY_TIMEOUT)
         ans = response.json()
         return
 
@@ -180,7 +185,7 @@ class WhatsAppService:
             }
             
             }
-        response = requests.post(self.api_url, headers=headers, json=payload)
+        response = requests.post(self.api_url, headers=headers, json=payload, timeout=GATEWAY_TIMEOUT)
         ans = response.json()
         print(ans)
 
@@ -227,7 +232,7 @@ class WhatsAppService:
             }
             
             }
-        response = requests.post(self.api_url, headers=headers, json=payload)
+        response = requests.post(self.api_url, headers=headers, json=payload, timeout=GATEWAY_TIMEOUT)
         ans = response.json()
         print(ans)
 
@@ -245,7 +250,7 @@ class WhatsAppService:
             }
         }
 
-        response = requests.post(self.api_url, headers=headers, json=payload)
+        response = requests.post(self.api_url, headers=headers, json=payload, timeout=GATEWAY_TIMEOUT)
         ans = response.json
         print("Response: ", ans)
 
@@ -275,8 +280,8 @@ class WhatsAppService:
                     }
                             
                 
-        response = requests.post(self.api_url, headers=headers, json=payload)
-        ans = response.json()
+        response = requests.post(self.api_url, headers=headers, json=payload, timeout=GATEWAY_TIMEOUT)
+        return response
 
     def yes_or_no_button(self, phone_number, message):
         headers = {"Authorization": self.api_token}
@@ -313,7 +318,7 @@ class WhatsAppService:
                     }
                             
                 
-        response = requests.post(self.api_url, headers=headers, json=payload)
+        response = requests.post(self.api_url, headers=headers, json=payload, timeout=GATEWAY_TIMEOUT)
         ans = response.json()
         print(ans)
     
@@ -343,8 +348,8 @@ class WhatsAppService:
                     }
                             
                 
-        response = requests.post(self.api_url, headers=headers, json=payload)
-        ans = response.json()
+        response = requests.post(self.api_url, headers=headers, json=payload, timeout=GATEWAY_TIMEOUT)
+        return response
 
     def update_signals_subscription(self, phone_number):
         self.send_message(phone_number, "🔄 Verifying your subscription... Please wait.")
@@ -370,19 +375,9 @@ class WhatsAppService:
             self.send_signals_flow(phone_number, message)
             return
 
-            # Find matching cashout transaction
-        cashout = CashOutTransaction.objects.filter(
-                phone=sub.ecocash_number, 
-                txn_id=extracted_reference
-            ).first()
-            
-            # Try partial match if exact not found
-        if not cashout:
-            cashout = CashOutTransaction.objects.filter(
-                phone=sub.ecocash_number, 
-                txn_id__endswith=extracted_reference
-            ).first()
-            print("Partial match cashout:", cashout)
+        # Find matching cashout transaction (exact txn_id, then short-code suffix)
+        cashout = CashOutTransaction.find_for_pop(sub.ecocash_number, extracted_reference)
+        print("Matched cashout:", cashout)
 
         if cashout:
             if cashout.completed:
@@ -627,7 +622,7 @@ class WhatsAppService:
         }
 
         try:
-            response = requests.post(url, json=payload, auth=auth)
+            response = requests.post(url, json=payload, auth=auth, timeout=GATEWAY_TIMEOUT)
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -672,7 +667,7 @@ class WhatsAppService:
             }
          }
 
-        response = requests.post(self.api_url, headers=headers, json=payload)
+        response = requests.post(self.api_url, headers=headers, json=payload, timeout=GATEWAY_TIMEOUT)
     
     def send_verification_flow(self, phone_number):
         headers = {"Authorization": self.api_token}
@@ -712,7 +707,7 @@ class WhatsAppService:
             }
          }
 
-        response = requests.post(self.api_url, headers=headers, json=payload)
+        response = requests.post(self.api_url, headers=headers, json=payload, timeout=GATEWAY_TIMEOUT)
         ans = response.json()
         print(ans)
     
@@ -754,7 +749,7 @@ class WhatsAppService:
             }
          }
 
-        response = requests.post(self.api_url, headers=headers, json=payload)
+        response = requests.post(self.api_url, headers=headers, json=payload, timeout=GATEWAY_TIMEOUT)
     
     def send_withdrawal_flow(self, phone_number):
         headers = {"Authorization": self.api_token}
@@ -794,7 +789,7 @@ class WhatsAppService:
             }
          }
 
-        response = requests.post(self.api_url, headers=headers, json=payload)
+        response = requests.post(self.api_url, headers=headers, json=payload, timeout=GATEWAY_TIMEOUT)
     
     def send_pop_flow(self, phone_number, message):
         headers = {"Authorization": self.api_token}
@@ -834,7 +829,7 @@ class WhatsAppService:
             }
          }
 
-        response = requests.post(self.api_url, headers=headers, json=payload)
+        response = requests.post(self.api_url, headers=headers, json=payload, timeout=GATEWAY_TIMEOUT)
         print("Send POP Response: ", response.json())
         return
     
@@ -876,7 +871,7 @@ class WhatsAppService:
             }
          }
 
-        response = requests.post(self.api_url, headers=headers, json=payload)
+        response = requests.post(self.api_url, headers=headers, json=payload, timeout=GATEWAY_TIMEOUT)
         print("Send POP Response: ", response.json())
         return
     
@@ -918,7 +913,7 @@ class WhatsAppService:
             }
          }
 
-        response = requests.post(self.api_url, headers=headers, json=payload)
+        response = requests.post(self.api_url, headers=headers, json=payload, timeout=GATEWAY_TIMEOUT)
         print("Send POP Response: ", response.json())
         return
 
@@ -960,7 +955,7 @@ class WhatsAppService:
             }
          }
 
-        response = requests.post(self.api_url, headers=headers, json=payload)
+        response = requests.post(self.api_url, headers=headers, json=payload, timeout=GATEWAY_TIMEOUT)
         print("Send POP Response: ", response.json())
         return
     
@@ -996,31 +991,15 @@ class WhatsAppService:
                 return
             
             
-            # Normalize phone number for lookup
-            normalized_phone = ecocash_number.lstrip('0')
-            if normalized_phone.startswith('263'):
-                normalized_phone = normalized_phone[3:]
-            
-            # Look for matching cashout transaction
-            cashout = CashOutTransaction.objects.filter(
-                phone__in=[ecocash_number, normalized_phone, '0' + normalized_phone, 
-                        '263' + normalized_phone, '+263' + normalized_phone],
-                txn_id=extracted_reference
-            ).first()
-            
-            # Try partial match if exact not found
-            if not cashout:
-                cashout = CashOutTransaction.objects.filter(
-                    phone=ecocash_number, 
-                    txn_id__endswith=extracted_reference
-                ).first()
-                print("Partial match cashout:", cashout)
+            # Look for matching cashout transaction (exact txn_id, then short-code suffix)
+            cashout = CashOutTransaction.find_for_pop(ecocash_number, extracted_reference)
+            print("Matched cashout:", cashout)
 
             if cashout:
                 if cashout.completed:
                     try:
                         txn = EcoCashTransaction.objects.get(
-                            ecocash_number=ecocash_number,
+                            phone_e164=to_e164(ecocash_number),
                             ecocash_reference=cashout.txn_id,
                             status='completed'
                         )
@@ -1057,7 +1036,7 @@ class WhatsAppService:
                         deriv_account_number='',
                         ecocash_number=ecocash_number,
                         ecocash_name=cashout.name,
-                        reference_number=f"BK{datetime.now().strftime('%Y%m%d%H%M%S')}",
+                        reference_number=EcoCashTransaction.generate_reference_number("BK"),
                         ecocash_reference=extracted_reference,
                         charge=0,  
                         currency='USD',
@@ -1191,31 +1170,15 @@ class WhatsAppService:
             if not account_number.upper().startswith('CR'):
                 account_number = 'CR' + account_number.lstrip('crCR')
             
-            # Normalize phone number for lookup
-            normalized_phone = ecocash_number.lstrip('0')
-            if normalized_phone.startswith('263'):
-                normalized_phone = normalized_phone[3:]
-            
-            # Look for matching cashout transaction
-            cashout = CashOutTransaction.objects.filter(
-                phone__in=[ecocash_number, normalized_phone, '0' + normalized_phone, 
-                        '263' + normalized_phone, '+263' + normalized_phone],
-                txn_id=extracted_reference
-            ).first()
-            
-            # Try partial match if exact not found
-            if not cashout:
-                cashout = CashOutTransaction.objects.filter(
-                    phone=ecocash_number, 
-                    txn_id__endswith=extracted_reference
-                ).first()
-                print("Partial match cashout:", cashout)
+            # Look for matching cashout transaction (exact txn_id, then short-code suffix)
+            cashout = CashOutTransaction.find_for_pop(ecocash_number, extracted_reference)
+            print("Matched cashout:", cashout)
 
             if cashout:
                 if cashout.completed:
                     try:
                         txn = EcoCashTransaction.objects.get(
-                            ecocash_number=ecocash_number,
+                            phone_e164=to_e164(ecocash_number),
                             ecocash_reference=cashout.txn_id,
                             status='completed'
                         )
@@ -1264,7 +1227,7 @@ class WhatsAppService:
                         deriv_account_number=account_number,
                         ecocash_number=ecocash_number,
                         ecocash_name=cashout.name,
-                        reference_number=f"DP{datetime.now().strftime('%Y%m%d%H%M%S')}",
+                        reference_number=EcoCashTransaction.generate_reference_number("DP"),
                         ecocash_reference=extracted_reference,
                         charge=charge,  
                         currency='USD',
@@ -1401,31 +1364,15 @@ class WhatsAppService:
                 return
             
             
-            # Normalize phone number for lookup
-            normalized_phone = ecocash_number.lstrip('0')
-            if normalized_phone.startswith('263'):
-                normalized_phone = normalized_phone[3:]
-            
-            # Look for matching cashout transaction
-            cashout = CashOutTransaction.objects.filter(
-                phone__in=[ecocash_number, normalized_phone, '0' + normalized_phone, 
-                        '263' + normalized_phone, '+263' + normalized_phone],
-                txn_id=extracted_reference
-            ).first()
-            
-            # Try partial match if exact not found
-            if not cashout:
-                cashout = CashOutTransaction.objects.filter(
-                    phone=ecocash_number, 
-                    txn_id__endswith=extracted_reference
-                ).first()
-                print("Partial match cashout:", cashout)
+            # Look for matching cashout transaction (exact txn_id, then short-code suffix)
+            cashout = CashOutTransaction.find_for_pop(ecocash_number, extracted_reference)
+            print("Matched cashout:", cashout)
 
             if cashout:
                 if cashout.completed:
                     try:
                         txn = EcoCashTransaction.objects.get(
-                            ecocash_number=ecocash_number,
+                            phone_e164=to_e164(ecocash_number),
                             ecocash_reference=cashout.txn_id,
                             status='completed'
                         )
@@ -1476,7 +1423,7 @@ class WhatsAppService:
                         deriv_account_number=account_number,
                         ecocash_number=ecocash_number,
                         ecocash_name=cashout.name,
-                        reference_number=f"WT{datetime.now().strftime('%Y%m%d%H%M%S')}",
+                        reference_number=EcoCashTransaction.generate_reference_number("WT"),
                         ecocash_reference=extracted_reference,
                         charge=charge,  
                         currency='USD',
@@ -1542,7 +1489,8 @@ class WhatsAppService:
             return self.send_message(fromId, message)
 
 
-    def _calculate_net_amount_and_charge(self, total_amount, order_type):
+    @staticmethod
+    def _calculate_net_amount_and_charge(total_amount, order_type):
         print("Deriv order type.......", order_type)
 
         if order_type == 'withdrawal':
@@ -1555,44 +1503,10 @@ class WhatsAppService:
                 # Default to deposit if invalid type
                 order_type = 'deposit'
             
-            # First, check which charge range would apply FOR THIS DEPOSIT TYPE
-            charge_table = TransactionCharge.objects.filter(
-                transaction_type=order_type,  # Only for deposit types
-                is_active=True
-            ).order_by('min_amount')
-            
-            for charge_config in charge_table:
-                if charge_config.is_percentage:
-                    # For percentage-based charges: total = net + (net * percentage_rate/100) + additional_fee
-                    percentage_decimal = charge_config.percentage_rate / Decimal('100')
-                    net_amount = (total_amount - charge_config.additional_fee) / (Decimal('1') + percentage_decimal)
-                    
-                    # Check if net_amount falls in this percentage range
-                    if net_amount >= charge_config.min_amount:
-                        # For percentage ranges, max_amount is usually very large
-                        charge = total_amount - net_amount
-                        return net_amount.quantize(Decimal('0.01')), charge.quantize(Decimal('0.01'))
-                else:
-                    # For fixed charges: total = net + fixed_charge
-                    net_amount = total_amount - charge_config.fixed_charge
-                    
-                    # Check if net_amount falls in this fixed range
-                    if charge_config.min_amount <= net_amount <= charge_config.max_amount:
-                        charge = charge_config.fixed_charge
-                        return net_amount.quantize(Decimal('0.01')), charge.quantize(Decimal('0.01'))
-            
-            # If no range matched, use the highest percentage range for this deposit type
-            highest_percentage = TransactionCharge.objects.filter(
-                is_percentage=True,
-                is_active=True,
-                transaction_type=order_type
-            ).order_by('-min_amount').first()
-            
-            if highest_percentage:
-                percentage_decimal = highest_percentage.percentage_rate / Decimal('100')
-                net_amount = (total_amount - highest_percentage.additional_fee) / (Decimal('1') + percentage_decimal)
-                charge = total_amount - net_amount
-                return net_amount.quantize(Decimal('0.01')), charge.quantize(Decimal('0.01'))
+            # Band whose net + charge adds up to what was paid (see finance/charges.py)
+            split = charge_schedule(order_type).split_gross(total_amount)
+            if split is not None:
+                return split
                 
         except Exception as e:
             print(f"Error calculating net amount: {e}")
@@ -1606,18 +1520,34 @@ class WhatsAppService:
     def _process_deposit_payment(self, transaction, cashout, order, trader):
         """Process the actual deposit payment using DerivPaymentAgent."""
         from deriv.views import DerivPaymentAgent  
+        from deriv import name_cache
+        from deriv.balance import balance_monitor
+        from deriv.executor import TransferTrace, TransferUncertain
+        from .prefetch import cached_recipient
         
         # Calculate net amount
         net_amount = transaction.amount 
         
+        # Liquidity gate: park the deposit rather than send it into an empty float
+        if not balance_monitor.try_reserve(net_amount):
+            return self._queue_for_float(transaction, trader)
+        
         # Initialize Deriv agent
         deriv_agent = DerivPaymentAgent()
+        # Per-step timings: recipient lookup, name check, transfer
+        trace = TransferTrace(transaction.reference_number)
         
         try:
-            # Step 1: Fetch recipient details from Deriv (dry run)
-            details_result = asyncio.run(
-                deriv_agent.fetch_payment_agent_transfer_details(net_amount, transaction.deriv_account_number)
-            )
+            # Step 1: Fetch recipient details from Deriv (dry run), unless it
+            # was already done when the order was created
+            with trace.step('recipient'):
+                details_result = cached_recipient(order, transaction.deriv_account_number, net_amount)
+                if details_result is None:
+                    details_result = name_cache.fetch_recipient_details(
+                        deriv_agent, net_amount, transaction.deriv_account_number, trace=trace
+                    )
+                else:
+                    print(f"Using prefetched recipient details for order {order.pk}")
             
             # Handle error response (WhatsApp URL)
             if isinstance(details_result, str) and details_result.startswith("https://wa.me/"):
@@ -1630,35 +1560,100 @@ class WhatsAppService:
                 deriv_name = details_result['client_to_full_name']
                 local_name = cashout.name
                 
-                # Normalize both names
-                deriv_tokens = self.normalize_name(deriv_name)
-                local_tokens = self.normalize_name(local_name)
+                with trace.step('name_check'):
+                    # Normalize both names
+                    deriv_tokens = names.normalize(deriv_name)
+                    local_tokens = names.from_key(cashout.name_tokens) or names.normalize(local_name)
+                    
+                    if not deriv_tokens & local_tokens and details_result.get('cached'):
+                        # Cached name may be out of date - confirm with Deriv before treating it as a mismatch
+                        fresh_result = name_cache.fetch_recipient_details(
+                            deriv_agent, net_amount, transaction.deriv_account_number, fresh=True, trace=trace
+                        )
+                        if isinstance(fresh_result, dict) and 'client_to_full_name' in fresh_result:
+                            details_result = fresh_result
+                            deriv_name = fresh_result['client_to_full_name']
+                            deriv_tokens = names.normalize(deriv_name)
                 
                 # Step 2: Check if at least one token matches
                 if deriv_tokens & local_tokens:
                     # ✅ Names match, process transfer
                     self._process_transfer(
                         deriv_agent, net_amount, transaction, cashout, 
-                        details_result, deriv_name
+                        details_result, deriv_name, trace=trace
                     )
                 else:
                     # ❌ Name mismatch, try client verification
                     self._handle_name_mismatch(
                         deriv_agent, net_amount, transaction, cashout, 
-                        details_result, deriv_name, local_name, local_tokens
+                        details_result, deriv_name, local_name, local_tokens, trace=trace
                     )
             else:
                 # No valid details received
                 error_msg = "⚠️ Could not fetch recipient details. Please contact support."
                 self._handle_transaction_failure(transaction, trader, str(details_result), error_msg)
                 
+        except StatusConflict as e:
+            # Another worker moved the row mid-transfer - the transfer may have gone
+            # through, so don't tell the trader it failed or mark it failed over the top
+            print(f"Deposit {transaction.reference_number} left for manual review: {e}")
+            AuditLog.objects.create(
+                trader=transaction.user,
+                action=f"Deposit {transaction.reference_number}: status conflict, check Deriv by hand"[:255],
+            )
+        except TransferUncertain as e:
+            # Sent, but no answer came back - it may have been paid, so leave it processing
+            print(f"Deposit {transaction.reference_number} outcome unknown: {e}")
+            EcoCashTransaction.objects.filter(pk=transaction.pk).update(
+                admin_notes=f"Transfer outcome unknown: {e}. Check the Deriv statement before retrying."
+            )
+            AuditLog.objects.create(
+                trader=transaction.user,
+                action=f"Deposit {transaction.reference_number}: transfer outcome unknown, check Deriv by hand"[:255],
+            )
+            self.send_message(
+                trader.phone_number,
+                "⏳ Your deposit is being confirmed with Deriv. Support will update you shortly - "
+                "no need to resend your POP.",
+            )
         except Exception as e:
             print(f"Error processing deposit: {e}")
             error_msg = f"⚠️ Error processing transaction: {str(e)}"
             self._handle_transaction_failure(transaction, trader, str(e), error_msg)
+        finally:
+            # Hand back the local reservation if nothing was sent
+            transaction.refresh_from_db(fields=['status'])
+            if transaction.status != 'completed':
+                balance_monitor.release(net_amount)
+            print(f"Deposit {transaction.reference_number} timings: {trace.describe()}")
+            trace.finish(transaction.status)
+    
+    def _queue_for_float(self, transaction, trader):
+        """Park a deposit until the Deriv float is topped up; released by deriv.balance."""
+        # Only from the status it was loaded with - another worker may have moved it on
+        queued = EcoCashTransaction.objects.filter(pk=transaction.pk, status=transaction.status).update(
+            awaiting_float=True, status='pending',
+        )
+        if not queued:
+            print(f"Deposit {transaction.reference_number} not queued: its status changed under us")
+            return
+        rollups.record_status_move(transaction, transaction.status, 'pending')
+        transaction.awaiting_float = True
+        transaction.status = 'pending'
+        print(f"Deposit {transaction.reference_number} queued: Deriv float below threshold")
+        
+        message = (
+            "⏳ *Deposit Queued*\n\n"
+            f"🔖 Reference Number: {transaction.reference_number}\n"
+            f"💵 Amount: ${float(transaction.amount):.2f}\n\n"
+            "Your payment has been received and your deposit is in the queue. "
+            "It will be sent to your Deriv account automatically within a few minutes.\n\n"
+            "No need to resend your POP."
+        )
+        self.send_message(trader.phone_number, message)
     
     def _process_weltrade_payment(self, transaction, cashout, order, trader):
-        from weltrade.services.services import perform_weltrade_withdrawal, WeltradeWithdrawalError
+        from weltrade.payouts import enqueue_payout
         
         net_amount = transaction.amount 
         
@@ -1668,25 +1663,23 @@ class WhatsAppService:
                 self._handle_transaction_failure(transaction, trader, "Missing wallet address", error_msg)
                 return
             
-            try:
-                amount_decimal = Decimal(str(net_amount)) + Decimal('1')
-
-                # Call Weltrade withdrawal service
-                withdraw_order_id, binance_response = perform_weltrade_withdrawal(
-                    address=transaction.deriv_account_number.strip(),
-                    amount=amount_decimal
-                )
-                
-                # ✅ Transfer successful
-                self._handle_weltrade_success(
-                    transaction, cashout, withdraw_order_id, 
-                    binance_response, net_amount
-                )
-                
-            except WeltradeWithdrawalError as e:
-                # Handle specific Weltrade/Binance errors
-                self._handle_weltrade_withdrawal_error(transaction, e, trader)
-                return
+            amount_decimal = Decimal(str(net_amount)) + Decimal('1')
+
+            # Queue the Binance withdrawal - the payout worker submits it, waits for
+            # the network to confirm and then messages the trader
+            enqueue_payout(
+                transaction,
+                cashout,
+                address=transaction.deriv_account_number.strip(),
+                amount=amount_decimal,
+            )
+            
+            message = (
+                "Payment received ✅\n\n"
+                f"Your USDT withdrawal of `${float(net_amount):.2f}` is queued.\n"
+                "We will message you as soon as it is confirmed on the TRC20 network."
+            )
+            self.send_message(trader.phone_number, message)
                 
         except Exception as e:
             print(f"Error processing Weltrade deposit: {e}")
@@ -1697,8 +1690,9 @@ class WhatsAppService:
                             binance_response, net_amount):
         """Handle successful Weltrade withdrawal."""
         # Mark cashout as completed
-        cashout.completed = True
-        cashout.save()
+        if cashout is not None:
+            cashout.completed = True
+            cashout.save()
         
         # Update EcoCashTransaction with success
         transaction.mark_deposit_completed(
@@ -1810,10 +1804,13 @@ class WhatsAppService:
         # Log the error
         print(f"Transaction failed for {transaction.user.phone_number}: {error_details}")
 
-    def _process_transfer(self, deriv_agent, net_amount, transaction, cashout, details_result, deriv_name):
+    def _process_transfer(self, deriv_agent, net_amount, transaction, cashout, details_result, deriv_name, trace=None):
         """Process the actual transfer."""
-        transfer_result = asyncio.run(
-            deriv_agent.create_payment_agent_transfer(net_amount, transaction.deriv_account_number)
+        from deriv.service import deriv_service
+        # No timeout here: the executor bounds the wait and raises TransferUncertain instead
+        transfer_result = deriv_service.run(
+            deriv_agent.create_payment_agent_transfer(net_amount, transaction.deriv_account_number, trace=trace),
+            timeout=None,
         )
         
         error_message = "⚠️ Transfer failed. Please contact support."
@@ -1860,21 +1857,24 @@ class WhatsAppService:
             )
 
     def _handle_name_mismatch(self, deriv_agent, net_amount, transaction, cashout, 
-                            details_result, deriv_name, local_name, local_tokens):
+                            details_result, deriv_name, local_name, local_tokens, trace=None):
         """Handle name mismatch by checking client verification."""
+        from deriv.service import deriv_service
+
         client_verification = ClientVerification.objects.filter(
-            ecocash_number=transaction.ecocash_number,
+            phone_e164=transaction.phone_e164,
             verified=True
         ).first()
         
         if client_verification:
             verified_name = client_verification.name
-            verified_tokens = self.normalize_name(verified_name)
+            verified_tokens = names.from_key(client_verification.name_tokens) or names.normalize(verified_name)
             
             if local_tokens & verified_tokens:
                 # ✅ Verified name matches, process transfer
-                transfer_result = asyncio.run(
-                    deriv_agent.create_payment_agent_transfer(net_amount, transaction.deriv_account_number)
+                transfer_result = deriv_service.run(
+                    deriv_agent.create_payment_agent_transfer(net_amount, transaction.deriv_account_number, trace=trace),
+                    timeout=None,
                 )
                 
                 if isinstance(transfer_result, dict) and 'transaction_id' in transfer_result:
@@ -1957,33 +1957,15 @@ class WhatsAppService:
 
     def _handle_transaction_failure(self, transaction, trader, error_details, error_message):
         """Handle general transaction failure."""
+        # Mark transaction as failed - unless another worker already moved it on
+        try:
+            transaction.mark_failed(reason=f"Transaction failed: {error_details}")
+        except StatusConflict as e:
+            print(f"Not marking {transaction.reference_number} failed: {e}")
+            return
+        
         # Send error message
         self.home_button(trader.phone_number, error_message)
-        
-        # Mark transaction as failed
-        transaction.mark_failed(reason=f"Transaction failed: {error_details}")
-    
-    def normalize_name(self, name: str) -> set:
-        """
-        Normalize a name into a set of lowercase tokens for comparison.
-        Removes common prefixes (Mr, Mrs, Ms, Miss, Dr, etc.).
-        """
-        if not name:
-            return set()
-
-        # Remove titles like Mr, Mrs, Dr, etc.
-        name = re.sub(r"^(mr|mrs|ms|miss|dr)\.?\s+", "", name, flags=re.IGNORECASE)
-
-        # Split into parts, lowercase, strip punctuation
-        tokens = re.split(r"\s+", name.strip())
-        return set(token.lower().strip(".") for token in tokens if token)
-
-    def names_match(self, name1: str, name2: str) -> bool:
-        """Return True if names are similar enough to allow processing."""
-        n1, n2 = self.normalize_name(name1), self.normalize_name(name2)
-        # Calculate similarity ratio
-        ratio = SequenceMatcher(None, n1, n2).ratio()
-        return ratio >= 0.75  
     
     def create_withdrawal_transaction(self, user, amount, deriv_account_number, ecocash_number, ecocash_name):
         """Create a new withdrawal transaction via WhatsApp"""
@@ -2131,5 +2113,5 @@ We'll process your withdrawal and send *${transaction.total_amount}* to:
                             }]
                         }]
                     }
-        response = requests.post(settings.WHATSAPP_URL, headers=headers, json=payload)
+        response = requests.post(settings.WHATSAPP_URL, headers=headers, json=payload, timeout=GATEWAY_TIMEOUT)
         ans = response.json()
@@ -20,6 +20,7 @@ from cryptography.hazmat.primitives.ciphers import algorithms, Cipher, modes
 from cryptography.hazmat.primitives.serialization import load_pem_private_key
 from rest_framework.permissions import AllowAny
 from accounts.models import User
+from accounts.phone import to_local
 from pathlib import Path
 from .handlers import MessageHandler
 from .models import InitiateOrders, WhatsAppSession, EcocashPop, InitiateSellOrders, ClientVerification
@@ -37,6 +38,7 @@ from django.utils.text import slugify
 from django.db import IntegrityError
 from .services import WhatsAppService
 from .models import InitiateSubscription
+from .prefetch import prefetch_recipient
 
 class WebhookView(APIView): 
     permission_classes = [AllowAny]
@@ -165,12 +167,14 @@ def create_deposit_order(request):
         InitiateOrders.objects.filter(trader=trader).delete()
 
         try:
-            InitiateOrders.objects.create(
+            order = InitiateOrders.objects.create(
                 trader=trader,
                 amount=decrypted_data['data'].get('amount'),
                 account_number=decrypted_data['data'].get('account_number'),
                 ecocash_number=decrypted_data['data'].get('ecocash_number')
             )
+            # Look up the Deriv account holder while the trader is still paying
+            prefetch_recipient(order)
         except Exception as e:
             print(e)
 
@@ -850,16 +854,7 @@ def normalize_phone(number):
     Normalize Ecocash numbers to format: 786xxxxxxx
     Supports: +263786..., 263786..., 0786...
     """
-    if not number:
-        return None
-    number = number.strip()
-    if number.startswith("+"):
-        number = number[1:]
-    if number.startswith("263"):
-        number = number[3:]
-    if number.startswith("0"):
-        number = number[1:]
-    return number
+    return to_local(number) or None
 
 @csrf_exempt
 def create_client_verification(request):